@@ -0,0 +1,87 @@
+'''
+Benchmark of HdrParser in model_part/hdr_parser.py against the hdr parsing of load_files() before the HdrParser, on the
+test header with 0, 5000 and 50000 synthetic events. Run from the repository root:
+    python benchmarks/bench_hdr_parser.py
+'''
+import os
+import re
+import sys
+import tempfile
+import timeit
+from configparser import RawConfigParser
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from model_part.hdr_parser import HdrParser
+
+test_header = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'test_data',
+                           '2016-04-29_001', 'NIRS-2016-04-29_001.hdr')
+
+
+def old_parse_hdr(filename):
+    '''
+    hdr parsing of load_files() before the HdrParser
+    '''
+    startpoint = []
+    with open(filename, 'r', encoding='latin-1') as f:
+        hdr_str = f.read()
+    for indx, char in enumerate(hdr_str):
+        if char == '#':
+            startpoint.append(indx)
+    gains_formatted = re.sub(r"\D", ',', hdr_str[startpoint[0] + 2:startpoint[1]])
+    events_formatted = re.sub(r"\D", ',', hdr_str[startpoint[2] + 2:startpoint[3]])
+    sd_mask_formatted = re.sub(r"\D", ',', hdr_str[startpoint[4] + 2:startpoint[5]])
+    hdr_list = list(hdr_str)
+    hdr_list[startpoint[4] + 1:startpoint[5]] = sd_mask_formatted
+    hdr_list[startpoint[2] + 1:startpoint[3]] = events_formatted
+    hdr_list[startpoint[0] + 1:startpoint[1]] = gains_formatted
+    hdr_str = ''.join(hdr_list)
+    hdr_str = hdr_str.replace('#', '')
+    hdr_rawcnfg = RawConfigParser()
+    hdr_rawcnfg.read_string(hdr_str)
+    sources = int(hdr_rawcnfg['ImagingParameters']['Sources'])
+    detectors = int(hdr_rawcnfg['ImagingParameters']['Detectors'])
+    gains = np.fromstring(hdr_rawcnfg['GainSettings']['Gains'].strip('"'), dtype=int, sep=',').reshape(sources,
+                                                                                                     detectors)
+    sd_mask = np.fromstring(hdr_rawcnfg['DataStructure']['S-D-Mask'].strip('"'), dtype=int,
+                            sep=',').reshape(sources, detectors)
+    return hdr_rawcnfg, gains, sd_mask
+
+
+def write_events_hdr(filename, n_events):
+    '''
+    copy of the test header with n_events rows (time, marker, frame) in its Events table
+    '''
+    with open(test_header, 'r', encoding='latin-1', newline='') as f:
+        hdr_str = f.read()
+    rows = ''.join('%.2f\t%d\t%d\r\n' % (i * 2.5, i % 7 + 1, i * 20) for i in range(n_events))
+    with open(filename, 'w', encoding='latin-1', newline='') as f:
+        f.write(hdr_str.replace('Events="#\r\n#"', 'Events="#\r\n' + rows + '#"'))
+
+
+def best_time(func, repeat=5, number=5):
+    '''
+    @return: best time of one call in ms
+    '''
+    return min(timeit.repeat(func, repeat=repeat, number=number)) / number * 1000
+
+
+def uncached_parse(filename):
+    HdrParser._cache.clear()
+    return HdrParser().parse(filename)
+
+
+def main():
+    with tempfile.TemporaryDirectory() as tmp:
+        for n_events in [0, 5000, 50000]:
+            filename = os.path.join(tmp, 'NIRS-%d.hdr' % n_events)
+            write_events_hdr(filename, n_events)
+            old = best_time(lambda: old_parse_hdr(filename))
+            new = best_time(lambda: uncached_parse(filename))
+            print('%d events: %.2f ms -> %.2f ms' % (n_events, old, new))
+        HdrParser().parse(filename)
+        print('cached: %.3f ms' % best_time(lambda: HdrParser().parse(filename), number=100))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,67 @@
+'''
+Micro-benchmark of lag_cov() in model_part/corr_nirx.py against the full correlation of x_cov() before lag_cov(), and
+of the direct against the FFT path, which is selected with fft_lag_factor. Run from the repository root:
+    python benchmarks/bench_lag_cov.py
+'''
+import os
+import sys
+import timeit
+import numpy as np
+from scipy import signal
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from model_part.corr_nirx import lag_cov, fft_lag_factor
+
+# 240 s window at 4 Hz and 52 channels of oxy and deoxy signals, as in remove_noise_tf_batch()
+fs = 4
+n_signals = 104
+
+
+def old_x_cov(arr_1, arr_2, max_lag_len):
+    '''
+    x_cov() before lag_cov(), full cross-correlation cut to -max_lag_len..max_lag_len
+    '''
+    result = signal.correlate(arr_1 - arr_1.mean(), arr_2 - arr_2.mean(), mode='full')
+    result = result / arr_1.shape[0]
+    indx = int((result.shape[0] / 2))
+    return result[indx - max_lag_len: indx + max_lag_len + 1]
+
+
+def best_time(func, repeat=7, number=20):
+    '''
+    @return: best time of one call in ms
+    '''
+    return min(timeit.repeat(func, repeat=repeat, number=number)) / number * 1000
+
+
+def main():
+    rng = np.random.default_rng(0)
+    n = 240 * fs
+    signals = rng.standard_normal((n, n_signals))
+    noise = rng.standard_normal(n)
+    mmax = 15
+
+    old = best_time(lambda: (old_x_cov(noise, noise, mmax), old_x_cov(signals[:, 0], noise, mmax),
+                             old_x_cov(signals[:, 0], signals[:, 0], 0)))
+    new = best_time(lambda: (lag_cov(noise, noise, mmax, 0), lag_cov(signals[:, 0], noise, mmax, 0),
+                             lag_cov(signals[:, 0], signals[:, 0], 0)))
+    print('covariances of part_tf for one channel, n = %d: %.2f ms -> %.2f ms' % (n, old, new))
+
+    old = best_time(lambda: [old_x_cov(signals[:, i], noise, mmax) for i in range(n_signals)], number=5)
+    new = best_time(lambda: lag_cov(signals, noise, mmax, 0))
+    print('g_xy of %d signals, lags 0..%d: %.2f ms -> %.2f ms' % (n_signals, mmax, old, new))
+
+    print('direct vs fft for %d signals, fft_lag_factor = %d:' % (n_signals, fft_lag_factor))
+    for n, max_lags in [(240 * fs, [30, 240]), (3600 * fs, [30, 60])]:
+        signals = rng.standard_normal((n, n_signals))
+        noise = rng.standard_normal(n)
+        for max_lag in max_lags:
+            direct = best_time(lambda: lag_cov(signals, noise, max_lag, method='direct'), number=3)
+            fft = best_time(lambda: lag_cov(signals, noise, max_lag, method='fft'), number=3)
+            auto = best_time(lambda: lag_cov(signals, noise, max_lag, method='auto'), number=3)
+            print('    n = %d, %d lags: direct %.2f ms, fft %.2f ms, auto %.2f ms' %
+                  (n, 2 * max_lag + 1, direct, fft, auto))
+
+
+if __name__ == '__main__':
+    main()
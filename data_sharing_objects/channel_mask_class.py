@@ -0,0 +1,45 @@
+import numpy as np
+
+
+class ChannelMask:
+    '''
+    Channels of a measurement left out of the analysis, i.e. the excluded channels and the channels of failed optodes.
+    Built once after check_probeset() and stored in NIRx.channel_mask, the stages select the remaining channels with
+    its index instead of copying the signals. Channel numbers count from 1, indices from 0.
+
+    --------
+    Methods:
+    --------
+
+    replace_failed(self, *arrays)
+
+    '''
+    def __init__(self, n_channels, props):
+        '''
+        @param n_channels: number of channels of the selected probe set
+        @param props: dict object including all defined settings
+        '''
+        self.n_channels = n_channels
+        self.excluded = sorted(set(int(ch) for ch in props['excluded_channels']))
+        self.failed = []
+        self.replacements = []
+        if props['optode_failure_val']:
+            self.failed = [int(ch) for ch in props['optode_failure_list'][0]]
+            self.replacements = [[int(ch) for ch in chans] for chans in props['optode_failure_list'][1]]
+        # True for the channels left out
+        self.refused = np.zeros(n_channels, dtype=bool)
+        self.refused[np.asarray(self.excluded + self.failed, dtype=int) - 1] = True
+        self.index = np.flatnonzero(~self.refused)
+        self.channels = [int(ch) for ch in self.index + 1]
+        self.excluded_index = np.asarray(self.excluded, dtype=int) - 1
+
+    def replace_failed(self, *arrays):
+        '''
+        Replaces the channels of failed optodes by the mean of their replacement channels, in place
+        @param arrays: arrays of samples x channels
+        @return: arrays: the same arrays
+        '''
+        for failed, replacements in zip(self.failed, self.replacements):
+            for arr in arrays:
+                arr[:, failed - 1] = np.mean(arr[:, np.asarray(replacements, dtype=int) - 1], axis=1)
+        return arrays
@@ -24,6 +24,7 @@ class Properties(dict):
         self.update({'condition_markers': [],
                      'available_conditions': [],
                      'signal_imaging': 'Averaging over Trials',
+                     'continuous_bins': 10,
                      'chosen_condition': 'Default',
                      'probe_set': '12',
                      'nr_trials': '',
@@ -56,7 +57,23 @@ class Properties(dict):
                      'generate_std_plot': False,
                      'freq_limit_spectra_figures': '',
                      'conc_range_lower': '',
-                     'conc_range_upper': ''
+                     'conc_range_upper': '',
+                     'use_cache': True,
+                     'select_streams': True,
+                     'cache_size': 2048,
+                     'load_workers': 4,
+                     'stream_xdf': False,
+                     'wavelengths': [760, 850],
+                     'extinction_table': 'cope',
+                     'dpf': [],
+                     'dpf_age': '',
+                     'sd_distances': '',
+                     'tf_workers': 1,
+                     'tf_model': 'Cascade',
+                     'rls_method': 'RLS',
+                     'rls_order': 16,
+                     'rls_forgetting': 0.999,
+                     'nlms_step': 0.5
                      })
 
     def delete_ga_property(self, string_ga):
@@ -97,19 +97,19 @@ class MenuMeasurementDataLoadHDR_Callback(qtc.QObject):
         xdf_names = []
         for names in range(len(xdf_files)):
             xdf_names.append(os.path.basename(os.path.normpath(xdf_files[names])))
-            if not xdf_names[names].endswith('.xdf'):
-                print('The type of the selected file(s) must be XDF!')
+            if not xdf_names[names].endswith(('.xdf', '.wl1')):
+                print('The type of the selected file(s) must be XDF or NIRx wl1!')
                 return
             # TODO: make QWarning and exit the function back to the filedialog
 
         false_input = [xdf_files[wrong_files] for wrong_files in range(len(xdf_files)) if
-                       not xdf_files[wrong_files].endswith('.xdf')]
+                       not xdf_files[wrong_files].endswith(('.xdf', '.wl1'))]
         listbox_max = len(xdf_names)
 
         # if not xdf_path:  # selection cancel
         #  None
         if false_input:  # type of file(s) is not xdf
-            print('The type of the selected file(s) must be XDF!')
+            print('The type of the selected file(s) must be XDF or NIRx wl1!')
         else:  # selection was ok
             if not hasattr(self.data, 'xdf'):
                 self.data.xdf = Xdf()
@@ -75,6 +75,7 @@ class MenuBar(qtw.QMenuBar):
     submit_loaded_mayer_waves_source = qtc.pyqtSignal(str)
     submit_loaded_sig_analysis_method = qtc.pyqtSignal(str)
     submit_loaded_correction_mode = qtc.pyqtSignal(str)
+    submit_loaded_tf_model = qtc.pyqtSignal(str)
     submit_loaded_baseline = qtc.pyqtSignal(bool)
     submit_loaded_notch = qtc.pyqtSignal(bool)
     submit_loaded_low_pass = qtc.pyqtSignal(bool)
@@ -325,6 +326,8 @@ class MenuBar(qtw.QMenuBar):
             self.submit_loaded_mayer_waves_source.emit(properties['mayer_waves_source'])
             self.submit_loaded_sig_analysis_method.emit(properties['signal_analysis_method'])
             self.submit_loaded_correction_mode.emit(properties['correction_mode'])
+            # settings saved before the joint model existed used the cascade
+            self.submit_loaded_tf_model.emit(properties.get('tf_model', 'Cascade'))
             self.submit_loaded_baseline.emit(properties['baseline'])
             self.submit_loaded_notch.emit(properties['notch'])
             self.submit_loaded_low_pass.emit(properties['low_pass'])
@@ -478,7 +481,7 @@ class MenuBar(qtw.QMenuBar):
             temporary_path = self.data.nica_directory_path
 
         xdf_files, _ = qtw.QFileDialog.getOpenFileNames(self, 'Please select your XDF File(s)', temporary_path,
-                                                        'XDF Files (*.xdf)')
+                                                        'XDF Files (*.xdf);;NIRx Raw Files (*.wl1)')
         # to check if ok or cancel pressed
         if xdf_files:
             self.submit_xdf_files.emit(xdf_files)
@@ -118,6 +118,7 @@ class NICA_UI(qtw.QMainWindow):
         ### Signal Processing
         self.settings_gb.sig_proc_box.submit_sig_ana_method.connect(self.properties.add_properties)
         self.settings_gb.sig_proc_box.submit_corr_mode.connect(self.properties.add_properties)
+        self.settings_gb.sig_proc_box.submit_tf_model.connect(self.properties.add_properties)
         self.settings_gb.sig_proc_box.submit_mayer_source.connect(self.properties.add_properties)
         self.settings_gb.sig_proc_box.submit_baseline.connect(self.properties.add_properties)
         self.settings_gb.sig_proc_box.submit_notch.connect(self.properties.add_properties)
@@ -172,6 +173,7 @@ class NICA_UI(qtw.QMainWindow):
             self.settings_gb.sig_proc_box.mayer_waves_cb.setCurrentText)
         self.menubar.submit_loaded_sig_analysis_method.connect(self.settings_gb.sig_proc_box.sig_ana_cb.setCurrentText)
         self.menubar.submit_loaded_correction_mode.connect(self.settings_gb.sig_proc_box.corr_mode_cb.setCurrentText)
+        self.menubar.submit_loaded_tf_model.connect(self.settings_gb.sig_proc_box.tf_model_cb.setCurrentText)
         self.menubar.submit_loaded_baseline.connect(self.settings_gb.sig_proc_box.baseline_removal_chb.setChecked)
         self.menubar.submit_loaded_notch.connect(self.settings_gb.sig_proc_box.notch_filter_chb.setChecked)
         self.menubar.submit_loaded_low_pass.connect(self.settings_gb.sig_proc_box.low_pass_chb.setChecked)
@@ -15,6 +15,7 @@ class SignalProcessing(qtw.QWidget):
     change_correction_mode(self, current_mode)
     store_sig_ana_method(self, sig_ana_method)
     store_corr_mode(self, corr_mode)
+    store_tf_model(self, tf_model)
     store_mayer_source(self, mayer_source)
     store_baseline(self, state_changed, is_checked)
     store_notch(self, state_changed, is_checked)
@@ -24,6 +25,7 @@ class SignalProcessing(qtw.QWidget):
     submit_possible_artefact_correction = qtc.pyqtSignal(list)
     submit_sig_ana_method = qtc.pyqtSignal(dict)
     submit_corr_mode = qtc.pyqtSignal(dict)
+    submit_tf_model = qtc.pyqtSignal(dict)
     submit_mayer_source = qtc.pyqtSignal(dict)
     submit_baseline = qtc.pyqtSignal(dict)
     submit_notch = qtc.pyqtSignal(dict)
@@ -47,11 +49,12 @@ class SignalProcessing(qtw.QWidget):
 
         # Labels
         sig_proc_settings = [qtw.QLabel('Signal Analysis Method'), qtw.QLabel('Correction Mode'),
-                             qtw.QLabel('Mayer Waves Source')]
+                             qtw.QLabel('Mayer Waves Source'), qtw.QLabel('Mayer and Respiration Model')]
 
         # Widgets
         self.sig_ana_cb = qtw.QComboBox()
-        analysis_methods = ['TF (Transfer Function Models)', 'CAR (Common Average Reference)']
+        analysis_methods = ['TF (Transfer Function Models)', 'CAR (Common Average Reference)',
+                            'RLS (Adaptive Filter)']
         self.sig_ana_cb.addItems(analysis_methods)
         self.sig_ana_cb.setStyleSheet("QComboBox::drop-down")
         self.sig_ana_cb.currentIndexChanged[str].connect(self.change_anylsis_method)
@@ -64,6 +67,12 @@ class SignalProcessing(qtw.QWidget):
         self.corr_mode_cb.currentIndexChanged[str].connect(self.change_correction_mode)
         self.corr_mode_cb.setStyleSheet("QComboBox::drop-down")
         self.corr_mode_cb.currentTextChanged.connect(self.store_corr_mode)
+        # Cascade: respiration and Mayer waves corrected one after the other, Joint: one model with both references
+        self.tf_model_cb = qtw.QComboBox()
+        self.tf_model_cb.addItems(['Cascade', 'Joint'])
+        self.tf_model_cb.setEnabled(False)
+        self.tf_model_cb.setStyleSheet("QComboBox::drop-down")
+        self.tf_model_cb.currentTextChanged.connect(self.store_tf_model)
         self.mayer_waves_cb = qtw.QComboBox()
         self.mayer_waves_cb.addItem('Heart Rate')
         self.mayer_waves_cb.setEnabled(False)
@@ -93,14 +102,15 @@ class SignalProcessing(qtw.QWidget):
         grid_layout.addWidget(self.sig_ana_cb, 0, 1)
         grid_layout.addWidget(self.corr_mode_cb, 1, 1)
         grid_layout.addWidget(self.mayer_waves_cb, 2, 1)
-        grid_layout.addWidget(self.baseline_removal_chb, 3, 0)
-        grid_layout.addWidget(self.notch_filter_chb, 3, 1)
-        grid_layout.addWidget(self.low_pass_chb, 4, 0)
+        grid_layout.addWidget(self.tf_model_cb, 3, 1)
+        grid_layout.addWidget(self.baseline_removal_chb, 4, 0)
+        grid_layout.addWidget(self.notch_filter_chb, 4, 1)
+        grid_layout.addWidget(self.low_pass_chb, 5, 0)
         lower_right_layout = qtw.QHBoxLayout()
         lower_right_layout.setContentsMargins(0, 0, 0, 0)
         lower_right_layout.addWidget(cut_off_label)
         lower_right_layout.addWidget(self.cut_off_le)
-        grid_layout.addLayout(lower_right_layout, 4, 1)
+        grid_layout.addLayout(lower_right_layout, 5, 1)
         sig_proc_gb.setLayout(grid_layout)
         self.setLayout(outer_layout)
 
@@ -110,13 +120,15 @@ class SignalProcessing(qtw.QWidget):
         Controls the enabling and disabling of the corresponding settings according the current selected analysis method
         @param current_method: current method selected in sig_ana_cb
         '''
-        if current_method == 'TF (Transfer Function Models)':
+        if current_method in ['TF (Transfer Function Models)', 'RLS (Adaptive Filter)']:
             self.corr_mode_cb.setEnabled(True)
             self.corr_mode_cb.setCurrentIndex(0)
+            self.tf_model_cb.setEnabled(False)
         elif current_method == 'CAR (Common Average Reference)':
             self.corr_mode_cb.setEnabled(False)
             self.corr_mode_cb.setCurrentIndex(0)
             self.mayer_waves_cb.setEnabled(False)
+            self.tf_model_cb.setEnabled(False)
 
     @qtc.pyqtSlot(str)
     def change_correction_mode(self, current_mode):
@@ -127,6 +139,9 @@ class SignalProcessing(qtw.QWidget):
         '''
         enable_resp_peak = False
         enable_mayer = False
+        # the adaptive filter always uses both references at once, only TF can be cascaded
+        self.tf_model_cb.setEnabled(current_mode == 'Mayer and Respiration' and
+                                    self.sig_ana_cb.currentText() == 'TF (Transfer Function Models)')
         if current_mode == 'Uncorrected':
             self.mayer_waves_cb.setEnabled(False)
             self.submit_mayer_source.emit({'mayer_waves_source': ''})
@@ -163,6 +178,14 @@ class SignalProcessing(qtw.QWidget):
         '''
         self.submit_corr_mode.emit({'correction_mode': str(corr_mode)})
 
+    @qtc.pyqtSlot(str)
+    def store_tf_model(self, tf_model):
+        '''
+        Stores the TF model used for correcting Mayer waves and respiration
+        @param tf_model: 'Cascade' or 'Joint'
+        '''
+        self.submit_tf_model.emit({'tf_model': str(tf_model)})
+
     @qtc.pyqtSlot(str)
     def store_mayer_source(self, mayer_source):
         '''
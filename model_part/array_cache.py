@@ -0,0 +1,184 @@
+import os
+import json
+import time
+import shutil
+import hashlib
+import threading
+import numpy as np
+
+
+def file_hash(filename, chunk_size=1 << 20):
+    '''
+    Calculates the content hash of a file without loading the whole file into memory
+    @param filename: path of the file
+    @param chunk_size: number of bytes read at once
+    @return: hex digest of the sha1 hash of the file content
+    '''
+    sha = hashlib.sha1()
+    with open(filename, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            sha.update(chunk)
+    return sha.hexdigest()
+
+
+class ArrayCache:
+    '''
+    Size-bounded on-disk cache storing named numpy arrays as *.npy files. Every entry is a folder named by its key
+    including one *.npy file per array and a meta.json file. Arrays are memory-mapped when an entry is loaded again.
+    If the size of all entries exceeds max_size_mb, the least recently used entries are deleted. Pinned entries, e.g.
+    results corrected by hand, are never deleted by the eviction.
+
+    --------
+    Methods:
+    --------
+
+    get(self, key)
+    put(self, key, arrays, meta, pinned=False)
+    remove(self, key)
+    evict(self)
+    source_key(self, filename, prefix)
+
+    '''
+    index_name = 'index.json'
+
+    def __init__(self, cache_path, max_size_mb=2048):
+        self.cache_path = cache_path
+        self.max_size = int(float(max_size_mb) * 1024 ** 2)
+        self.lock = threading.Lock()
+        os.makedirs(self.cache_path, exist_ok=True)
+        self.index = self.read_index()
+
+    def read_index(self):
+        '''
+        Reads the index file of the cache, keys are the entries, sources are the registered source files
+        @return: index: dict including 'entries' and 'sources'
+        '''
+        try:
+            with open(os.path.join(self.cache_path, self.index_name), 'r') as f:
+                index = json.load(f)
+        except (OSError, ValueError):
+            index = dict()
+        index.setdefault('entries', dict())
+        index.setdefault('sources', dict())
+        # drop entries whose folder was deleted by hand
+        for key in list(index['entries']):
+            if not os.path.isdir(os.path.join(self.cache_path, key)):
+                del index['entries'][key]
+        return index
+
+    def write_index(self):
+        '''
+        Writes the index file of the cache
+        '''
+        tmp_name = os.path.join(self.cache_path, self.index_name + '.tmp')
+        with open(tmp_name, 'w') as f:
+            json.dump(self.index, f, indent=1)
+        os.replace(tmp_name, os.path.join(self.cache_path, self.index_name))
+
+    def get(self, key):
+        '''
+        Loads an entry of the cache
+        @param key: key of the entry
+        @return: arrays: dict of memory-mapped arrays, None if the entry does not exist
+                 meta: dict stored together with the arrays, None if the entry does not exist
+        '''
+        with self.lock:
+            if key not in self.index['entries']:
+                return None, None
+            entry_path = os.path.join(self.cache_path, key)
+            try:
+                with open(os.path.join(entry_path, 'meta.json'), 'r') as f:
+                    meta = json.load(f)
+                arrays = {name: np.load(os.path.join(entry_path, name + '.npy'), mmap_mode='r', allow_pickle=False)
+                          for name in self.index['entries'][key]['arrays']}
+            except (OSError, ValueError):
+                self.remove(key, locked=True)
+                return None, None
+            self.index['entries'][key]['last_used'] = time.time()
+            self.write_index()
+            return arrays, meta
+
+    def put(self, key, arrays, meta, pinned=False):
+        '''
+        Stores an entry in the cache and evicts least recently used entries if the cache is too large
+        @param key: key of the entry
+        @param arrays: dict of numpy arrays, object arrays are not supported
+        @param meta: json serializable dict stored together with the arrays
+        @param pinned: if True, the entry is not deleted by evict()
+        @return: size: size of the entry in bytes
+        '''
+        with self.lock:
+            entry_path = os.path.join(self.cache_path, key)
+            tmp_path = entry_path + '.tmp'
+            shutil.rmtree(tmp_path, ignore_errors=True)
+            os.makedirs(tmp_path)
+            try:
+                for name, arr in arrays.items():
+                    np.save(os.path.join(tmp_path, name + '.npy'), np.asarray(arr), allow_pickle=False)
+                with open(os.path.join(tmp_path, 'meta.json'), 'w') as f:
+                    json.dump(meta, f)
+            except Exception:
+                shutil.rmtree(tmp_path, ignore_errors=True)
+                raise
+            shutil.rmtree(entry_path, ignore_errors=True)
+            os.replace(tmp_path, entry_path)
+            size = sum(os.path.getsize(os.path.join(entry_path, f)) for f in os.listdir(entry_path))
+            self.index['entries'][key] = {'arrays': list(arrays), 'size': size, 'last_used': time.time(),
+                                          'pinned': bool(pinned)}
+            self.evict(locked=True)
+            self.write_index()
+            return size
+
+    def remove(self, key, locked=False):
+        '''
+        Deletes an entry of the cache
+        @param key: key of the entry
+        @param locked: True if the caller already holds self.lock
+        '''
+        if not locked:
+            with self.lock:
+                return self.remove(key, locked=True)
+        shutil.rmtree(os.path.join(self.cache_path, key), ignore_errors=True)
+        self.index['entries'].pop(key, None)
+        self.write_index()
+
+    def evict(self, locked=False):
+        '''
+        Deletes least recently used entries until the cache is not larger than max_size, pinned entries are kept
+        @param locked: True if the caller already holds self.lock
+        '''
+        if not locked:
+            with self.lock:
+                return self.evict(locked=True)
+        entries = self.index['entries']
+        total = sum(entry['size'] for entry in entries.values())
+        for key in sorted(entries, key=lambda k: entries[k]['last_used']):
+            if total <= self.max_size:
+                break
+            if entries[key].get('pinned', False):
+                continue
+            total -= entries[key]['size']
+            shutil.rmtree(os.path.join(self.cache_path, key), ignore_errors=True)
+            del entries[key]
+
+    def source_key(self, filename, prefix=''):
+        '''
+        Returns the content hash based key of a source file. The file is only hashed again if its modification time or
+        size changed. If the content changed, the entry of the old content is deleted.
+        @param filename: path of the source file
+        @param prefix: string put in front of the hash, to separate different kinds of entries
+        @return: key: key of the entry belonging to the source file
+        '''
+        filename = os.path.abspath(filename)
+        stat = os.stat(filename)
+        with self.lock:
+            source = self.index['sources'].get(prefix + filename)
+        if source is not None and source['mtime'] == stat.st_mtime and source['size'] == stat.st_size:
+            return source['key']
+        key = prefix + file_hash(filename)
+        with self.lock:
+            if source is not None and source['key'] != key:
+                self.remove(source['key'], locked=True)
+            self.index['sources'][prefix + filename] = {'mtime': stat.st_mtime, 'size': stat.st_size, 'key': key}
+            self.write_index()
+        return key
@@ -1,103 +1,234 @@
 import numpy as np
-import heartpy as hp
+from scipy import signal
 import matplotlib.pyplot as plt
 import os
+import hashlib
+from numpy.lib.stride_tricks import sliding_window_view
+from model_part.epochs import extract_epochs
+from model_part.array_cache import file_hash
 
+# qrs_detect() passes the ECG in chunks of qrs_chunk_seconds to QRSDetector
+qrs_chunk_seconds = 60
+# entries of the heart rate cache with another version are calculated again
+hr_cache_version = 3
+# number of RR intervals of the running median used by correct_rr()
+rr_median_window = 11
+# RR intervals shorter than the running median / rr_tolerance or longer than rr_tolerance * running median are
+# interpolated by correct_rr()
+rr_tolerance = 1.5
 
-def EHK_calcHRlin(sig, fs, props, data, txt):  # data
+
+def EHK_calcHRlin(sig, fs, props, data, txt, hr_cache=None):  # data
     '''
-    calculates the linear interpolated heart rate signal
+    calculates the linear interpolated heart rate signal. If a cache is given, the heart rate signal and the R-peaks are
+    stored by the content of the ECG and the sampling rate. The R-peaks are also written to a text file in the cache
+    folder, one sample index per line, and the hash of this file is stored with the entry. If the file is corrected by
+    hand, i.e. its hash differs, the heart rate signal of the corrected R-peaks is calculated in the next analysis and
+    kept in the cache from then on (pinned). A file without a matching entry, e.g. after eviction or a version change,
+    is moved to *.txt.bak and the R-peaks are detected and corrected again.
     @param sig: input signal of ecg data
     @param fs: effective sample rate of measurement
     @param props: properties object including all user defined settings
     @param data: data object including parameters like analysis_path, file_name etc.
     @param txt: list including prints displayed to self.output_gb in build_gui()
-    @return: estimated heart rate signal
+    @param hr_cache: ArrayCache object, None if the heart rate signal should be calculated every time
+    @return: HR: estimated heart rate signal
+             quality: dict including the number of R-peaks, of removed R-peaks and of interpolated RR intervals
 
     modified 22.08.2021 by Kris Unterhauser
     This function is modified from calcHRlin.m used in NICA MATLAB version
     '''
-
     mode = 1
-    # pass positive sig, because otherwise the heartpy algorithm detects wrong peaks
-    # therefore, multiply by (-1) afterwards to get the same flow as in Matlab
+    file_peaks = None
+    if hr_cache is not None:
+        key = ecg_key(sig, fs)
+        peaks_file = os.path.join(hr_cache.cache_path, 'R-Peaks', key + '.txt')
+        arrays, meta = hr_cache.get(key)
+        if arrays is not None and meta.get('version') != hr_cache_version:
+            hr_cache.remove(key)  # written by an older version, the R-peaks are detected and corrected again
+            arrays = None
+        file_hash_now = file_hash(peaks_file) if os.path.isfile(peaks_file) else None
+        if arrays is not None and file_hash_now in [None, meta['peaks_hash']]:
+            if file_hash_now is None:
+                write_peaks_file(peaks_file, arrays['r_peaks'])
+            message = 'Loaded heart rate signal from cache (%s R-peaks)' % str(arrays['r_peaks'].shape[0])
+            print(message)
+            txt.append(message)
+            return np.array(arrays['HR']), meta['quality']
+        # the file is only trusted if it differs from the R-peaks written for the cache entry or was corrected before,
+        # a file without such an entry (evicted or written by an older version) is detected again
+        if file_hash_now is not None:
+            if meta is not None and 'peaks_hash' in meta and (file_hash_now != meta['peaks_hash'] or
+                                                              meta['from_file']):
+                file_peaks = np.loadtxt(peaks_file, dtype=int, ndmin=1)
+            else:
+                os.replace(peaks_file, peaks_file + '.bak')
+                print('R-peaks of %s do not belong to a cached heart rate signal, moved to %s.bak' % (
+                    peaks_file, peaks_file))
+                txt.append('R-peaks of %s do not belong to a cached heart rate signal, moved to %s.bak' % (
+                    peaks_file, peaks_file))
+
+    if file_peaks is not None:
+        # R-peaks corrected by hand are used as they are
+        time = file_peaks
+        if np.any(np.diff(time) <= 0) or time[0] < 0 or time[-1] >= sig.shape[0]:
+            raise Exception('R-peaks of %s must be increasing sample indices of the ECG' % peaks_file)
+        print('Using R-peaks of %s' % peaks_file)
+        txt.append('Using R-peaks of %s' % peaks_file)
+        time_in_seconds = time / fs
+        bpm = 60 / np.diff(time_in_seconds)
+        quality = {'r_peaks': int(time.shape[0]), 'removed_beats': 0, 'interpolated_beats': 0}
+    else:
+        time, time_in_seconds, bpm, quality, txt = detect_r_peaks(sig, fs, props, data, txt)
+    message = 'Heart rate: %d R-peaks, %d removed, %d RR intervals interpolated' % (
+        quality['r_peaks'], quality['removed_beats'], quality['interpolated_beats'])
+    print(message)
+    txt.append(message)
+
+    if mode == 1:
+        bpm = np.append(bpm, bpm[-1])
+        X = time_in_seconds
+        XI = np.arange(time_in_seconds[0], time_in_seconds[-1] + 1 / fs, 1 / fs)
+        HR = np.interp(XI, X, bpm)
+        HR = np.concatenate((HR[0] * np.ones(time[0]), HR, HR[-1] * np.ones(
+            sig.shape[0] - (time[-1]+1))))  # np.ones(time[0] -1)
+
+    if hr_cache is not None:
+        if file_peaks is None:
+            write_peaks_file(peaks_file, time)
+            print('R-peaks written to %s, they can be corrected there' % peaks_file)
+            txt.append('R-peaks written to %s, they can be corrected there' % peaks_file)
+        # only R-peaks corrected by hand are pinned, detected ones can be detected again after eviction
+        hr_cache.put(key, {'HR': HR, 'r_peaks': np.asarray(time, dtype=int)},
+                     {'version': hr_cache_version, 'fs': fs, 'from_file': file_peaks is not None, 'quality': quality,
+                      'peaks_hash': file_hash(peaks_file)},
+                     pinned=file_peaks is not None)
+    return HR, quality
+
+
+def write_peaks_file(peaks_file, r_peaks):
+    '''
+    Writes R-peaks to a text file, one sample index per line
+    @param peaks_file: path of the text file
+    @param r_peaks: sample indices of the R-peaks
+    '''
+    os.makedirs(os.path.dirname(peaks_file), exist_ok=True)
+    np.savetxt(peaks_file, np.asarray(r_peaks, dtype=int), fmt='%d')
+
+
+def ecg_key(sig, fs):
+    '''
+    Returns the cache key of an ECG signal
+    @param sig: ecg signal
+    @param fs: sample rate of the ecg signal
+    @return: key: 'hr_' and the sha1 hash of the samples and the sampling rate
+    '''
+    sha = hashlib.sha1(np.ascontiguousarray(sig, dtype=float).tobytes())
+    sha.update(repr(float(fs)).encode())
+    return 'hr_' + sha.hexdigest()
+
+
+def detect_r_peaks(sig, fs, props, data, txt):
+    '''
+    detects the R-peaks of an ecg signal and corrects the RR intervals, see correct_rr()
+    @param sig: input signal of ecg data
+    @param fs: effective sample rate of measurement
+    @param props: properties object including all user defined settings
+    @param data: data object including parameters like analysis_path, file_name etc.
+    @param txt: list including prints displayed to self.output_gb in build_gui()
+    @return: time: sample indices of the R-peaks
+             time_in_seconds: time points of the R-peaks
+             bpm: heart rate between consecutive R-peaks
+             quality: dict including the number of R-peaks, of removed R-peaks and of interpolated RR intervals
+             txt: list including prints displayed to self.output_gb in build_gui()
+    '''
+    # qrs_detect() returns the positions of the positive ECG, multiply by (-1) afterwards to get the same flow as in
+    # Matlab
     h_qrs, txt = qrs_detect(sig, fs, 2, txt)
     sig = sig * (-1)
-    time = np.round(h_qrs['EVENT']['POS'])
+    time = np.round(h_qrs['EVENT']['POS']).astype(int)
     time = time - 3
-    time_in_seconds = time / fs
-
-    # possible correction
-    correction = False
-    rate = np.diff(time)
-    mean_rate = np.mean(rate)
-    delete = []
-    for i in range(rate.shape[0]):
-        if rate[i] < mean_rate / 2:
-            if i < rate.shape[0]:
-                if rate[i - 1] > rate[i + 1]:
-                    delete.append(i + 1)
-                else:
-                    delete.append(i)
-            else:
-                delete.append(i)
-            correction = True
+    time = time[time >= 0]
 
-    delete = np.asarray(delete)
-    q = np.diff(time_in_seconds)
-    bpm = 60 / q
+    detected = time
+    time, bpm, quality = correct_rr(time, fs)
+    time_in_seconds = time / fs
 
-    if correction and props['generate_biosig_figures']:
+    if quality['removed_beats']:
+        print('warning: maybe false positive detected heart beats')
+        txt.append('warning: maybe false positive detected heart beats')
+    if (quality['removed_beats'] or quality['interpolated_beats']) and props['generate_biosig_figures']:
+        detected_in_seconds = detected / fs
+        detected_bpm = 60 / np.diff(detected_in_seconds)
         fig, (ax1, ax2) = plt.subplots(nrows=2, figsize=(7, 5))
-        ax1.plot(time_in_seconds, np.append(bpm, bpm[-1]))
+        ax1.plot(detected_in_seconds, np.append(detected_bpm, detected_bpm[-1]))
         ax1.set(title='Heart Rate')
         ax1.margins(x=0)
         ax2.plot(np.arange(0, (len(sig)/fs), 1/fs), sig)
-        ax2.plot(time_in_seconds, sig[time], 'ro')
+        ax2.plot(detected_in_seconds, sig[detected], 'ro')
         ax2.margins(x=0)
         ax2.set(title='detected QRS-peaks')
-        print('warning: maybe false positive detected heart beats')
-        txt.append('warning: maybe false positive detected heart beats')
         fig.savefig(os.path.join(data.analysis_path, data.file_name) + '_Heart_Rate.eps')
 
-        correct = 'y'
-        if correct == 'y':
-            time_in_seconds = np.delete(time_in_seconds, delete)
-            time = np.delete(time, delete)
-            q = np.diff(time_in_seconds)
-            bpm = 60 / q
-
-            fig2, (ax3, ax4) = plt.subplots(nrows=2, figsize=(7, 5))
-            ax3.plot(time_in_seconds, np.append(bpm, bpm[-1]))
-            ax3.set(title='Corrected Heart Rate')
-            ax3.margins(x=0)
-            ax4.plot(np.arange(0, (len(sig)/fs), 1/fs), sig)
-            ax4.plot(time_in_seconds, sig[time], 'ro')
-            ax4.margins(x=0)
-            ax4.set(title='detected QRS-peaks')
-            fig2.savefig(os.path.join(data.analysis_path, data.file_name) + '_Heart_Rate_Corr.eps')
+        fig2, (ax3, ax4) = plt.subplots(nrows=2, figsize=(7, 5))
+        ax3.plot(time_in_seconds, np.append(bpm, bpm[-1]))
+        ax3.set(title='Corrected Heart Rate')
+        ax3.margins(x=0)
+        ax4.plot(np.arange(0, (len(sig)/fs), 1/fs), sig)
+        ax4.plot(time_in_seconds, sig[time], 'ro')
+        ax4.margins(x=0)
+        ax4.set(title='detected QRS-peaks')
+        fig2.savefig(os.path.join(data.analysis_path, data.file_name) + '_Heart_Rate_Corr.eps')
 
-        else:
-            print('Wrong input, no correction will be done.')
-            txt.append('Wrong input, no correction will be done.')
+    return time, time_in_seconds, bpm, quality, txt
 
-    # Plausibility check
-    for i in range(1, bpm.shape[0]):
-        if bpm[i] > 2 * bpm[i - 1]:
-            bpm[i] = bpm[i - 1]
-        elif bpm[i] < (bpm[i - 1] / 2):
-            bpm[i] = bpm[i - 1]
 
-    if mode == 1:
-        bpm = np.append(bpm, bpm[-1])
-        X = time_in_seconds
-        XI = np.arange(time_in_seconds[0], time_in_seconds[-1] + 1 / fs, 1 / fs)
-        HR = np.interp(XI, X, bpm)
-        HR = np.concatenate((HR[0] * np.ones(time[0]), HR, HR[-1] * np.ones(
-            sig.shape[0] - (time[-1]+1))))  # np.ones(time[0] -1)
+def correct_rr(time, fs, window=rr_median_window):
+    '''
+    Corrects RR intervals without loops over the beats. RR intervals shorter than half of the running median are
+    false positive detections: of the two R-peaks of such an interval, the one whose removal merges the interval with
+    its shorter neighbour is removed. Afterwards, heart rates of RR intervals deviating from the running median by more
+    than the factor rr_tolerance are implausible (e.g. missed or ectopic beats) and are linearly interpolated from the
+    plausible ones.
+    @param time: sample indices of the R-peaks
+    @param fs: sample rate of the ecg signal
+    @param window: number of RR intervals of the running median, odd
+    @return: time: sample indices of the R-peaks without false positive detections
+             bpm: heart rate of the RR intervals, one value less than time
+             quality: dict including the number of R-peaks, of removed R-peaks and of interpolated RR intervals
+    '''
+    time = np.asarray(time)
+    rr = np.diff(time)
+    short = np.flatnonzero(rr < running_median(rr, window) / 2)
+    # neighbouring intervals, -inf outside, so the first or the last R-peak is removed at the borders
+    previous_rr = np.concatenate(([-np.inf], rr[:-1]))[short]
+    next_rr = np.concatenate((rr[1:], [-np.inf]))[short]
+    delete = np.unique(np.where(previous_rr > next_rr, short + 1, short))
+    time = np.delete(time, delete)
+
+    rr = np.diff(time)
+    median_rr = running_median(rr, window)
+    implausible = np.logical_or(rr < median_rr / rr_tolerance, rr > rr_tolerance * median_rr)
+    bpm = 60 * fs / rr
+    if np.any(implausible) and not np.all(implausible):
+        beats = np.arange(bpm.shape[0])
+        bpm[implausible] = np.interp(beats[implausible], beats[~implausible], bpm[~implausible])
+    quality = {'r_peaks': int(time.shape[0]), 'removed_beats': int(delete.shape[0]),
+               'interpolated_beats': int(np.count_nonzero(implausible))}
+    return time, bpm, quality
 
-    
-    return HR
+
+def running_median(arr, window):
+    '''
+    Running median of a 1-D array, the windows at the borders are shortened
+    @param arr: 1-D array
+    @param window: window length, odd
+    @return: median of the window centered at each value
+    '''
+    if arr.shape[0] == 0:
+        return arr.astype(float)
+    padded = np.pad(arr.astype(float), window // 2, mode='constant', constant_values=np.nan)
+    return np.nanmedian(sliding_window_view(padded, window), axis=1)
 
 
 def qrs_detect(ecg_sig, fs, mode, txt):  # ecg_sig = gUSBamp_ecg , round(gusbamp['info']['effective_srate'])
@@ -121,18 +252,24 @@ def qrs_detect(ecg_sig, fs, mode, txt):  # ecg_sig = gUSBamp_ecg , round(gusbamp
 
     for k in range(s.shape.__len__()):
         if mode is 2:
-            working_data, measures = hp.process(s, fs)
-            positions = working_data['peaklist'][0:-2]  # [0:-2] is to get as well 583 values as in Matlab
-            # TODO: check the line above again for other files as well, to see if it is always -2
+            detector = QRSDetector(fs)
+            chunk_length = int(qrs_chunk_seconds * fs)
+            positions = [detector.process(s[onset:onset + chunk_length])
+                         for onset in range(0, s.shape[0], chunk_length)]
+            positions.append(detector.flush())
+            positions = np.concatenate(positions)
             s = s*(-1)
         else:
             print('Error QRSDETECT: Mode %i not supported' % mode)
             txt.append('Error QRSDETECT: Mode %i not supported' % mode)
-        t, sz = trigg(s, positions, int(np.floor(-hdr['SampleRate'])), int(np.ceil(hdr['SampleRate'])))
-        tmp = np.nanmax(np.abs(np.mean(np.reshape(t, sz[1:3], order='F'), axis=1)))  # should be mean for each row  # t * (-1)
+        # mean beat from one second before to one second after the detected positions
+        epochs, complete = extract_epochs(s, positions, int(np.floor(-hdr['SampleRate'])),
+                                          int(np.ceil(hdr['SampleRate'])))
+        mean_beat = np.abs(np.mean(epochs, axis=0))
+        tmp = np.nanmax(mean_beat)
         # for ix: it takes the first index if it appears more than one time (when calculating the delay),
         # but the same behavior is in Matlab
-        ix = np.where(tmp == np.abs(np.mean(np.reshape(t, sz[1:3], order='F'), axis=1)))  # t * (-1)
+        ix = np.where(tmp == mean_beat)
         delay = hdr['SampleRate'] - ix[0]  # in Matlab it is with + 1, but here we need it like this to be the same
         positions = np.asarray(positions)
         c = positions - delay
@@ -155,6 +292,149 @@ def qrs_detect(ecg_sig, fs, mode, txt):  # ecg_sig = gUSBamp_ecg , round(gusbamp
     return H2, txt
 
 
+class QRSDetector:
+    '''
+    Pan-Tompkins QRS detector (Pan J, Tompkins WJ (1985) IEEE Trans Biomed Eng 32(3):230-236).
+    The ECG is band-pass filtered (5-15 Hz), differentiated, squared and integrated over a moving window, all filters
+    run on whole chunks with scipy. Local maxima of the integrated signal are classified as QRS complexes or noise with
+    the adaptive thresholds of Pan-Tompkins, including the refractory period and the search back for missed beats; this
+    loop only runs over the local maxima. The filter states, thresholds and the end of the signal not decided yet are
+    kept between calls of process(), so an ECG passed in chunks gives the same R-peaks as passed at once.
+    The R-peaks are located as maxima, the ECG must therefore be passed with positive R-peaks.
+
+    --------
+    Methods:
+    --------
+
+    process(self, ecg)
+    flush(self)
+
+    '''
+    def __init__(self, fs, learning_time=2.0, refractory_time=0.2, window_time=0.15):
+        '''
+        @param fs: sampling rate of the ECG
+        @param learning_time: length of the start of the ECG used to initialize the thresholds, in seconds
+        @param refractory_time: minimum distance of two QRS complexes, in seconds
+        @param window_time: length of the moving integration window, in seconds
+        '''
+        self.fs = fs
+        self.learning_length = int(round(learning_time * fs))
+        self.refractory = int(round(refractory_time * fs))
+        self.window = max(int(round(window_time * fs)), 1)
+        self.sos = signal.butter(2, [5, 15], btype='bandpass', fs=fs, output='sos')
+        self.derivative = np.array([1, 2, 0, -2, -1]) * fs / 8
+        self.zi_band = None
+        self.zi_derivative = np.zeros(4)
+        self.zi_window = np.zeros(self.window - 1)
+        # filtered signals not decided yet, the first sample of the buffers is sample buffer_start of the ECG
+        self.band_buffer = np.zeros(0)
+        self.window_buffer = np.zeros(0)
+        self.buffer_start = 0
+        self.decided = 0  # samples before are classified
+        self.initialized = False
+        self.spki = 0
+        self.npki = 0
+        self.rr = []  # last eight RR intervals
+        self.last_qrs = None
+        self.noise_peaks = []  # (position, value) of the noise peaks since the last QRS complex, for the search back
+
+    def process(self, ecg):
+        '''
+        Filters the next chunk of the ECG and classifies all peaks which can be decided
+        @param ecg: next samples of the ECG
+        @return: positions: sample indices of the R-peaks detected in this call, counted from the start of the ECG
+        '''
+        ecg = np.asarray(ecg, dtype=float)
+        if ecg.shape[0] == 0:
+            return np.zeros(0, dtype=int)
+        if self.zi_band is None:
+            self.zi_band = signal.sosfilt_zi(self.sos) * ecg[0]
+        band, self.zi_band = signal.sosfilt(self.sos, ecg, zi=self.zi_band)
+        derivative, self.zi_derivative = signal.lfilter(self.derivative, 1, band, zi=self.zi_derivative)
+        integrated, self.zi_window = signal.lfilter(np.ones(self.window) / self.window, 1, derivative ** 2,
+                                                    zi=self.zi_window)
+        self.band_buffer = np.concatenate((self.band_buffer, band))
+        self.window_buffer = np.concatenate((self.window_buffer, integrated))
+        return self.classify(final=False)
+
+    def flush(self):
+        '''
+        Classifies the peaks left at the end of the ECG
+        @return: positions: sample indices of the R-peaks detected in this call
+        '''
+        return self.classify(final=True)
+
+    def classify(self, final):
+        '''
+        Classifies the local maxima of the integrated signal which have not been decided yet
+        @param final: True at the end of the ECG, then the learning phase may be shorter than learning_length
+        @return: positions: sample indices of the R-peaks
+        '''
+        end = self.buffer_start + self.window_buffer.shape[0]
+        if not self.initialized:
+            if end < self.learning_length and not final:
+                return np.zeros(0, dtype=int)
+            learning = self.window_buffer[:self.learning_length]
+            if learning.shape[0] == 0:
+                return np.zeros(0, dtype=int)
+            self.spki = np.max(learning) / 3
+            self.npki = np.mean(learning) / 2
+            self.initialized = True
+
+        # local maxima are final as soon as the next sample is known
+        peaks, _ = signal.find_peaks(self.window_buffer)
+        peaks = peaks + self.buffer_start
+        peaks = peaks[peaks >= self.decided]
+        positions = []
+        for peak in peaks:
+            value = self.window_buffer[peak - self.buffer_start]
+            if self.last_qrs is not None and self.rr:
+                # search back for a missed beat if there was no QRS complex for 166 % of the mean RR interval
+                rr_missed = 1.66 * np.mean(self.rr)
+                if peak - self.last_qrs > rr_missed:
+                    threshold = self.npki + 0.25 * (self.spki - self.npki)
+                    missed = [(v, p) for p, v in self.noise_peaks
+                              if p - self.last_qrs > self.refractory and v > threshold / 2]
+                    if missed:
+                        v, p = max(missed)
+                        self.spki = 0.25 * v + 0.75 * self.spki
+                        positions.append(self.accept(p))
+            if self.last_qrs is not None and peak - self.last_qrs <= self.refractory:
+                continue
+            threshold = self.npki + 0.25 * (self.spki - self.npki)
+            if value > threshold:
+                self.spki = 0.125 * value + 0.875 * self.spki
+                positions.append(self.accept(peak))
+            else:
+                self.npki = 0.125 * value + 0.875 * self.npki
+                self.noise_peaks.append((peak, value))
+        self.decided = end - 1 if not final else end
+
+        # keep the samples needed for the next local maxima and for locating the R-peaks of the last detections
+        keep = max(min(self.decided - self.window - 1, end), self.buffer_start)
+        if self.noise_peaks:
+            keep = min(keep, self.noise_peaks[0][0] - self.window - 1)
+        keep = max(keep, self.buffer_start)
+        self.band_buffer = self.band_buffer[keep - self.buffer_start:]
+        self.window_buffer = self.window_buffer[keep - self.buffer_start:]
+        self.buffer_start = keep
+        return np.asarray(positions, dtype=int)
+
+    def accept(self, peak):
+        '''
+        Stores a QRS complex and locates its R-peak as the maximum of the band-passed ECG inside the integration window
+        @param peak: position of the peak of the integrated signal
+        @return: position of the R-peak
+        '''
+        if self.last_qrs is not None:
+            self.rr = (self.rr + [peak - self.last_qrs])[-8:]
+        self.last_qrs = peak
+        self.noise_peaks = []
+        first = max(peak - self.window - 2, self.buffer_start)
+        # the derivative delays the signal by two samples
+        return first + int(np.argmax(self.band_buffer[first - self.buffer_start:peak - 2 + 1 - self.buffer_start]))
+
+
 def trigg(sig, trig, pre, post):  # gap
     '''
     Cuts continuous sequence into segments. Missing values (in case sig is to short) are substituted by nan's.
@@ -172,27 +452,14 @@ def trigg(sig, trig, pre, post):  # gap
     This function is modified from trigg.m originally used in the Biosig project:
     http://biosig.sourceforge.net/index.html
     '''
-    trig = np.round(trig)
+    trig = np.round(trig).astype(int)
     gap = 0  # not really needed, but included for completeness
     post = int(np.round(post))
-
-    # for the calculation of off and off2:
-    # there needs to be added +1 to each value in trig = position, since this value will be used for creating a matrix and not for indexing
-    # so otherwise we would miss two values (one for off and one for off2) in matrix construction with concatenate in the if:
-    a = np.append(trig + 1, float('inf'))
-    b = np.amin(np.append(trig + 1, float('inf')))  # sollte 258 (257) sein
-    off = int(np.min((np.amin(np.append(trig + 1, float('inf'))) + pre - 1,
-                      0)))  # TODO: check that again: here theoretically without -1; in Matlab = min(513,0), here min(512,0), but in both cases obviously 0
-    off2 = int(np.max((np.amax(np.append(trig + 1, float('-inf'))) + post - sig.shape[0], 0)))
-    if off != 0 or off2 != 0:
-        sig = np.concatenate((np.tile(np.nan, -off, ), sig, np.tile(np.nan, off2, )), axis=0)
-        trig = trig - off
-    N = post - pre + 1 + gap
     nc = 1  # originally nr of columns of sig, but sig should always be ndarray with only one dimension. If not refer to
     # the original Matlab version
-    sz = np.array([nc, N, trig.shape[0]])
-    x = np.tile(np.nan, (1, sz[1] * sz[2]))
-    for m in range(trig.shape[0]):
-        x[:, (m + 1) * N + np.arange(1 - N, -gap + 1) - 1] = sig[trig[m] + np.arange(pre, post+1)]
+    # missing values at the start or the end are nan's, as if sig was padded with nan's
+    epochs, complete = extract_epochs(sig, trig, pre, post)
+    sz = np.array([nc, post - pre + 1 + gap, trig.shape[0]])
+    x = np.reshape(epochs, (1, sz[1] * sz[2]))
 
-    return x, sz
\ No newline at end of file
+    return x, sz
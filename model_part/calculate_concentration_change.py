@@ -1,43 +1,175 @@
 import numpy as np
 
-def calculate_conc_change(nirx_conc):
+# extinction coefficients [deoxy-Hb, oxy-Hb] in 1/mM per length unit of the table (see extinction_units), per
+# wavelength in nm
+extinction_tables = {
+    # values used by NICA so far
+    'cope': {760: [0.1675, 0.06096],
+             850: [0.07861, 0.11596]},
+    # S. Prahl, Tabulated molar extinction coefficient for hemoglobin in water (Gratzer, Kollias), cm-1/M / 1000
+    'prahl': {690: [2.05196, 0.276],
+              700: [1.79428, 0.290],
+              750: [1.40524, 0.518],
+              760: [1.54852, 0.586],
+              780: [1.07544, 0.710],
+              800: [0.76172, 0.816],
+              830: [0.69304, 0.974],
+              850: [0.69132, 1.058]}
+}
+# length unit of each extinction table in mm. The ConcentrationEngine converts all tables to 1/(mM*mm), the
+# source-detector distances (ChanDis of the hdr file, or props['sd_distances']) are given in mm, so the
+# concentration changes are in mM
+extinction_units = {'cope': 1,
+                    'prahl': 10}
+
+
+def age_dpf(wavelengths, age):
     '''
-    Calculates the concentration of the raw input signals
-    @param nirx_conc: NIRx object of class data_dict including the loaded hdr and xdf data of the selected measurement
-    @return: s_signal1: oxy-Hb
-             s_signal2: deoxy-Hb
-    '''
-    ext_coeff = np.array([[0.1675, 0.06096], [0.07861, 0.11596]])  # [760nm;850nm] cope (new)
-    x1 = 1  # DPF für 760nm (x_670)%6.2621
-    x2 = 1  # DPF für 850nm (x_890)%4.9048
-    d = 1
-    inv_ext_coeff = np.linalg.inv(ext_coeff)
-    s_signal1 = np.zeros([nirx_conc.nirx_data['wl760_signal'].shape[0], nirx_conc.nirx_data['wl760_signal'].shape[1]])
-    s_signal2 = np.zeros([nirx_conc.nirx_data['wl850_signal'].shape[0], nirx_conc.nirx_data['wl850_signal'].shape[1]])
-
-    for i in range(nirx_conc.nirx_data['wl760_signal'].shape[1]):
-        raw_data = np.zeros([nirx_conc.nirx_data['wl760_signal'].shape[0], 2])
-        raw_data[:, 0] = np.asarray(nirx_conc.nirx_data['wl760_signal'][:, i])
-        raw_data[:, 1] = np.asarray(nirx_conc.nirx_data['wl850_signal'][:, i])
-        raw_data0_temp = np.reshape(raw_data[:, 0], (raw_data[:, 0].shape[0], 1))
-        raw_data1_temp = np.reshape(raw_data[:, 1], (raw_data[:, 1].shape[0], 1))
-
-        data = np.concatenate((raw_data0_temp.T, raw_data1_temp.T), axis=0)
-        A = np.zeros([data.shape[0], data.shape[1] - 1])
-        A[0, :] = (np.log10(data[0, :-1] / data[0, 1:])) / (x1 * d)
-        A[1, :] = (np.log10(data[1, :-1] / data[1, 1:])) / (x2 * d)
-
-        C = np.zeros(A.shape).T  # Notwendig da sonst die alten Daten erhalten bleiben
-
-        for g in range(A.shape[1]):
-            C[g, 0] = np.dot(inv_ext_coeff[0, :], A[:, g])
-            C[g, 1] = np.dot(inv_ext_coeff[1, :], A[:, g])
+    Differential pathlength factor of the adult head depending on wavelength and age, general equation of
+    Scholkmann F, Wolf M (2013) J Biomed Opt 18(10):105004
+    @param wavelengths: wavelengths in nm
+    @param age: age of the subject in years
+    @return: dpf: one value per wavelength
+    '''
+    wavelengths = np.asarray(wavelengths, dtype=float)
+    return (223.3 + 0.05624 * float(age) ** 0.8493 - 5.723e-7 * wavelengths ** 3 + 0.001245 * wavelengths ** 2
+            - 0.9025 * wavelengths)
+
+
+class ConcentrationEngine:
+    '''
+    Modified Beer-Lambert law for N wavelengths and two chromophores (deoxy-Hb, oxy-Hb).
+    The extinction matrix, the differential pathlength factors and the pseudo-inverse are prepared once, the changes
+    of optical density of all channels are then solved with one matrix multiplication. With more than two wavelengths
+    the overdetermined system is solved in the least squares sense.
+
+    --------
+    Methods:
+    --------
+
+    from_props(props)
+    solve(self, raw_data, distances=1)
+
+    '''
+    def __init__(self, wavelengths, extinction='cope', dpf=None, age=None):
+        '''
+        @param wavelengths: wavelengths of the device in nm
+        @param extinction: name of one of the extinction_tables, or array wavelengths x [deoxy-Hb, oxy-Hb] in
+                           1/(mM*mm)
+        @param dpf: differential pathlength factor per wavelength, None to use age_dpf() if age is given, else 1
+        @param age: age of the subject in years, used if dpf is None
+        '''
+        self.wavelengths = [int(wavelength) for wavelength in wavelengths]
+        if isinstance(extinction, str):
+            table = extinction_tables[extinction]
+            missing = [wavelength for wavelength in self.wavelengths if wavelength not in table]
+            if missing:
+                raise Exception('No extinction coefficients for %s nm in table %s' % (missing, extinction))
+            extinction = np.array([table[wavelength] for wavelength in self.wavelengths]) / extinction_units[extinction]
+        self.ext_coeff = np.asarray(extinction, dtype=float)
+        if self.ext_coeff.shape != (len(self.wavelengths), 2):
+            raise Exception('Extinction coefficients must be given as wavelengths x [deoxy-Hb, oxy-Hb]')
+
+        if dpf is not None:
+            self.dpf = np.asarray(dpf, dtype=float).reshape(len(self.wavelengths))
+        elif age is not None:
+            self.dpf = age_dpf(self.wavelengths, age)
+        else:
+            self.dpf = np.ones(len(self.wavelengths))
 
+        if self.ext_coeff.shape[0] == 2:
+            inv_ext_coeff = np.linalg.inv(self.ext_coeff)
+        else:
+            inv_ext_coeff = np.linalg.pinv(self.ext_coeff)
+        # dividing the optical densities by the dpf is folded into the columns of the inverse
+        self.inv_ext_coeff = inv_ext_coeff / self.dpf
+
+    @classmethod
+    def from_props(cls, props):
+        '''
+        Creates the engine of the settings, see Properties.initial_properties()
+        @param props: dict object including all defined settings
+        @return: ConcentrationEngine object
+        '''
+        dpf = props['dpf'] if props['dpf'] else None
+        age = props['dpf_age'] if props['dpf_age'] != '' else None
+        return cls(props['wavelengths'], extinction=props['extinction_table'], dpf=dpf, age=age)
+
+    def solve(self, raw_data, distances=1):
+        '''
+        Calculates the concentration changes of all channels
+        @param raw_data: samples x channels x wavelengths, raw intensities
+        @param distances: source-detector distance in mm, one value or one value per channel
+        @return: concentration: samples x channels x [deoxy-Hb, oxy-Hb], the first sample gets the value of the
+                 second one
+        '''
+        raw_data = np.asarray(raw_data, dtype=float)
+        if raw_data.shape[2] != len(self.wavelengths):
+            raise Exception('Raw data has %d wavelengths, the engine %d' % (raw_data.shape[2], len(self.wavelengths)))
+
+        # optical density changes between consecutive samples, for all channels and wavelengths at once
+        A = np.log10(raw_data[:-1] / raw_data[1:])
+        # C[sample, channel, :] = inv_ext_coeff . A[sample, channel, :]
+        C = np.matmul(A, self.inv_ext_coeff.T)
+        del A
+        distances = np.asarray(distances, dtype=float)
+        if distances.ndim:
+            C /= distances.reshape(1, -1, 1)
+        else:
+            C /= distances
         concentration = np.cumsum(C, axis=0)
+        del C
+        return np.concatenate((concentration[:1], concentration), axis=0)
+
+
+def calculate_conc_change(nirx_conc, props=None):
+    '''
+    Calculates the concentration of the raw input signals
+    @param nirx_conc: NIRx object of class data_dict including the loaded hdr and xdf data of the selected measurement,
+                      the raw signals are stored as nirx_data['wl<wavelength>_signal']
+    @param props: dict object including all defined settings, None for the defaults of NICA (760 nm and 850 nm,
+                  cope extinction coefficients, dpf and distance 1 mm). props['sd_distances'] overrides the
+                  source-detector distances of the hdr file if it is not ''
+    @return: s_signal1: deoxy-Hb
+             s_signal2: oxy-Hb
+    '''
+    engine = ConcentrationEngine([760, 850]) if props is None else ConcentrationEngine.from_props(props)
+    # samples x channels x wavelengths
+    raw_data = np.stack([np.asarray(nirx_conc.nirx_data['wl%d_signal' % wavelength], dtype=float)
+                         for wavelength in engine.wavelengths], axis=2)
+    if props is None:
+        distances = 1
+    elif props['sd_distances'] != '':
+        distances = float(props['sd_distances'])
+    else:
+        distances = channel_distances(nirx_conc, raw_data.shape[1])
+    concentration = engine.solve(raw_data, distances)
+    del raw_data
+
+    s_signal1 = concentration[:, :, 0]
+    s_signal2 = concentration[:, :, 1]
 
-        s_signal1[:, i] = np.append(concentration[0, 0], concentration[:, 0])
-        s_signal2[:, i] = np.append(concentration[0, 1], concentration[:, 1])
+    return s_signal1, s_signal2
 
-        del raw_data, data, A, C, concentration, raw_data0_temp, raw_data1_temp
 
-    return s_signal1, s_signal2
\ No newline at end of file
+def channel_distances(nirx_conc, n_channels):
+    '''
+    Source-detector distances of the channels, read from ChanDis of the hdr file by load_files() and cropped to the
+    probe set by check_probeset(). Channels left out of the analysis (see ChannelMask) without a valid distance get 1 mm,
+    so their concentration stays finite
+    @param nirx_conc: NIRx object of class data_dict including the loaded hdr and xdf data of the selected measurement
+    @param n_channels: number of channels of the raw signals
+    @return: distances: one value per channel in mm
+    '''
+    distances = np.array(nirx_conc.hdr['Channel Distances'][0], dtype=float)
+    if distances.shape[0] != n_channels:
+        raise Exception('The hdr file has %d source-detector distances for %d channels, set the source-detector '
+                        'distance in the settings' % (distances.shape[0], n_channels))
+    invalid = ~(distances > 0)
+    if hasattr(nirx_conc, 'channel_mask'):
+        distances[invalid & nirx_conc.channel_mask.refused] = 1
+        invalid &= ~nirx_conc.channel_mask.refused
+    if invalid.any():
+        raise Exception('No source-detector distance of channel(s) %s in the hdr file, set the source-detector '
+                        'distance in the settings' % [int(ch) for ch in np.flatnonzero(invalid) + 1])
+    return distances
@@ -1,7 +1,10 @@
+from data_sharing_objects.channel_mask_class import ChannelMask
+
+
 def check_probeset(nirx_check, props):
     '''
     Reduces several data related properties stored in NIRx object to the size of the selected probe set.
-    Adds new props entry probe_set_val
+    Adds new props entry probe_set_val and the ChannelMask of the remaining channels as nirx_check.channel_mask
     @param nirx_check: NIRx object of class data_dict including the loaded hdr and xdf data of the selected measurement
     @param props: dict object including all defined settings
     @return: nirx_check: NIRx object of class data_dict including the loaded hdr and xdf data of the selected
@@ -122,4 +125,7 @@ def check_probeset(nirx_check, props):
         nirx_check.nirx_data['wl760_signal'] = nirx_check.nirx_data['wl760_signal'][:, 0:61]
         nirx_check.nirx_data['wl850_signal'] = nirx_check.nirx_data['wl850_signal'][:, 0:61]
 
+    # source-detector distances of the remaining channels, in the order of the signals
+    nirx_check.hdr['Channel Distances'][0] = nirx_check.hdr['Channel Distances'][0][:nirx_check.nirx_data['wl760_signal'].shape[1]]
+    nirx_check.add(channel_mask=ChannelMask(nirx_check.nirx_data['wl760_signal'].shape[1], props))
     return nirx_check, props
\ No newline at end of file
@@ -1,6 +1,8 @@
 import numpy as np
 import matplotlib.pyplot as plt
 import os
+from model_part.epochs import extract_epochs
+from numpy.lib.stride_tricks import sliding_window_view
 
 def compare_spectra(nirx_compare, props, data):
     '''
@@ -22,7 +24,6 @@ def compare_spectra(nirx_compare, props, data):
     oxy_signal = nirx_compare.nirx_data['Concentration']['clean']['oxy']
     deoxy_signal = nirx_compare.nirx_data['Concentration']['clean']['deoxy']
     frequency_range = float(props['freq_limit_spectra_figures'])
-    excluded_channels = props['excluded_channels']
 
     if props['generate_spectra_figures']:
 
@@ -60,74 +61,46 @@ def compare_spectra(nirx_compare, props, data):
         # plt.savefig(os.path.join(data.analysis_path_main, data.selected_file) + '_Spectra_Compared' + properties['TF (Transfer Function Models)'] + properties['correction_mode']+'.png')
 
         # Kanalschleife
-    head_oxy = []
-    head_deoxy = []
-    head_oxy_std = []
-    head_deoxy_std = []
-    nirx_compare.nirx_data['all_trials_oxy'] = []
-    nirx_compare.nirx_data['all_trials_deoxy'] = []
-
     t = np.arange(1/fs, deoxy_signal.shape[0]/fs+(1/fs), 1/fs)
     soll_activation = np.zeros(deoxy_signal.shape[0])*0
-    nirx_compare.nirx_data['all_trials_oxy_continuous'] = [0]*oxy_signal.shape[1]
-    nirx_compare.nirx_data['all_trials_deoxy_continuous'] = [0]*oxy_signal.shape[1]
 
-    for i in range(0, trig.shape[0]):
-       task_length = float(props['task_length'])
-       tmp = np.amin(np.abs(nirx_compare.time['NIRS'] - trig[i]))
-       idx = np.where(tmp == np.abs(nirx_compare.time['NIRS'] - trig[i]))
-       end_interval = round(0*fs) + round(12*fs)
-       if idx[0] + round(task_length*fs) <= len(t):
-           soll_activation[int(idx[0]) : int(idx[0])+end_interval+1] = 1  # + 1 to include last value
-    del i
+    task_length = float(props['task_length'])
+    end_interval = round(0*fs) + round(12*fs)
+    for idx in nirx_compare.trigger_index['NIRS']:
+        if idx + round(task_length*fs) <= len(t):
+            soll_activation[idx : idx+end_interval+1] = 1  # + 1 to include last value
     for i in range(0, oxy_signal.shape[1]):
         curve_NIRx(oxy_signal[:,i], deoxy_signal[:,i], props, t, soll_activation, i, data)
-        dat_avg, dat_std, t_trial, data_all_trials, text = average_NIRx(np.vstack((oxy_signal[:,i], deoxy_signal[:,i])), nirx_compare, props, trig, fs, text)
-        head_oxy.append(dat_avg[:,0])
-        head_deoxy.append(dat_avg[:,1])
-        head_oxy_std.append(dat_std[:,0])
-        head_deoxy_std.append(dat_std[:,1])
-
-        nirx_compare.nirx_data['all_trials_oxy'].append(data_all_trials[0].T)
-        nirx_compare.nirx_data['all_trials_deoxy'].append(data_all_trials[1].T)
-        all_trials_oxy_continuous_temp = []
-        all_trials_deoxy_continuous_temp = []
-        for j in range(data_all_trials.shape[1]):
-            data_oxy = data_all_trials[0][j,:]
-            data_deoxy = data_all_trials[1][j,:]
-            step_size = int(np.floor(data_all_trials.shape[2]/10))
-            data_oxy_av = []
-            data_deoxy_av = []
-            for k in range(0, 10):  # change 10 to stepsize?
-                data_oxy_av.append(np.mean(data_oxy[k*step_size : k*step_size + step_size]))
-                data_deoxy_av.append(np.mean(data_deoxy[k*step_size : k*step_size + step_size]))
-            all_trials_oxy_continuous_temp.append(data_oxy_av)
-            all_trials_deoxy_continuous_temp.append(data_deoxy_av)
-        all_trials_oxy_continuous_temp = np.asarray(all_trials_oxy_continuous_temp)
-        all_trials_oxy_continuous_temp = np.reshape(all_trials_oxy_continuous_temp, (all_trials_oxy_continuous_temp.shape[0]*all_trials_oxy_continuous_temp.shape[1]))
-        all_trials_deoxy_continuous_temp = np.asarray(all_trials_deoxy_continuous_temp)
-        all_trials_deoxy_continuous_temp = np.reshape(all_trials_deoxy_continuous_temp, (all_trials_deoxy_continuous_temp.shape[0]*all_trials_deoxy_continuous_temp.shape[1]))
-
-        nirx_compare.nirx_data['all_trials_oxy_continuous'][i] = (smooth(all_trials_oxy_continuous_temp, 5))
-        nirx_compare.nirx_data['all_trials_deoxy_continuous'][i] = (smooth(all_trials_deoxy_continuous_temp, 5))
     del i
-    head_oxy = np.asarray(head_oxy).T
-    head_deoxy = np.asarray(head_deoxy).T
-    head_oxy_std = np.asarray(head_oxy_std).T
-    head_deoxy_std = np.asarray(head_deoxy_std).T
-    nirx_compare.nirx_data['all_trials_oxy_continuous'] = np.asarray(nirx_compare.nirx_data['all_trials_oxy_continuous'])
-    nirx_compare.nirx_data['all_trials_oxy_continuous'] = nirx_compare.nirx_data['all_trials_oxy_continuous'].T
-    nirx_compare.nirx_data['all_trials_deoxy_continuous'] = np.asarray(nirx_compare.nirx_data['all_trials_deoxy_continuous'])
-    nirx_compare.nirx_data['all_trials_deoxy_continuous'] = nirx_compare.nirx_data['all_trials_deoxy_continuous'].T
 
-    head_oxy, head_deoxy, head_oxy_std, head_deoxy_std, text = optode_failure_NIRx(head_oxy, head_deoxy, head_oxy_std, head_deoxy_std, props, text)
-
-    if len(props['excluded_channels']) != 0:
-        for excl in range(len(excluded_channels)):
-            head_oxy[:, excluded_channels[excl]-1] = 0
-            head_deoxy[:, excluded_channels[excl]-1] = 0
-            head_oxy_std[:, excluded_channels[excl]-1] = 0
-            head_deoxy_std[:, excluded_channels[excl]-1] = 0
+    # trials x samples x channels x [oxy, deoxy], all outputs are derived from these tensors
+    dat_avg, dat_std, t_trial, data_all_trials, text = epoch_NIRx(oxy_signal, deoxy_signal, nirx_compare, props, trig,
+                                                                  fs, text)
+    head_oxy = dat_avg[:, :, 0]
+    head_deoxy = dat_avg[:, :, 1]
+    head_oxy_std = dat_std[:, :, 0]
+    head_deoxy_std = dat_std[:, :, 1]
+    # per channel samples x trials
+    nirx_compare.nirx_data['all_trials_oxy'] = list(np.moveaxis(data_all_trials[:, :, :, 0], 2, 0).transpose(0, 2, 1))
+    nirx_compare.nirx_data['all_trials_deoxy'] = list(np.moveaxis(data_all_trials[:, :, :, 1], 2, 0).transpose(0, 2, 1))
+
+    # continuous imaging: every trial is split into props['continuous_bins'] bins of equal length which are averaged,
+    # the bins of all trials are put one after the other and smoothed, (trials * bins) x channels
+    bins = int(props['continuous_bins'])
+    step_size = int(np.floor(data_all_trials.shape[1]/bins))
+    data_binned = data_all_trials[:, :bins*step_size].reshape((data_all_trials.shape[0], bins, step_size) +
+                                                               data_all_trials.shape[2:]).mean(axis=2)
+    data_binned = smooth(data_binned.reshape((-1,) + data_all_trials.shape[2:]), 5)
+    nirx_compare.nirx_data['all_trials_oxy_continuous'] = data_binned[:, :, 0]
+    nirx_compare.nirx_data['all_trials_deoxy_continuous'] = data_binned[:, :, 1]
+
+    head_oxy, head_deoxy, head_oxy_std, head_deoxy_std, text = optode_failure_NIRx(head_oxy, head_deoxy, head_oxy_std, head_deoxy_std, nirx_compare.channel_mask, text)
+
+    excluded = nirx_compare.channel_mask.excluded_index
+    head_oxy[:, excluded] = 0
+    head_deoxy[:, excluded] = 0
+    head_oxy_std[:, excluded] = 0
+    head_deoxy_std[:, excluded] = 0
 
     nirx_compare.nirx_data['avg_oxy'] = head_oxy
     nirx_compare.nirx_data['avg_deoxy'] = head_deoxy
@@ -136,66 +109,44 @@ def compare_spectra(nirx_compare, props, data):
     nirx_compare.add(properties=dict(props))
     nirx_compare.properties['t_trial'] = t_trial
     nirx_compare.properties['fs'] = fs
+    # duration of one bin of the continuous imaging in s
+    nirx_compare.properties['continuous_bin_length'] = step_size / fs
     nirx_compare.nirx_data['oxy_Hb'] = oxy_signal
     nirx_compare.nirx_data['deoxy_Hb'] = deoxy_signal
     print('Spectra compare finished')
     text.append('Spectra compare finished')
     return nirx_compare, text
 
-def optode_failure_NIRx(hd_oxy, hd_deoxy, hd_oxy_std, hd_deoxy_std, props, txt):
+def optode_failure_NIRx(hd_oxy, hd_deoxy, hd_oxy_std, hd_deoxy_std, channel_mask, txt):
     '''
     Calculate value for channels specified in optode failure by replacing them with the mean of the replacement channels
     @param hd_oxy: averaged oxy signal
     @param hd_deoxy: averaged deoxy signal
     @param hd_oxy_std: averaged oxy-std signal
     @param hd_deoxy_std: averaged deoxy-std signal
-    @param props: dict object including all defined settings
+    @param channel_mask: ChannelMask object of the measurement
     @param txt: list including prints displayed to self.output_gb in build_gui()
     @return: hd_oxy, hd_deoxy, hd_oxy_std, hd_deoxy_std, txt
     '''
-    optode_failure = props['optode_failure_list']
-
-    if props['optode_failure_val']:
-        failed_channs = []
-        replacement_channs = []
-        for i in range(len(optode_failure[0])):
-            failed_channs.append(optode_failure[0][i])
-            replacement_channs.append(optode_failure[1][i])
-
-        for j in range(len(failed_channs)):
-            print('Optode Failure activated: ch ' + str(failed_channs[i]))
-            txt.append('Optode Failure activated: ch ' + str(failed_channs[i]))
-            tmp1 = []
-            tmp2 = []
-            tmp3 = []
-            tmp4 = []
-            for l in range(len(replacement_channs[j])):
-                tmp1.append(hd_oxy[:, replacement_channs[j][l]-1])
-                tmp2.append(hd_deoxy[:, replacement_channs[j][l]-1])
-                tmp3.append(hd_oxy_std[:, replacement_channs[j][l]-1])
-                tmp4.append(hd_deoxy_std[:, replacement_channs[j][l]-1])
-            tmp1 = np.asarray(tmp1)
-            tmp2 = np.asarray(tmp2)
-            tmp3 = np.asarray(tmp3)
-            tmp4 = np.asarray(tmp4)
-            hd_oxy[:, failed_channs[j]-1] = np.mean(tmp1,axis=0)
-            hd_deoxy[:, failed_channs[j]-1] = np.mean(tmp2,axis=0)
-            hd_oxy_std[:, failed_channs[j]-1] = np.mean(tmp3,axis=0)
-            hd_deoxy_std[:, failed_channs[j]-1] = np.mean(tmp4,axis=0)
+    for failed in channel_mask.failed:
+        print('Optode Failure activated: ch ' + str(failed))
+        txt.append('Optode Failure activated: ch ' + str(failed))
+    channel_mask.replace_failed(hd_oxy, hd_deoxy, hd_oxy_std, hd_deoxy_std)
 
     return hd_oxy, hd_deoxy, hd_oxy_std, hd_deoxy_std, txt
 
 def smooth(arr, win_size):
     '''
-    Smoothes input array with the same behaviour as smooth in MATLAB
-    @param arr: NumPy 1-D array containing the data to be smoothed
+    Smoothes input array with the same behaviour as smooth in MATLAB, along the first axis, i.e. all columns at once
+    @param arr: NumPy array containing the data to be smoothed, samples or samples x ...
     @param win_size: smoothing window size needs, which must be odd number, as in the original MATLAB implementation
     @return: smoothed array
     '''
-    out_0 = np.convolve(arr,np.ones(win_size,dtype=int),'valid')/win_size
-    r = np.arange(1,win_size-1,2)
-    start = np.cumsum(arr[:win_size-1])[::2]/r
-    stop = (np.cumsum(arr[:-win_size:-1])[::2]/r)[::-1]
+    arr = np.asarray(arr, dtype=float)
+    out_0 = sliding_window_view(arr, win_size, axis=0).mean(axis=-1)
+    r = np.arange(1,win_size-1,2).reshape((-1,) + (1,)*(arr.ndim-1))
+    start = np.cumsum(arr[:win_size-1], axis=0)[::2]/r
+    stop = (np.cumsum(arr[:-win_size:-1], axis=0)[::2]/r)[::-1]
     return np.concatenate((start, out_0, stop))
 
 
@@ -235,53 +186,51 @@ def curve_NIRx(oxy_signal, deoxy_signal, props, t, soll_activation, c, data):
                 'signal_analysis_method'] + '_' + props['correction_mode'] + '.eps')
             
 
-def average_NIRx(sig, nirx_av, props, trig, fs, txt):
+def epoch_NIRx(oxy_signal, deoxy_signal, nirx_ep, props, trig, fs, txt):
     '''
-    Calculates averaged signals and subtracts mean of other time points
-    @param sig: input containing both, oxy and deoxy signal as vstacked
-    @param nirx_av: NIRx object of class data_dict including the loaded hdr and xdf data of the selected measurement
+    Cuts the oxy and deoxy signals of all channels into trials with one gather and calculates the averaged signals
+    @param oxy_signal: samples x channels
+    @param deoxy_signal: samples x channels
+    @param nirx_ep: NIRx object of class data_dict including the loaded hdr and xdf data of the selected measurement
     @param props: props: dict object including all defined settings
-    @param trig: array including time points of triggers
+    @param trig: array including time points of triggers, their sample indices are nirx_ep.trigger_index['NIRS']
     @param fs: sampling frequency
     @param txt: list including prints displayed to self.output_gb in build_gui()
-    @return: dat_avg: squeezed data including oxy and deoxy signals
-             dat_std: squeezed std data including oxy and deoxy signals
+    @return: dat_avg: averaged trials, referenced to the mean of the pre-task interval, samples x channels x [oxy, deoxy]
+             dat_std: std of the trials divided by the square root of the number of triggers, samples x channels x
+                      [oxy, deoxy]
              t_trial: time points of trial including pre timing
-             data_ch_all: data including oxy and deoxy signals
+             data_ch_all: trials, each referenced to the mean of its pre-task interval, trials x samples x channels x
+                          [oxy, deoxy]
              txt
     '''
     timing = np.asarray([-int(props['pre_task_length']),
                          int(props['task_length']) + int(props['post_task_length'])])
-
     t_trial = np.arange(round(timing[0]*fs), round(timing[1]*fs))
-    data_av = []
-    data_ch_all = [[], []]
-    sig = sig.T
-    for k in range(0, len(trig)):
-        # Marker offset
-        if props['marker_offset']:
-            diff = nirx_av.time['NIRS'][0] - nirx_av.hdr['markers']['time'][0]
-            diff_idx = round(diff*fs)
-        else:
-            diff_idx = 0
-
-        tmp = np.amin(np.abs(nirx_av.time['NIRS'] - trig[k]))
-        idx = np.where(tmp == np.abs(nirx_av.time['NIRS'] - trig[k]))
-
-        try:
-            data_av.append(sig[idx[0] + diff_idx + t_trial])
-            data_ch_all[0].append(sig[idx[0] + t_trial, 0] - np.mean(sig[idx[0] + t_trial[0:(round(timing[0]*fs)*(-1) +1)], 0]))
-            data_ch_all[1].append(sig[idx[0] + t_trial, 1] - np.mean(sig[idx[0] + t_trial[0:(round(timing[0]*fs)*(-1) +1)], 1]))
-        except:
-            print('Could not process Trigger Nr. ' + str(k))
-            txt.append('Could not process Trigger Nr. ' + str(k))
-    del k
-    data_av = np.asarray(data_av)
-    data_ch_all = np.asarray(data_ch_all)
-    # averaging and smoothing
-
-    dat_avg = np.squeeze(np.mean(data_av, 0))
-    dat_std = np.squeeze(np.std(data_av/np.sqrt(trig.shape[0]), 0, ddof=1))
-    dat_avg = dat_avg - np.mean(dat_avg[0:(timing[0]*fs)*(-1) + 1], axis=0)
-
-    return dat_avg, dat_std, t_trial, data_ch_all, txt
\ No newline at end of file
+    pre_samples = round(timing[0]*fs)*(-1) + 1
+    # samples x channels x [oxy, deoxy]
+    sig = np.stack((oxy_signal, deoxy_signal), axis=2)
+    # Marker offset
+    if props['marker_offset']:
+        diff = nirx_ep.time['NIRS'][0] - nirx_ep.hdr['markers']['time'][0]
+        diff_idx = round(diff*fs)
+    else:
+        diff_idx = 0
+
+    idx = nirx_ep.trigger_index['NIRS']
+    # trials reaching outside of the signal are left out
+    data_av, complete_av = extract_epochs(sig, idx + diff_idx, t_trial[0], t_trial[-1])
+    data_ch_all, complete = extract_epochs(sig, idx, t_trial[0], t_trial[-1])
+    complete = np.logical_and(complete, complete_av)
+    for k in np.flatnonzero(~complete):
+        print('Could not process Trigger Nr. ' + str(k))
+        txt.append('Could not process Trigger Nr. ' + str(k))
+    data_av = data_av[complete]
+    data_ch_all = data_ch_all[complete]
+    data_ch_all = data_ch_all - np.mean(data_ch_all[:, 0:pre_samples], axis=1, keepdims=True)
+
+    dat_avg = np.mean(data_av, 0)
+    dat_std = np.std(data_av/np.sqrt(trig.shape[0]), 0, ddof=1)
+    dat_avg = dat_avg - np.mean(dat_avg[0:pre_samples], axis=0)
+
+    return dat_avg, dat_std, t_trial, data_ch_all, txt
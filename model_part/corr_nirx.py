@@ -1,12 +1,21 @@
 import numpy as np
 from scipy import signal
+from scipy import fft
 from scipy import linalg
 import matplotlib.pyplot as plt
 import os
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+from model_part.rls_nirx import rls_correction
+
+# number of signals corrected together in one task of remove_noise_tf_batch()
+tf_block_size = 32
+# lag_cov() uses FFTs if the number of lags is larger than fft_lag_factor * log2(FFT length)
+fft_lag_factor = 10
 
 def corr_NIRx(oxy_signal, deoxy_signal, nirx_corr, props, txt, data):
     '''
-    Removes physiological induced artefacts by using Transfer Function (TF) models
+    Removes physiological induced artefacts by using Transfer Function (TF) models or an adaptive filter (RLS/NLMS)
     @param oxy_signal: oxy signal
     @param deoxy_signal: deoxy signal
     @param nirx_corr: NIRx object of class data_dict including the loaded hdr and xdf data of the selected
@@ -19,27 +28,6 @@ def corr_NIRx(oxy_signal, deoxy_signal, nirx_corr, props, txt, data):
              txt: list including prints displayed to self.output_gb in build_gui()
     '''
 
-    refused_channels = []
-
-    if props['optode_failure_val']:
-        optode_failure = props['optode_failure_list']
-        failed_channs = []
-
-        for i in range(len(optode_failure[0])):
-            failed_channs.append(optode_failure[0][i])
-
-        for i in range(len(failed_channs)):
-            refused_channels.append(optode_failure[i][0])
-
-    excluded_channels = props['excluded_channels']
-
-    if len(excluded_channels) !=0:
-        for i in range(len(excluded_channels)):
-            refused_channels.append(excluded_channels[i])
-
-    if len(refused_channels) != 0:
-        refused_channels = np.unique(np.asarray(refused_channels))
-
     # temporary variables
     fs = round(nirx_corr.hdr['Sampling Rate'][0])
     if nirx_corr.hdr['Bool']['gUSBamp']:
@@ -212,60 +200,59 @@ def corr_NIRx(oxy_signal, deoxy_signal, nirx_corr, props, txt, data):
             nirx_corr.nirx_data['Downsampled'].update({'Mayer': nirx_corr.nirx_data['Downsampled']['Heart Rate']})
             nirx_corr.nirx_data['Spectra'].update({'F_Window_Mayer': wn_hr})
 
+    # oxy and deoxy of all channels share the noise reference and are corrected at once
     if correction_mode == 2:  # Respiration
         if nirx_corr.hdr['Bool']['gUSBamp']:
             nirx_corr.nirx_data['Clean'] = {}
-            nirx_corr.nirx_data['Clean']['oxy_signals_resp_corr'] = []
-            nirx_corr.nirx_data['Clean']['deoxy_signals_resp_corr'] = []
-            for g in range(oxy_signal.shape[1]):
-                res_oxy = remove_noise_tf(oxy_signal[:, g], nirx_corr.nirx_data['Downsampled']['respiratory'], fs)
-                res_deoxy = remove_noise_tf(deoxy_signal[:, g], nirx_corr.nirx_data['Downsampled']['respiratory'], fs)
-                nirx_corr.nirx_data['Clean']['oxy_signals_resp_corr'].append(res_oxy)
-                nirx_corr.nirx_data['Clean']['deoxy_signals_resp_corr'].append(res_deoxy)
-            oxy_signal = np.asarray(nirx_corr.nirx_data['Clean']['oxy_signals_resp_corr']).T
-            deoxy_signal = np.asarray(nirx_corr.nirx_data['Clean']['deoxy_signals_resp_corr']).T
+            res_oxy, res_deoxy = physio_correction(oxy_signal, deoxy_signal,
+                                                   nirx_corr.nirx_data['Downsampled']['respiratory'], fs, props)
+            nirx_corr.nirx_data['Clean']['oxy_signals_resp_corr'] = list(res_oxy.T)
+            nirx_corr.nirx_data['Clean']['deoxy_signals_resp_corr'] = list(res_deoxy.T)
+            oxy_signal = res_oxy
+            deoxy_signal = res_deoxy
             print('Respiration Correction done')
             txt.append('Respiration Correction done')
 
     if correction_mode == 3:  # Mayer
         nirx_corr.nirx_data['Clean'] = {}
-        nirx_corr.nirx_data['Clean']['oxy_signals_mayer_corr'] = []
-        nirx_corr.nirx_data['Clean']['deoxy_signals_mayer_corr'] = []
-        for g in range(oxy_signal.shape[1]):
-            res_oxy = remove_noise_tf(oxy_signal[:, g], nirx_corr.nirx_data['Downsampled']['Mayer'], fs)
-            res_deoxy = remove_noise_tf(deoxy_signal[:, g], nirx_corr.nirx_data['Downsampled']['Mayer'], fs)
-            nirx_corr.nirx_data['Clean']['oxy_signals_mayer_corr'].append(res_oxy)
-            nirx_corr.nirx_data['Clean']['deoxy_signals_mayer_corr'].append(res_deoxy)
-
-        oxy_signal = np.asarray(nirx_corr.nirx_data['Clean']['oxy_signals_mayer_corr']).T
-        deoxy_signal = np.asarray(nirx_corr.nirx_data['Clean']['deoxy_signals_mayer_corr']).T
+        res_oxy, res_deoxy = physio_correction(oxy_signal, deoxy_signal, nirx_corr.nirx_data['Downsampled']['Mayer'],
+                                               fs, props)
+        nirx_corr.nirx_data['Clean']['oxy_signals_mayer_corr'] = list(res_oxy.T)
+        nirx_corr.nirx_data['Clean']['deoxy_signals_mayer_corr'] = list(res_deoxy.T)
+        oxy_signal = res_oxy
+        deoxy_signal = res_deoxy
         print('Mayer Waves Correction done')
         txt.append('Mayer Waves Correction done')
 
-    if correction_mode == 4:  # Mayer and Respiration
+    # Mayer and Respiration in one model, the adaptive filter always uses both references at once
+    if correction_mode == 4 and (props['tf_model'] == 'Joint' or
+                                 props['signal_analysis_method'] == 'RLS (Adaptive Filter)'):
         if nirx_corr.hdr['Bool']['gUSBamp']:
             nirx_corr.nirx_data['Clean'] = {}
-            nirx_corr.nirx_data['Clean']['oxy_signals_resp_corr'] = []
-            nirx_corr.nirx_data['Clean']['deoxy_signals_resp_corr'] = []
-            for g in range(oxy_signal.shape[1]):
-                res_oxy = remove_noise_tf(oxy_signal[:, g], nirx_corr.nirx_data['Downsampled']['respiratory'], fs)
-                res_deoxy = remove_noise_tf(deoxy_signal[:, g], nirx_corr.nirx_data['Downsampled']['respiratory'], fs)
-                nirx_corr.nirx_data['Clean']['oxy_signals_resp_corr'].append(res_oxy)
-                nirx_corr.nirx_data['Clean']['deoxy_signals_resp_corr'].append(res_deoxy)
-
+            noise = np.stack((nirx_corr.nirx_data['Downsampled']['respiratory'],
+                              nirx_corr.nirx_data['Downsampled']['Mayer']), axis=1)
+            res_oxy, res_deoxy = physio_correction(oxy_signal, deoxy_signal, noise, fs, props)
+            nirx_corr.nirx_data['Clean']['oxy_signals_mayer_resp_corr'] = list(res_oxy.T)
+            nirx_corr.nirx_data['Clean']['deoxy_signals_mayer_resp_corr'] = list(res_deoxy.T)
+            oxy_signal = res_oxy
+            deoxy_signal = res_deoxy
+        print('Respiration and Mayer Waves Correction done (joint model)')
+        txt.append('Respiration and Mayer Waves Correction done (joint model)')
+
+    elif correction_mode == 4:  # Mayer and Respiration, respiration first and Mayer waves on the residual
         if nirx_corr.hdr['Bool']['gUSBamp']:
-            nirx_corr.nirx_data['Clean']['oxy_signals_mayer_resp_corr'] = []
-            nirx_corr.nirx_data['Clean']['deoxy_signals_mayer_resp_corr'] = []
-            for g in range(oxy_signal.shape[1]):
-                res_oxy = remove_noise_tf(nirx_corr.nirx_data['Clean']['oxy_signals_resp_corr'][g],
-                                          nirx_corr.nirx_data['Downsampled']['Mayer'], fs)
-                res_deoxy = remove_noise_tf(nirx_corr.nirx_data['Clean']['deoxy_signals_resp_corr'][g],
-                                            nirx_corr.nirx_data['Downsampled']['Mayer'], fs)
-                nirx_corr.nirx_data['Clean']['oxy_signals_mayer_resp_corr'].append(res_oxy)
-                nirx_corr.nirx_data['Clean']['deoxy_signals_mayer_resp_corr'].append(res_deoxy)
-
-            oxy_signal = np.asarray(nirx_corr.nirx_data['Clean']['oxy_signals_mayer_resp_corr']).T
-            deoxy_signal = np.asarray(nirx_corr.nirx_data['Clean']['deoxy_signals_mayer_resp_corr']).T
+            nirx_corr.nirx_data['Clean'] = {}
+            res_oxy, res_deoxy = physio_correction(oxy_signal, deoxy_signal,
+                                                   nirx_corr.nirx_data['Downsampled']['respiratory'], fs, props)
+            nirx_corr.nirx_data['Clean']['oxy_signals_resp_corr'] = list(res_oxy.T)
+            nirx_corr.nirx_data['Clean']['deoxy_signals_resp_corr'] = list(res_deoxy.T)
+
+            res_oxy, res_deoxy = physio_correction(res_oxy, res_deoxy, nirx_corr.nirx_data['Downsampled']['Mayer'],
+                                                   fs, props)
+            nirx_corr.nirx_data['Clean']['oxy_signals_mayer_resp_corr'] = list(res_oxy.T)
+            nirx_corr.nirx_data['Clean']['deoxy_signals_mayer_resp_corr'] = list(res_deoxy.T)
+            oxy_signal = res_oxy
+            deoxy_signal = res_deoxy
         print('Respiration and Mayer Waves Correction done')
         txt.append('Respiration and Mayer Waves Correction done')
 
@@ -301,15 +288,56 @@ def x_cov(arr_1, arr_2, max_lag_len):
     @param max_lag_len: defines how many entries from the middle point of the auto- or crosscovariance are considered
     @return: result: returns auto- or cross covariance of length -max_lang_length until +max_lag_length
     '''
-    result = signal.correlate(arr_1 - arr_1.mean(), arr_2 - arr_2.mean(), mode='full')
-    result = result / arr_1.shape[0]
-    len_interval = (max_lag_len * 2) + 1
-    if result.shape[0] < (len_interval):
-        num_to_pad = int((len_interval - result.shape[0]) / 2)
-        result = np.pad(result, (num_to_pad, num_to_pad), 'constant', constant_values=(0, 0))
+    return lag_cov(arr_1, arr_2, max_lag_len)
+
+def lag_cov(arr_1, arr_2, max_lag_len, min_lag_len=None, method='auto'):
+    '''
+    Bounded-lag auto- or cross-covariance of one or many signals,
+    result[lag - min_lag_len] = sum(arr_1[t + lag] * arr_2[t]) / samples of the mean free signals, zero for
+    |lag| >= samples. Only the lags min_lag_len..max_lag_len are computed, either directly with one dot product per lag
+    or, if there are many lags compared to the cost of a FFT, from the FFTs of all signals at once.
+    @param arr_1: input array 1, samples or samples x signals
+    @param arr_2: input array 2, samples (one reference for all signals) or samples x signals
+    @param max_lag_len: largest lag
+    @param min_lag_len: smallest lag, -max_lag_len if None
+    @param method: 'direct', 'fft' or 'auto'
+    @return: result: lags x signals, lags if arr_1 and arr_2 are one-dimensional
+    '''
+    if min_lag_len is None:
+        min_lag_len = -max_lag_len
+    one_dim = arr_1.ndim == 1 and arr_2.ndim == 1
+    n = arr_1.shape[0]
+    arr_1 = np.reshape(arr_1, (n, -1))
+    arr_1 = arr_1 - arr_1.mean(axis=0)
+    arr_2 = arr_2 - arr_2.mean(axis=0)
+    lags = np.arange(min_lag_len, max_lag_len + 1)
+    max_abs_lag = int(np.abs(lags).max())
+    nfft = fft.next_fast_len(n + max_abs_lag, real=True)
+    if method == 'auto':
+        method = 'fft' if lags.shape[0] > fft_lag_factor * np.log2(nfft) else 'direct'
+
+    result = np.zeros((lags.shape[0], arr_1.shape[1]))
+    if method == 'direct':
+        for i, lag in enumerate(lags):
+            if abs(lag) >= n:
+                continue
+            if lag >= 0:
+                part_1, part_2 = arr_1[lag:], arr_2[:n - lag]
+            else:
+                part_1, part_2 = arr_1[:n + lag], arr_2[-lag:]
+            if part_2.ndim == 1:
+                result[i] = part_2.dot(part_1)
+            else:
+                result[i] = np.einsum('ij,ij->j', part_1, part_2)
     else:
-        indx = int((result.shape[0] / 2))
-        result = result[indx - max_lag_len: indx + max_lag_len + 1]
+        # circular cross-correlation, nfft >= samples + largest lag, so the needed lags are not wrapped around
+        spectrum = fft.rfft(arr_1, nfft, axis=0) * np.conj(fft.rfft(np.reshape(arr_2, (n, -1)), nfft, axis=0))
+        circular = fft.irfft(spectrum, nfft, axis=0)
+        valid = np.abs(lags) < n
+        result[valid] = circular[lags[valid] % nfft]
+    result = result / n
+    if one_dim:
+        return result[:, 0]
     return result
 
 def remove_noise_tf(signal_in, noise, fs):
@@ -356,6 +384,193 @@ def remove_noise_tf(signal_in, noise, fs):
     corr_signal = signal_in - corr
     return corr_signal
 
+def physio_correction(oxy_signal, deoxy_signal, noise, fs, props):
+    '''
+    Removes a noise reference from oxy and deoxy signals of all channels with the selected signal analysis method
+    @param oxy_signal: samples x channels
+    @param deoxy_signal: samples x channels
+    @param noise: noise signal (respiration, HR), or samples x 2 for both
+    @param fs: sampling rate
+    @param props: dict object including all defined settings
+    @return: oxy_signal: corrected oxy signal, samples x channels
+             deoxy_signal: corrected deoxy signal, samples x channels
+    '''
+    if props['signal_analysis_method'] == 'RLS (Adaptive Filter)':
+        return rls_correction(oxy_signal, deoxy_signal, noise, props)
+    return tf_correction(oxy_signal, deoxy_signal, noise, fs, props['tf_workers'])
+
+
+def tf_correction(oxy_signal, deoxy_signal, noise, fs, workers=1):
+    '''
+    Applies the transfer function correction to oxy and deoxy signals of all channels with the same noise reference
+    @param oxy_signal: samples x channels
+    @param deoxy_signal: samples x channels
+    @param noise: noise signal from a different source (respiration, HR), or samples x 2 for the joint model of two
+                  noise signals, see part_tf_joint()
+    @param fs: sampling frequency
+    @param workers: number of worker processes, 1 to run in this process
+    @return: oxy_signal: corrected oxy signal, samples x channels
+             deoxy_signal: corrected deoxy signal, samples x channels
+    '''
+    channels = oxy_signal.shape[1]
+    corr_signals = remove_noise_tf_batch(np.concatenate((oxy_signal, deoxy_signal), axis=1), noise, fs, workers)
+    return corr_signals[:, :channels], corr_signals[:, channels:]
+
+def remove_noise_tf_batch(signals_in, noise, fs, workers=1):
+    '''
+    Batched version of remove_noise_tf() for several signals with the same noise reference. The noise statistics and
+    the Toeplitz systems are computed once per window and solved for all signals at once.
+    The windows and blocks of tf_block_size signals are independent tasks. With more than one worker they are spread
+    over a process pool, the input and output arrays are put into shared memory so they are not pickled per task.
+    The tasks are the same as in the serial case, so the result does not depend on the number of workers.
+    @param signals_in: signals with noise, samples x signals
+    @param noise: noise signal from a different source (respiration, HR), or samples x 2 for the joint model
+    @param fs: sampling frequency
+    @param workers: number of worker processes, 1 to run in this process
+    @return: corr_signals: corrected signals without influence of noise, samples x signals
+    '''
+    window_length = 240
+    mmax = 15
+    seq = fs * window_length
+    signals_in = np.asarray(signals_in, dtype=float)
+    noise = np.asarray(noise, dtype=float)
+    tasks = [(onset, min(onset + seq, signals_in.shape[0]), first, min(first + tf_block_size, signals_in.shape[1]))
+             for onset in range(0, signals_in.shape[0], seq) for first in range(0, signals_in.shape[1], tf_block_size)]
+
+    if workers <= 1 or len(tasks) == 1:
+        corr = np.zeros(signals_in.shape)
+        for onset, ending, first, last in tasks:
+            corr[onset:ending, first:last] = tf_window(signals_in, noise, onset, ending, first, last, mmax)
+        return signals_in - corr
+
+    shms = [shared_memory.SharedMemory(create=True, size=max(arr.nbytes, 1))
+            for arr in [signals_in, noise, signals_in]]
+    try:
+        np.ndarray(signals_in.shape, dtype=float, buffer=shms[0].buf)[:] = signals_in
+        np.ndarray(noise.shape, dtype=float, buffer=shms[1].buf)[:] = noise
+        names = [shm.name for shm in shms]
+        with ProcessPoolExecutor(max_workers=min(workers, len(tasks))) as executor:
+            futures = [executor.submit(tf_window_task, names, signals_in.shape, noise.shape, mmax, *task) for task in tasks]
+            for future in futures:
+                future.result()
+        corr = np.array(np.ndarray(signals_in.shape, dtype=float, buffer=shms[2].buf))
+    finally:
+        for shm in shms:
+            shm.close()
+            shm.unlink()
+    return signals_in - corr
+
+def tf_window(signals_in, noise, onset, ending, first, last, mmax):
+    '''
+    Correction terms of one window of a block of signals, see remove_noise_tf_batch()
+    @param signals_in: signals with noise, samples x signals
+    @param noise: noise signal, or samples x 2 for the joint model
+    @param onset: first sample of the window
+    @param ending: sample after the window
+    @param first: first signal of the block
+    @param last: signal after the block
+    @param mmax: maximum model order
+    @return: corr_p: correction terms, (ending - onset) x (last - first)
+    '''
+    if onset == 0:
+        noise_e = np.concatenate((np.repeat(noise[:1], mmax, axis=0), noise[onset:ending]))
+    else:
+        noise_e = noise[onset - mmax: ending]
+    if noise_e.ndim == 2:
+        return part_tf_joint(noise_e, signals_in[onset:ending, first:last], mmax)
+    return part_tf_batch(noise_e, signals_in[onset:ending, first:last], mmax)
+
+def tf_window_task(names, shape, noise_shape, mmax, onset, ending, first, last):
+    '''
+    Runs tf_window() in a worker process on the shared memory blocks of remove_noise_tf_batch()
+    @param names: names of the shared memory blocks of the signals, the noise and the correction terms
+    @param shape: samples x signals
+    @param noise_shape: shape of the noise
+    @param mmax: maximum model order
+    @param onset, ending, first, last: window and block of signals, see tf_window()
+    '''
+    shms = [shared_memory.SharedMemory(name=name) for name in names]
+    try:
+        signals_in = np.ndarray(shape, dtype=float, buffer=shms[0].buf)
+        noise = np.ndarray(noise_shape, dtype=float, buffer=shms[1].buf)
+        corr = np.ndarray(shape, dtype=float, buffer=shms[2].buf)
+        corr[onset:ending, first:last] = tf_window(signals_in, noise, onset, ending, first, last, mmax)
+        del signals_in, noise, corr
+    finally:
+        for shm in shms:
+            shm.close()
+
+def part_tf_batch(noise_e, signals_p, mmax):
+    '''
+    Batched version of part_tf() for several signals with the same noise
+    @param noise_e: noise, including mmax samples before the window
+    @param signals_p: signals, samples x signals
+    @param mmax: pre-defined as 15 in remove_noise_tf_batch()
+    @return: corr_p: correction terms, samples x signals
+    '''
+    noise_p = noise_e[mmax:]
+    n = noise_p.shape[0]
+    mmin = 5
+    g_yy = lag_cov(noise_p, noise_p, mmax, 0)  # lags 0..mmax
+    g_xy = lag_cov(signals_p, noise_p, mmax, 0)  # lags 0..mmax x signals
+    g_xx0 = lag_cov(signals_p, signals_p, 0)[0]
+
+    lamb = np.zeros((mmax - mmin + 1, signals_p.shape[1]))
+    gu = np.zeros((mmax - mmin + 1, mmax + 1, signals_p.shape[1]))
+    # all model orders of all signals out of one order recursion
+    for m, gu_m in enumerate(levinson_orders(g_yy, g_xy, mmin), mmin):
+        gu[m - mmin, :m + 1] = gu_m
+        Snn = g_xx0 - np.sum(gu_m * g_xy[:m + 1], axis=0)
+        lamb[m - mmin] = n * np.log(Snn) + 2 * (m + 1)
+
+    # coefficients of the best model order of every signal, signals x (mmax + 1), zero above the order
+    b = gu[np.argmin(lamb, axis=0), :, np.arange(signals_p.shape[1])]
+    # FIR filtering of the noise with the coefficients of all signals, noise_e[mmax + i - j] for lag j
+    lagged = np.stack([noise_e[mmax - j: mmax - j + n] for j in range(mmax + 1)], axis=1)
+    corr_p = lagged.dot(b.T)
+    return corr_p
+
+def part_tf_joint(noise_e, signals_p, mmax):
+    '''
+    Transfer function model with two noise inputs, e.g. respiration and Mayer waves, for several signals. Both noise
+    signals are regressed in one model with the same order m, the normal equations are a block-Toeplitz system
+    [[G_11, G_12], [G_12^T, G_22]], which is factorized once per model order and window and solved for all signals.
+    The model order is selected like in part_tf() with 2 * (m + 1) parameters.
+    @param noise_e: noise, including mmax samples before the window, samples x 2
+    @param signals_p: signals, samples x signals
+    @param mmax: pre-defined as 15 in remove_noise_tf_batch()
+    @return: corr_p: correction terms, samples x signals
+    '''
+    noise_p = noise_e[mmax:]
+    n = noise_p.shape[0]
+    mmin = 5
+    order = mmax + 1
+    g_11 = lag_cov(noise_p[:, 0], noise_p[:, 0], mmax, 0)
+    g_22 = lag_cov(noise_p[:, 1], noise_p[:, 1], mmax, 0)
+    # cov(noise_1[t - i], noise_2[t - j]) = g_12[mmax + j - i]
+    g_12 = lag_cov(noise_p[:, 0], noise_p[:, 1], mmax)
+    lags = np.arange(order)
+    G_12 = g_12[mmax + lags[np.newaxis, :] - lags[:, np.newaxis]]
+    # lags 0..mmax of the first noise, followed by lags 0..mmax of the second noise, x signals
+    g_xy = np.concatenate((lag_cov(signals_p, noise_p[:, 0], mmax, 0), lag_cov(signals_p, noise_p[:, 1], mmax, 0)))
+    g_xx0 = lag_cov(signals_p, signals_p, 0)[0]
+
+    lamb = np.zeros((mmax - mmin + 1, signals_p.shape[1]))
+    gu = np.zeros((mmax - mmin + 1, 2 * order, signals_p.shape[1]))
+    for m in range(mmin, mmax + 1):
+        rows = np.concatenate((lags[:m + 1], order + lags[:m + 1]))
+        G = np.block([[linalg.toeplitz(g_11[:m + 1]), G_12[:m + 1, :m + 1]],
+                      [G_12[:m + 1, :m + 1].T, linalg.toeplitz(g_22[:m + 1])]])
+        gu[m - mmin, rows] = linalg.cho_solve(linalg.cho_factor(G), g_xy[rows])
+        Snn = g_xx0 - np.sum(gu[m - mmin, rows] * g_xy[rows], axis=0)
+        lamb[m - mmin] = n * np.log(Snn) + 2 * 2 * (m + 1)
+
+    b = gu[np.argmin(lamb, axis=0), :, np.arange(signals_p.shape[1])]
+    lagged = np.concatenate([np.stack([noise_e[mmax - j: mmax - j + n, k] for j in range(order)], axis=1)
+                             for k in range(2)], axis=1)
+    corr_p = lagged.dot(b.T)
+    return corr_p
+
 def part_tf(noise_e, signal_p, mmax):
     '''
     Implementation of the transfer function equations from [3].
@@ -371,14 +586,11 @@ def part_tf(noise_e, signal_p, mmax):
     g_xx0 = x_cov(signal_p, signal_p, 0)
     index = mmax  # no need for + 1
     lamb = np.zeros(mmax - mmin + 1)
-    gu = []
+    # solutions of the Toeplitz systems of all model orders m out of one order recursion
+    gu = levinson_orders(g_yy[index:], g_xy[index:], mmin)
     for m in range(mmin, mmax + 1):
         g_xy_pj = g_xy[index:index + m + 1]
-        g_yy_uj = g_yy[index:index + m + 1]
-        G = linalg.toeplitz(g_yy_uj)
-        g_xy_pj = np.reshape(g_xy_pj, (g_xy_pj.shape[0], 1))
-        gu.append(np.linalg.inv(G).dot(g_xy_pj))
-        Snn = g_xx0 - np.dot(gu[m - 5].T, g_xy_pj)
+        Snn = g_xx0 - np.dot(gu[m - mmin], g_xy_pj)
         lamb[m - mmin] = noise_p.shape[0] * np.log(Snn) + 2 * (m + 1)
 
     min_indx = np.argmin(lamb)
@@ -390,6 +602,30 @@ def part_tf(noise_e, signal_p, mmax):
     corr_p = S[mmax:]
     return corr_p
 
+def levinson_orders(r, y, mmin):
+    '''
+    Solves the symmetric Toeplitz systems toeplitz(r[:m + 1]) x = y[:m + 1] of all orders m = mmin..len(r) - 1 with the
+    order recursion of Levinson and Durbin, O(len(r)^2) operations for all orders together and no explicit inverse
+    @param r: first column of the Toeplitz matrix of the highest order, e.g. autocovariance of lags 0..mmax
+    @param y: right hand sides, (mmax + 1) or (mmax + 1) x signals
+    @param mmin: lowest order
+    @return: solutions: list of the solutions of the orders mmin..mmax, solutions[m - mmin] has m + 1 rows
+    '''
+    f = np.array([1 / r[0]])  # forward vector, toeplitz(r[:k]).dot(f) = [1, 0, ..., 0]
+    x = y[:1] / r[0]
+    solutions = []
+    if mmin == 0:
+        solutions.append(x)
+    for k in range(1, r.shape[0]):
+        # error of the extended vectors in the new last row, the backward vector is the reversed forward vector
+        ef = r[k:0:-1].dot(f)
+        f = (np.append(f, 0) - ef * np.append(0, f[::-1])) / (1 - ef ** 2)
+        ex = r[k:0:-1].dot(x)
+        x = np.concatenate((x, np.zeros_like(x[:1]))) + np.multiply.outer(f[::-1], y[k] - ex)
+        if k >= mmin:
+            solutions.append(x)
+    return solutions
+
 def find_peak(pw_lf, one_pw_lf, two_pw_lf):
     '''
 
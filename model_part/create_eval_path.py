@@ -20,9 +20,11 @@ def create_eval_path(self, data, props):
         for i in range(len(data.xdf['selected_xdf_files'])):
             filename_xdf.append(os.path.join(data.xdf['path'], data.xdf['selected_xdf_files'][i]))
         del i
-    # until now, do it only for one xdf file
+    # several files are analysed as one session, named by the first run and the number of runs
     file_path = os.path.join(data.analysis_path_main, 'Analysis')
     file_name = os.path.splitext(os.path.basename(os.path.normpath(filename_xdf[0])))[0]
+    if nr_xdf > 1:
+        file_name = file_name + '_' + str(nr_xdf) + 'runs'
     xdf_path = data.xdf['path']
     task = props['task_name']
     condition = props['chosen_condition']
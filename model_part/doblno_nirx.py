@@ -1,6 +1,17 @@
+import time as tm
+from fractions import Fraction
 import numpy as np
 from scipy import signal
 
+# sampling rate of the NIRS signals after resampling
+resample_fs = 4
+# the resampling factor up / down is approximated so that up and down are not larger than resample_max_factor, the
+# polyphase filter has 20 * max(up, down) + 1 taps
+resample_max_factor = 1000
+# designed polyphase filters by (fs_in, fs_out), see plan_resampling()
+resample_filters = dict()
+
+
 def doblno_nirx(nirx_doblno, props):
     '''
     Applies low pass filter and baseline removal if selected
@@ -14,11 +25,19 @@ def doblno_nirx(nirx_doblno, props):
     deoxy_signal = nirx_doblno.nirx_data['Concentration']['raw']['deoxy']
     fs = nirx_doblno.hdr['Sampling Rate'][0]
 
-    # Resampling oxy- and deoxy-Hb signal --> 4 Hz
-    ds_up = np.round(4 * 10000)
-    ds_down = np.round(fs * 10000)
-    oxy_signal = signal.resample_poly(oxy_signal, ds_up, ds_down, window=('kaiser', 5))
-    deoxy_signal = signal.resample_poly(deoxy_signal, ds_up, ds_down, window=('kaiser', 5))
+    # Resampling oxy- and deoxy-Hb signal --> 4 Hz, both in one call
+    resample_start = tm.perf_counter()
+    ds_up, ds_down, h = plan_resampling(fs, resample_fs)
+    if h is not None:
+        channels = oxy_signal.shape[1]
+        resampled = signal.resample_poly(np.concatenate((oxy_signal, deoxy_signal), axis=1), ds_up, ds_down, axis=0,
+                                         window=h)
+        oxy_signal = resampled[:, :channels]
+        deoxy_signal = resampled[:, channels:]
+    message = 'Resampled from %s Hz to %s Hz (up %d, down %d, %d filter taps) in %.2f s' % (
+        str(fs), str(resample_fs), ds_up, ds_down, 0 if h is None else h.shape[0], tm.perf_counter() - resample_start)
+    print(message)
+    text.append(message)
     fs = round(fs * ds_up / ds_down)  # should be 4
     nirx_doblno.hdr['Sampling Rate'][0] = fs
     if props['low_pass']:
@@ -44,3 +63,31 @@ def doblno_nirx(nirx_doblno, props):
     print('Baseline removal and TP filtering done')
     text.append('Baseline removal and TP filtering done')
     return nirx_doblno, text
+
+
+def plan_resampling(fs_in, fs_out):
+    '''
+    Finds the rational resampling factor up / down from fs_in to fs_out and the anti-aliasing FIR filter of
+    signal.resample_poly for it. The factor is exact if up and down are not larger than resample_max_factor, otherwise
+    the nearest factor within this bound is used, so the filter length stays bounded. The filter is designed once per
+    (fs_in, fs_out) like resample_poly does with window=('kaiser', 5).
+    @param fs_in: sampling rate of the signal
+    @param fs_out: sampling rate after resampling
+    @return: up: upsampling factor
+             down: downsampling factor
+             h: FIR filter coefficients to pass as window to resample_poly, None if up == down == 1
+    '''
+    key = (float(fs_in), float(fs_out))
+    if key not in resample_filters:
+        ratio = Fraction(fs_out) / Fraction(fs_in)
+        if ratio <= 1:
+            ratio = ratio.limit_denominator(resample_max_factor)
+        else:
+            ratio = 1 / (1 / ratio).limit_denominator(resample_max_factor)
+        up, down = ratio.numerator, ratio.denominator
+        h = None
+        if up != 1 or down != 1:
+            max_rate = max(up, down)
+            h = signal.firwin(2 * 10 * max_rate + 1, 1. / max_rate, window=('kaiser', 5))
+        resample_filters[key] = (up, down, h)
+    return resample_filters[key]
@@ -0,0 +1,55 @@
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+
+def extract_epochs(sig, trig, pre, post, fill_value=np.nan):
+    '''
+    Cuts a continuous signal into segments around trigger samples without copying or padding the whole signal. The
+    segments are taken from a sliding window view of the signal with one fancy index, only the segments themselves are
+    copied. Samples of segments reaching over the start or the end of the signal are set to fill_value.
+    @param sig: continuous signal, samples or samples x channels
+    @param trig: trigger points, counted in samples
+    @param pre: offset of the start of each segment relative to the trigger, counted in samples (negative before)
+    @param post: offset of the last sample of each segment relative to the trigger, counted in samples
+    @param fill_value: value of the samples outside of the signal
+    @return: epochs: trials x samples, or trials x samples x channels for a 2-D signal
+             complete: bool per trial, False if the segment reaches outside of the signal
+    '''
+    sig = np.asarray(sig)
+    trig = np.round(np.asarray(trig, dtype=float)).astype(int).reshape(-1)
+    length = int(post) - int(pre) + 1
+    starts = trig + int(pre)
+    complete = np.logical_and(starts >= 0, starts + length <= sig.shape[0])
+
+    if np.any(complete):
+        # windows[i] are the samples i ... i + length - 1, the channels are moved behind the window axis
+        windows = np.moveaxis(sliding_window_view(sig, length, axis=0), -1, 1)
+        if np.all(complete):
+            return windows[starts], complete
+
+    dtype = np.result_type(sig.dtype, np.asarray(fill_value).dtype)
+    epochs = np.full((trig.shape[0], length) + sig.shape[1:], fill_value, dtype=dtype)
+    if np.any(complete):
+        epochs[complete] = windows[starts[complete]]
+    for m in np.flatnonzero(~complete):
+        first = max(starts[m], 0)
+        last = min(starts[m] + length, sig.shape[0])
+        if first < last:
+            epochs[m, first - starts[m]:last - starts[m]] = sig[first:last]
+    return epochs, complete
+
+
+def trigger_samples(time, trig):
+    '''
+    Maps trigger time points to the indices of the nearest samples of a stream with np.searchsorted. For time points in
+    the middle of two samples the earlier sample is taken.
+    @param time: increasing time stamps of the stream, samples or samples x 1
+    @param trig: time points of the triggers
+    @return: idx: sample index per trigger
+    '''
+    time = np.asarray(time).reshape(-1)
+    trig = np.asarray(trig, dtype=float).reshape(-1)
+    right = np.clip(np.searchsorted(time, trig, side='left'), 1, time.shape[0] - 1)
+    left = right - 1
+    # the right sample only if it is strictly nearer
+    return np.where(np.abs(time[right] - trig) < np.abs(time[left] - trig), right, left)
@@ -8,6 +8,7 @@ matplotlib.use('Agg')
 
 ### functions import
 from model_part.calculate_concentration_change import calculate_conc_change
+from model_part.epochs import extract_epochs, trigger_samples
 
 
 def generate_biosignals(nirx_bio, props, data):
@@ -119,10 +120,16 @@ def generate_biosignals(nirx_bio, props, data):
             respiration_temporary = nirx_bio.nirx_data['Respiration'] * (-1)
             nirx_bio.nirx_data['Respiration'] = respiration_temporary
 
+        # sample index of each trigger per stream, used by all following stages
+        trigger_index = {'NIRS': trigger_samples(nirx_bio.time['NIRS'], trig)}
+        if nirx_bio.hdr['Bool']['gUSBamp']:
+            trigger_index['gUSBamp'] = trigger_samples(nirx_bio.time['gUSBamp'], trig)
+        nirx_bio.add(trigger_index=trigger_index)
+
         curve_phyisio(nirx_bio, data, gUSBamp_fs=gUSBamp_fs)
         text = averaging_physio(nirx_bio, props, data, image_class_string, trig=trig, gUSBamp_fs=gUSBamp_fs, txt=text)
 
-        deoxy_signal, oxy_signal = calculate_conc_change(nirx_bio)
+        deoxy_signal, oxy_signal = calculate_conc_change(nirx_bio, props)
 
         if np.isnan(deoxy_signal).any() or np.isnan(oxy_signal).any():
             print('Error with Concentration Calculation!')
@@ -214,22 +221,18 @@ def averaging_physio(nirx_av_physio, props, data, image_class, trig, gUSBamp_fs,
                                     round(timing[1] * gUSBamp_fs))
         t_trial_gUSBamp_size = t_trial_gUSBamp.size
     data_channel_gUSBamp = np.zeros((trig.shape[0], 1, t_trial_gUSBamp.shape[0]))
-    for k in range(1, trig.shape[0]):
-        try:
-            if nirx_av_physio.hdr['Bool']['gUSBamp']:
-                tmp = np.amin(np.abs(nirx_av_physio.time['gUSBamp'] - trig[k]))
-                idy = np.where(tmp == np.abs(nirx_av_physio.time['gUSBamp'] - trig[k]))[0]
-                b = (timing[0] * gUSBamp_fs) * (-1) + 1  # 1281
-                a = t_trial_gUSBamp[0:b]  # x 1281
-                c = nirx_av_physio.nirx_data['Heart Rate'][idy + a]
-                d = np.mean(c)
-                data_channel_gUSBamp[k, 0, :] = nirx_av_physio.nirx_data['Heart Rate'][idy + t_trial_gUSBamp] - d
-        except:
+    if nirx_av_physio.hdr['Bool']['gUSBamp']:
+        idy = nirx_av_physio.trigger_index['gUSBamp']
+        # all trials at once, each referenced to the mean of its pre-task interval
+        epochs, complete = extract_epochs(nirx_av_physio.nirx_data['Heart Rate'], idy, t_trial_gUSBamp[0],
+                                          t_trial_gUSBamp[-1])
+        b = (timing[0] * gUSBamp_fs) * (-1) + 1  # 1281
+        baseline = np.mean(epochs[:, 0:int(b)], axis=1, keepdims=True)
+        data_channel_gUSBamp[complete, 0, :] = (epochs - baseline)[complete]
+        for k in np.flatnonzero(~complete):
             print('Could not process Trigger Nr. %s' % str(k))
             txt.append('Could not process Trigger Nr. %s' % str(k))
 
-    del k, idy
-
     # averaging and smoothing
     if nirx_av_physio.hdr['Bool']['gUSBamp']:
         data_avg_gUSBamp = np.squeeze(np.mean(data_channel_gUSBamp[:, 0, :], 0))
@@ -19,7 +19,8 @@ def generate_headplot(nirx_head, props, data):
         head_oxy = nirx_head.nirx_data['all_trials_oxy_continuous']
         head_deoxy = nirx_head.nirx_data['all_trials_deoxy_continuous']
         t_trial = np.arange(1, head_oxy.shape[0]+1)
-        t_trial = t_trial * 2*len(props['available_conditions']) / 60  # * nr. of conditions / convert to minutes
+        bin_length = nirx_head.properties['continuous_bin_length']
+        t_trial = t_trial * bin_length*len(props['available_conditions']) / 60  # * nr. of conditions / convert to minutes
 
     head_oxy_std = nirx_head.nirx_data['avg_oxy_std']
     head_deoxy_std = nirx_head.nirx_data['avg_deoxy_std']
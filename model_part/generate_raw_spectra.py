@@ -2,7 +2,15 @@ import numpy as np
 from scipy import signal
 import matplotlib.pyplot as plt
 import os
-import copy
+import hashlib
+from model_part.array_cache import ArrayCache
+
+# parameters of the welch method: window length and overlap in seconds, fft length in seconds times the sampling rate
+window_length = 100
+window_overlap = 50
+fft_length = 200
+# entries of the spectra cache with another version are calculated again
+spectra_cache_version = 1
 
 
 def generate_raw_spectra(nirx_raw, props, data):
@@ -18,37 +26,14 @@ def generate_raw_spectra(nirx_raw, props, data):
     print('RAW Spectra start')
     text.append('RAW Spectra start')
 
-    oxy_signal = nirx_raw.nirx_data['Concentration']['raw'][
-        'oxy']
-    oxy_signal1 = copy.deepcopy(
-        oxy_signal)  # these two are only needed for excluding the channels while calculating the spectra
-    deoxy_signal = nirx_raw.nirx_data['Concentration']['raw'][
-        'deoxy']
-    deoxy_signal1 = copy.deepcopy(
-        deoxy_signal)  # hence, the original oxy-deoxy signals remain untouched, these can be seen as a copy
-
-    excluded_channels = props['excluded_channels']
-
-    if len(excluded_channels) != 0:
-        for i in range(len(excluded_channels)):
-            oxy_signal1[:, excluded_channels[i] - 1] = np.NaN  # -1 for index correction
-            deoxy_signal1[:, excluded_channels[i] - 1] = np.NaN
-
-    if props['optode_failure_val']:
-        optode_failure = props['optode_failure_list']
-        failed_channs = []
-
-        for i in range(len(optode_failure[0])):
-            failed_channs.append(optode_failure[0][i])
-
-        for i in range(len(failed_channs)):
-            oxy_signal1[:, failed_channs[i] - 1] = np.NaN
-            deoxy_signal1[:, failed_channs[i] - 1] = np.NaN
-
+    oxy_signal = nirx_raw.nirx_data['Concentration']['raw']['oxy']
+    deoxy_signal = nirx_raw.nirx_data['Concentration']['raw']['deoxy']
+    channels = nirx_raw.channel_mask.channels  # without excluded and optode failure channels
 
     fs = nirx_raw.hdr['Sampling Rate'][0]
     nirx_raw.nirx_data['Spectra'] = {}
-    nirx_raw, spectra, fig, text = calc_NIRS_spectra(oxy_signal1, deoxy_signal1, nirx_raw, fs, props, text)
+    nirx_raw, spectra, fig, text = calc_NIRS_spectra(oxy_signal, deoxy_signal, nirx_raw, fs, props, text,
+                                                     channels, spectra_cache(props, data))
     nirx_raw.nirx_data['Spectra']['all_channels_raw'] = spectra
     nirx_raw.nirx_data['Spectra']['raw_oxy'] = np.mean(spectra['oxy'], axis=1)
     nirx_raw.nirx_data['Spectra']['raw_deoxy'] = np.mean(spectra['deoxy'], axis=1)
@@ -64,52 +49,85 @@ def generate_raw_spectra(nirx_raw, props, data):
     return nirx_raw, text
 
 
-def calc_NIRS_spectra(signal_oxy, signal_deoxy, nirx_input, fs, props, txt):
+def spectra_cache(props, data):
+    '''
+    Opens the cache of the spectra next to the analysis output
+    @param props: dict object including all defined settings
+    @param data: Singleton object including parameters like analysis_path, file_name etc.
+    @return: ArrayCache object, None if caching is switched off
+    '''
+    if not props['use_cache']:
+        return None
+    return ArrayCache(os.path.join(data.analysis_path_main, 'Cache', 'Spectra'), props['cache_size'])
+
+
+def spectra_key(signal_oxy, signal_deoxy, fs, channels):
+    '''
+    Returns the cache key of the spectra of oxy and deoxy signals
+    @param signal_oxy: oxy signal, samples x channels
+    @param signal_deoxy: deoxy signal, samples x channels
+    @param fs: sampling rate
+    @param channels: channel numbers the spectra are calculated for
+    @return: key: 'spectra_' and the sha1 hash of the signals, the channels, the sampling rate and the welch parameters
+    '''
+    sha = hashlib.sha1(np.ascontiguousarray(signal_oxy, dtype=float).tobytes())
+    sha.update(np.ascontiguousarray(signal_deoxy, dtype=float).tobytes())
+    sha.update(repr((signal_oxy.shape, [int(c) for c in channels], float(fs), window_length, window_overlap,
+                     fft_length)).encode())
+    return 'spectra_' + sha.hexdigest()
+
+
+def calc_NIRS_spectra(signal_oxy, signal_deoxy, nirx_input, fs, props, txt, channels=None, cache=None):
     '''
-    Calculates the spectra of oxy and deoxy signals using the welch method
-    @param signal_oxy: raw oxy signal
-    @param signal_deoxy: raw deoxy signal
+    Calculates the spectra of oxy and deoxy signals using the welch method. The included channels of oxy and deoxy are
+    put side by side and all spectra are calculated with one call of welch along the samples. If a cache is given, the
+    spectra are stored by the content of the signals and the welch parameters and loaded again for the same signals.
+    @param signal_oxy: oxy signal, samples x channels
+    @param signal_deoxy: deoxy signal, samples x channels
     @param nirx_input: NIRx object of class data_dict including the loaded hdr and xdf data of the selected
     @param fs: sampling rate
     @param props: props: dict object including all defined settings
     @param txt: list including prints displayed to self.output_gb in build_gui()
-    @return:
+    @param channels: channel numbers counted from 1 to calculate the spectra for, None for all channels
+    @param cache: ArrayCache object, None if the spectra should be calculated every time
+    @return: nirx_input: NIRx object with the frequencies of the spectra in nirx_data['Spectra']['Base']
+             spectra: dict with the spectra of 'oxy' and 'deoxy', frequencies x included channels
+             fig: figure of the spectra
+             txt: list including prints displayed to self.output_gb in build_gui()
     '''
-    window_length = 100
-    window_overlap = 50
-    fft_length = 200
-    window = signal.windows.hann(window_length * fs)  # fs = 4 in this test case
-    spectra_oxy = []
-    spectra_deoxy = []
-    spectra = {'oxy': spectra_oxy, 'deoxy': spectra_deoxy}
-    included_channels = []
-    r = dict()
-    for i in range(signal_oxy.shape[1]):
-        signal_sum = np.sum(signal_oxy[:, i])  # if channel excluded, it is for both, oxy and deoxy
-        if not np.isnan(signal_sum):
-            f_oxy, pxx_oxy = signal.welch(signal_oxy[:, i] - np.mean(signal_oxy[:, i]), window=window,
-                                          noverlap=window_overlap * round(fs),
-                                          nfft=fft_length * round(fs), fs=round(fs), detrend=False)
-            f_deoxy, pxx_deoxy = signal.welch(signal_deoxy[:, i] - np.mean(signal_deoxy[:, i]), window=window,
-                                              noverlap=window_overlap * round(fs),
-                                              nfft=fft_length * round(fs), fs=round(fs), detrend=False)
-            included_channels.append(i + 1)
-            r['pxx_oxy'] = pxx_oxy
-            r['f_oxy'] = f_oxy
-            r['pxx_deoxy'] = pxx_deoxy
-            r['f_deoxy'] = f_deoxy
-            r['fs'] = fs
-            nirx_input.nirx_data['Spectra']['Base'] = f_oxy
-
-            spectra['oxy'].append(list(pxx_oxy))
-            spectra['deoxy'].append(list(pxx_deoxy))
-        else:
-            pass
-            # rsignals[:, i]  # TODO: check that again in Matlab, probably not even needed here
-    spectra['oxy'] = np.asarray(spectra['oxy']).T
-    spectra['deoxy'] = np.asarray(spectra['deoxy']).T
-
-    fig, text = illustration_multichannel(props['probe_set_val'], spectra['oxy'], spectra['deoxy'], included_channels, f_oxy, props['freq_limit_spectra_figures'], txt=txt)
+    if channels is None:
+        channels = range(1, signal_oxy.shape[1] + 1)
+    index = np.asarray(channels, dtype=int) - 1  # -1 for index correction
+
+    arrays = None
+    if cache is not None:
+        key = spectra_key(signal_oxy, signal_deoxy, fs, index + 1)
+        arrays, meta = cache.get(key)
+        if arrays is not None and meta.get('version') != spectra_cache_version:
+            cache.remove(key)  # written by an older version
+            arrays = None
+    if arrays is not None:
+        f_oxy = np.array(arrays['f'])
+        pxx = np.array(arrays['pxx'])
+        index = np.asarray(meta['channels'], dtype=int) - 1
+        print('Loaded spectra from cache')
+        txt.append('Loaded spectra from cache')
+    else:
+        # channels with missing samples are left out, if a channel is excluded, it is for both, oxy and deoxy
+        index = index[~np.isnan(np.sum(signal_oxy[:, index], axis=0))]
+        window = signal.windows.hann(window_length * fs)  # fs = 4 in this test case
+        signals = np.concatenate((signal_oxy[:, index], signal_deoxy[:, index]), axis=1)
+        signals -= np.mean(signals, axis=0)
+        f_oxy, pxx = signal.welch(signals, window=window, noverlap=window_overlap * round(fs),
+                                  nfft=fft_length * round(fs), fs=round(fs), detrend=False, axis=0)
+        if cache is not None:
+            cache.put(key, {'f': f_oxy, 'pxx': pxx},
+                      {'version': spectra_cache_version, 'fs': float(fs), 'channels': [int(c) for c in index + 1]})
+    included = list(index + 1)
+    nirx_input.nirx_data['Spectra']['Base'] = f_oxy
+    spectra = {'oxy': pxx[:, :index.shape[0]], 'deoxy': pxx[:, index.shape[0]:]}
+
+    fig, text = illustration_multichannel(props['probe_set_val'], spectra['oxy'], spectra['deoxy'], included, f_oxy, props['freq_limit_spectra_figures'], txt=txt)
 
     return nirx_input, spectra, fig, text
 
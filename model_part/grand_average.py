@@ -61,6 +61,12 @@ def get_grand_average_data(data_ga, props):
             single_data.update({'oxy_Hb': ga_data['oxy_Hb']})
             single_data.update({'deoxy_Hb': ga_data['deoxy_Hb']})
             single_data.update({'fs': ga_data['fs']})
+            if 'continuous_bin_length' in ga_data:
+                single_data.update({'continuous_bin_length': float(ga_data['continuous_bin_length'])})
+            else:
+                # files written before the bin length was stored, the epoch is split into continuous_bins bins
+                epoch_length = int(props['pre_task_length']) + int(props['task_length']) + int(props['post_task_length'])
+                single_data.update({'continuous_bin_length': epoch_length / int(props['continuous_bins'])})
 
         all_data.append(single_data)
 
@@ -135,6 +141,7 @@ def get_grand_average_data(data_ga, props):
         fs.append(all_data[i]['fs'])  # change to without min, when fs saving works, is problem of pycharm
     NIRx.add(properties=props)
     NIRx.properties['fs'] = np.mean(np.asarray(fs))  # 4
+    NIRx.properties['continuous_bin_length'] = np.mean([single_data['continuous_bin_length'] for single_data in all_data])
 
     return NIRx, all_data, props
 
@@ -0,0 +1,149 @@
+import os
+import threading
+from dataclasses import dataclass, field
+import numpy as np
+
+
+@dataclass
+class NirstarHeader:
+    '''
+    Values of a NIRStar *.hdr file used by the pipeline. Strings are stripped of their quotes, except wavelengths which
+    is kept as written in the file. The tables between the '#' markers are stored as numpy arrays.
+    '''
+    file_name: str
+    date: str
+    time: str
+    nirstar_version: str
+    sources: int
+    detectors: int
+    wavelengths: str
+    trig_ins: int
+    trig_outs: int
+    an_ins: int
+    sampling_rate: float
+    stimulus_type: str
+    notes: str
+    gains: np.ndarray  # int, shape (sources, detectors)
+    events: np.ndarray  # float, shape (number of events, columns of the Events table)
+    sd_mask: np.ndarray  # int, shape (sources, detectors)
+    chan_dis: np.ndarray  # float, source-detector distances in mm, shape (channels,), empty without ChanDis
+    sections: dict = field(default_factory=dict)  # all other values, sections[section][key]
+
+
+class HdrParser:
+    '''
+    Parser for NIRStar *.hdr files. The file is read in one pass, key value pairs are collected per section and the
+    '#'-delimited tables (Gains, Events, S-D-Mask) and the ChanDis list are converted to numpy arrays directly.
+    Parsed headers are cached by path, modification time and size of the file.
+
+    --------
+    Methods:
+    --------
+
+    parse(self, filename)
+    tokenize(hdr_str)
+    header_from_sections(sections, tables)
+
+    '''
+    _cache = dict()
+    _lock = threading.Lock()
+
+    def parse(self, filename):
+        '''
+        Parses a NIRStar hdr file, or returns the cached result if the file did not change
+        @param filename: path of the hdr file
+        @return: NirstarHeader object
+        '''
+        stat = os.stat(filename)
+        cache_key = (os.path.abspath(filename), stat.st_mtime, stat.st_size)
+        with self._lock:
+            if cache_key in self._cache:
+                return self._cache[cache_key]
+
+        with open(filename, 'r', encoding='latin-1') as f:
+            hdr_str = f.read()
+        sections, tables = self.tokenize(hdr_str)
+        header = self.header_from_sections(sections, tables)
+
+        with self._lock:
+            self._cache[cache_key] = header
+        return header
+
+    @staticmethod
+    def tokenize(hdr_str):
+        '''
+        Splits the content of a hdr file into sections, values and tables in one pass over the lines
+        @param hdr_str: content of the hdr file
+        @return: sections: dict of dicts, sections[section][key] = value as written in the file
+                 tables: dict of lists of strings, tables[key] = rows of the table between '"#' and '#"'
+        '''
+        sections = dict()
+        tables = dict()
+        current = sections.setdefault('', dict())
+        table_rows = None
+        for line in hdr_str.splitlines():
+            if table_rows is not None:
+                if line.startswith('#'):
+                    table_rows = None
+                elif line.strip():
+                    table_rows.append(line)
+                continue
+            line = line.strip()
+            if not line or line[0] in ';#':
+                continue
+            if line[0] == '[' and line[-1] == ']':
+                current = sections.setdefault(line[1:-1], dict())
+                continue
+            key, sep, value = line.partition('=')
+            if not sep:
+                continue
+            key = key.strip()
+            value = value.strip()
+            if value == '"#':
+                table_rows = tables.setdefault(key, [])
+            elif value == '"##"' or value == '"#"':
+                tables.setdefault(key, [])
+            else:
+                current[key] = value
+        return sections, tables
+
+    @staticmethod
+    def header_from_sections(sections, tables):
+        '''
+        Converts the tokenized hdr file to a NirstarHeader object
+        @param sections: see tokenize()
+        @param tables: see tokenize()
+        @return: NirstarHeader object
+        '''
+        general = sections['GeneralInfo']
+        imaging = sections['ImagingParameters']
+        sources = int(imaging['Sources'])
+        detectors = int(imaging['Detectors'])
+
+        def table(key, dtype, shape=None):
+            rows = tables.get(key, [])
+            values = np.array(' '.join(rows).split(), dtype=dtype)
+            if shape is not None:
+                return values.reshape(shape)
+            columns = len(rows[0].split()) if rows else 0
+            return values.reshape(len(rows), columns)
+
+        return NirstarHeader(file_name=general['FileName'].strip('"'),
+                             date=general['Date'].strip('"'),
+                             time=general['Time'].strip('"'),
+                             nirstar_version=general['NIRStar'].strip('"'),
+                             sources=sources,
+                             detectors=detectors,
+                             wavelengths=imaging['Wavelengths'],
+                             trig_ins=int(imaging['TrigIns']),
+                             trig_outs=int(imaging['TrigOuts']),
+                             an_ins=int(imaging['AnIns']),
+                             sampling_rate=float(imaging['SamplingRate']),
+                             stimulus_type=sections['Paradigm']['StimulusType'].strip('"'),
+                             notes=sections['ExperimentNotes']['Notes'].strip('"'),
+                             gains=table('Gains', int, (sources, detectors)),
+                             events=table('Events', float),
+                             sd_mask=table('S-D-Mask', int, (sources, detectors)),
+                             chan_dis=np.array(sections.get('ChannelsDistance', dict()).get('ChanDis', '').strip('"')
+                                               .split(), dtype=float),
+                             sections=sections)
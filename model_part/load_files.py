@@ -1,11 +1,19 @@
-import re as re
-from configparser import RawConfigParser
 import os
+import time as tm
+from concurrent.futures import ProcessPoolExecutor
 import pyxdf
+from pyxdf.pyxdf import parse_xdf, parse_chunks
 import numpy as np
 from model_part.calcHRlin import EHK_calcHRlin
+from model_part.array_cache import ArrayCache
+from model_part.hdr_parser import HdrParser
+from model_part.load_nirx import read_nirx_run, masked_channels
+from model_part.xdf_stream import stream_xdf_run
 from data_sharing_objects.datadict_class import data_dict
 
+# streams used by the pipeline, all other streams in the xdf file are skipped if props['select_streams'] is True
+pipeline_streams = [{'name': 'NIRStar'}, {'name': 'paradigm'}, {'name': 'g.USBamp-1'}, {'name': 'g.USBamp-2'}]
+
 def load_files(data, props):
     '''
     load hdr and xdf files of selected data files
@@ -29,10 +37,6 @@ def load_files(data, props):
     hdr['Bool']['gUSBamp'] = False
     hdr['Bool']['paradigm'] = False
 
-
-    def _open(file):
-        return open(file, 'r', encoding='latin-1')
-
     version = 'NIRScout'
     nr_trials = props['nr_trials']
     filename_hdr = os.path.join(data.hdr['path'], data.hdr['name'])
@@ -45,273 +49,479 @@ def load_files(data, props):
         for i in range(len(data.xdf['selected_xdf_files'])):
             filename_xdf.append(os.path.join(data.xdf['path'], data.xdf['selected_xdf_files'][i]))
         del i
-    # until now, do it only for one xdf file
-    for j in range(len(filename_xdf)):
-
-        k = 0
-        print('Loading... %s' % filename_hdr)  # needs to be shown in output text box and saved to txt file
-        text.append('Loading... %s' % filename_hdr)
-
-        startpoint = []
-        with _open(filename_hdr) as f:
-            hdr_str = f.read()
-
-        for indx, char in enumerate(hdr_str):
-            if char == '#':
-                startpoint.append(indx)
-
-        hdr_if_other_version = hdr_str
-        hdr_if_other_version = hdr_if_other_version.splitlines()  # for future use
-        # do the next whole procedure for reading out the values between #  # (table format of NIRStar) to put them
-        # into a string to make it readable for ConfigParser. They will then be reformatted into a np.array when needed
-        gains_extracted = hdr_str[startpoint[0] + 2:startpoint[1]]
-        events_extracted = hdr_str[startpoint[2] + 2:startpoint[3]]
-        sd_mask_extracted = hdr_str[startpoint[4] + 2:startpoint[5]]
-
-        gains_formatted = re.sub(r"\D", ',', gains_extracted)
-        events_formatted = re.sub(r"\D", ',', events_extracted)
-        sd_mask_formatted = re.sub(r"\D", ',', sd_mask_extracted)
-        del gains_extracted, events_extracted, sd_mask_extracted
-
-        hdr_list = list(hdr_str)
-        if True:  # do in reverse order, otherwise you need to keep track of the indices, because they then change
-            hdr_list[startpoint[4] + 1:startpoint[5]] = sd_mask_formatted
-            hdr_list[startpoint[2] + 1:startpoint[3]] = events_formatted
-            hdr_list[startpoint[0] + 1:startpoint[1]] = gains_formatted
-        del sd_mask_formatted, events_formatted, gains_formatted
-        hdr_str = ''.join(hdr_list)
-        hdr_str = hdr_str.replace('#', '')
-        # procedure ends here
-
-        hdr_rawcnfg = RawConfigParser()
-        hdr_rawcnfg.read_string(hdr_str)
-
-        if version == 'NIRScout':
-            # [GeneralInfo]
-            file_name = hdr_rawcnfg['GeneralInfo']['FileName'].strip('"')
-            date = hdr_rawcnfg['GeneralInfo']['Date'].strip('"')
-            time = hdr_rawcnfg['GeneralInfo']['Time'].strip('"')
-            nirstar_version = hdr_rawcnfg['GeneralInfo']['NIRStar'].strip('"')
-            # [ImagingParameters]
-            sources = int(hdr_rawcnfg['ImagingParameters']['Sources'])
-            detectors = int(hdr_rawcnfg['ImagingParameters']['Detectors'])
-            wavelengths = hdr_rawcnfg['ImagingParameters']['Wavelengths']  # wird im neuen header anders abgespeichert
-
-            # wavelengths = 2  # hdr['ImagingParameters']['Wavelengths'] wird im neuen header anders abgespeichert
-            trig_ins = int(hdr_rawcnfg['ImagingParameters']['TrigIns'])
-            trig_outs = int(hdr_rawcnfg['ImagingParameters']['TrigOuts'])
-            an_ins = int(hdr_rawcnfg['ImagingParameters']['AnIns'])
-            sampling_rate = float(hdr_rawcnfg['ImagingParameters']['SamplingRate'])
-            # [Paradigm]
-            stimulus_type = hdr_rawcnfg['Paradigm']['StimulusType'].strip('"')
-            # [ExperimentNotes]
-            notes = hdr_rawcnfg['ExperimentNotes']['Notes'].strip('"')
-            # [GainSettings]
-            gains_str = hdr_rawcnfg['GainSettings']['Gains'].strip('"')
-            gains = np.fromstring(gains_str, dtype=int, sep=',').reshape(sources, detectors)
-            del gains_str
-            # [Mask]
-            sd_mask_str = hdr_rawcnfg['DataStructure']['S-D-Mask'].strip('"')
-            sd_mask = np.fromstring(sd_mask_str, dtype=int, sep=',').reshape(sources, detectors)
-            del sd_mask_str
-
-            print('HDR read out successful')
-            text.append('HDR read out successful')
-        else:
-            # read out file if not NIRScout version, with hdr_if_other_version
-            pass
-
-        hdr.setdefault('Filename', []).append(file_name)
-        hdr.setdefault('Date', []).append(date)
-        hdr.setdefault('Time', []).append(time)
-        del file_name, date, time
-        hdr.setdefault('NIRStar Version', []).append(nirstar_version)
-        hdr.setdefault('Sources', []).append(sources)
-        hdr.setdefault('Detectors', []).append(detectors)
-        hdr.setdefault('Wavelengths', []).append(wavelengths)
-        hdr.setdefault('Trig Ins', []).append(trig_ins)
-        hdr.setdefault('Trig Outs', []).append(trig_outs)
-        hdr.setdefault('An Ins', []).append(an_ins)
-        hdr.setdefault('Sampling Rate', []).append(sampling_rate)
-        del sampling_rate, an_ins, trig_outs, trig_ins, wavelengths
-        hdr.setdefault('Stymulus Type', []).append(stimulus_type)
-        del stimulus_type
-        hdr.setdefault('Notes', []).append(notes)
-        hdr.setdefault('Gains', []).append(gains)
-        hdr.setdefault('SD Mask', []).append(sd_mask)
-        del notes, gains, sd_mask
-        NIRx = data_dict()
-        NIRx.add(hdr=hdr)
-        print('hdr dict got all necessary values')
-        text.append('hdr dict got all necessary values')
-        ### load xdf files
-        print('Loading... %s' % filename_xdf[j])
-        text.append('Loading... %s' % filename_xdf[j])
-        streams, fileheader = pyxdf.load_xdf(filename_xdf[j])
-        print("Found {} streams:".format(len(streams)))
-        text.append("Found {} streams:".format(len(streams)))
-        for ix, stream in enumerate(streams):
-            print("Stream {}: {} - type {} - uid {} - shape {} at {} Hz (effective {} Hz)".format(
-                ix + 1, stream['info']['name'][0],
-                stream['info']['type'][0],
-                stream['info']['uid'][0],
-                (int(stream['info']['channel_count'][0]), len(stream['time_stamps'])),
-                stream['info']['nominal_srate'][0],
-                stream['info']['effective_srate'])
-            )
-            text.append("Stream {}: {} - type {} - uid {} - shape {} at {} Hz (effective {} Hz)".format(
-                ix + 1, stream['info']['name'][0],
-                stream['info']['type'][0],
-                stream['info']['uid'][0],
-                (int(stream['info']['channel_count'][0]), len(stream['time_stamps'])),
-                stream['info']['nominal_srate'][0],
-                stream['info']['effective_srate']))
-            if any(stream['time_stamps']):
-                print("\tDuration: {} s".format(stream['time_stamps'][-1] - stream['time_stamps'][0]))
-                text.append("\tDuration: {} s".format(stream['time_stamps'][-1] - stream['time_stamps'][0]))
-        print("Done.")
-        text.append("Done.")
-        nirstar = streams[0]
-        print(streams[0]['info']['name'][0])
-        text.append(streams[0]['info']['name'][0])
-
-        for l in streams:  # the search algorithm is done in this way, because the order of the streams is not clarified and unique
-            if l['info']['name'][0] == 'NIRStar':
-                nirx = l
-                hdr['Bool']['NIRS'] = True
-
-                # how many channels are used within the mask
-                channels = len(nirx['info']['desc'][0]['channels'][0]['channel']) - 3
-                txt = '%s found in XDF. Channels: %s' % (nirx['info']['source_id'][0], str(channels))
-                print(txt)
-                text.append(txt)
-
-                continue
-
-            elif l['info']['name'][0] == 'CNAP-BP':
-                cnap = l
-                hdr['Bool']['BP'] = True
-                txt = '%s found in XDF.' % cnap['info']['source_id'][0]
-                print(txt)
-                text.append(txt)
-                continue
-
-            elif l['info']['name'][0] == 'g.USBamp-1':
-                gusbamp = l
-                hdr['Bool']['gUSBamp'] = True
-                txt = '%s found in XDF.' % gusbamp['info']['source_id'][0]
-                print(txt)
-                text.append(txt)
-                continue
-
-            elif l['info']['name'][0] == 'g.USBamp-2':
-                gusbamp = l
-                hdr['Bool']['gUSBamp'] = True
-                txt = '%s found in XDF.' % gusbamp['info']['source_id'][0]
-                print(txt)
-                text.append(txt)
-                continue
-
-            elif l['info']['name'][0] == 'paradigm':
-                hdr['Bool']['paradigm'] = True
-                marker_nirx = l
-                txt = '%s found in XDF.' % marker_nirx['info']['source_id'][0]
-                print(txt)
-                text.append(txt)
-                if hdr['Bool']['Marker']:
-                    txt = 'NIRS-Marker will be overwritten by paradigm-Marker!'
-                    print(txt)
-                    text.append(txt)
-                hdr['Bool']['Marker'] = True
-
-                # remove all markers without information / not sure if !=0 or is not None, read docs for that
-                markers_class = np.asarray(marker_nirx['time_series'][marker_nirx['time_series'] != 0])
-                markers_time = np.asarray(marker_nirx['time_stamps'][marker_nirx['time_stamps'] != 0])
-                # Get time series from run when it is active, start/stop
-                # trigger=1
-                #print(markers_time[0])
-                #text.append(markers_time[0])
-                run_start_stop = np.array([markers_time[0], markers_time[-1]])
-                #print(run_start_stop)
-                #text.append(run_start_stop)
-                continue
-        del l
-
-        if hdr['Bool']['NIRS']:  # nirx:  # crop NIRS data, values inside run
-            crop = np.array(
-                np.logical_and(run_start_stop[0] <= nirx['time_stamps'], nirx['time_stamps'] <= run_start_stop[1]))
-            nirx['time_stamps'] = nirx['time_stamps'][crop]
-            nirx['time_series'] = nirx['time_series'][crop, :]
-
-        # cnap is not used anymore, but this would be the loading
-        if hdr['Bool']['BP']:  # cnap:  # crop cnap data, values inside run
-            crop = np.array(
-                np.logical_and(run_start_stop[0] <= cnap['time_stamps'], cnap['time_stamps'] <= run_start_stop[1]))
-            cnap['time_stamps'] = cnap['time_stamps'][crop]
-            cnap['time_series'] = cnap['time_series'][crop, :]
-            cnap_bp = np.asarray(cnap['time_stamps'])
-            cnap_bp = np.reshape(cnap_bp, (cnap_bp.shape[0], 1))  # reshaping for getting the dimensions
-            cnap_time = np.asarray(
-                cnap['time_series'])  # TODO: maybe check again for data types, float, double ect. (if it doesn't work)
-
-        if hdr['Bool']['gUSBamp']:  # gusbamp:  # crop gusbamp, values inside run
-            crop = np.array(
-                np.logical_and(run_start_stop[0] <= gusbamp['time_stamps'], gusbamp['time_stamps'] <= run_start_stop[1]))
-            gusbamp['time_stamps'] = gusbamp['time_stamps'][crop]
-            gusbamp['time_series'] = gusbamp['time_series'][crop, :]
-            gUSBamp_resp = np.asarray(gusbamp['time_series'][:, 4])
-            # gUSBamp_resp = np.reshape(gUSBamp_resp, (gUSBamp_resp.shape[0], 1))
-            gUSBamp_ecg = np.asarray(gusbamp['time_series'][:, 0])  # 1. Spalte * (-1)
-            # gUSBamp_ecg = np.reshape(gUSBamp_ecg, (gUSBamp_ecg.shape[0], 1))
-            gUSBamp_time = np.asarray(gusbamp['time_stamps'])
-            gUSBamp_time = np.reshape(gUSBamp_time, (gUSBamp_time.shape[0], 1))
-
-        del crop
-
-        #############################
-        ### sum all up
-        #############################
-        # Read wavelengths into temporary variables
-        wl1_signal = nirx['time_series'][:, 0:channels]
-        wl2_signal = nirx['time_series'][:, channels:2 * channels]
-        nirx_time = nirx['time_stamps']
-        del detectors, sources, channels
-        #print(nirx['time_series'][:][nirx['time_series'][:] <= 1])
-        #text.append(nirx['time_series'][:][nirx['time_series'][:] <= 1])
-        #print(len(nirx['time_series'][:][nirx['time_series'][:] <= 1]))
-        #text.append(len(nirx['time_series'][:][nirx['time_series'][:] <= 1]))
-
-        # Markers
-        hdr['markers'] = dict()
-        hdr['markers'].update(
-            {'time': markers_time})  # sollte eigentlich nicht im main gebraucht werden. (siehe NICA, Matlab)
-        hdr['markers'].update({'class': markers_class})
-        hdr['markers'].update({'frame': 'markers_time'})  # is this one even needed?, would be length(wl760_signla)
-
-        wl760_signal = wl1_signal
-        wl850_signal = wl2_signal
-
-        NIRx_time = nirx_time
+    # all selected files are runs of the same session and are concatenated in temporal order
+    print('Loading... %s' % filename_hdr)  # needs to be shown in output text box and saved to txt file
+    text.append('Loading... %s' % filename_hdr)
+
+    if version == 'NIRScout':
+        nirstar_hdr = HdrParser().parse(filename_hdr)
+        # [GeneralInfo]
+        file_name = nirstar_hdr.file_name
+        date = nirstar_hdr.date
+        time = nirstar_hdr.time
+        nirstar_version = nirstar_hdr.nirstar_version
+        # [ImagingParameters]
+        sources = nirstar_hdr.sources
+        detectors = nirstar_hdr.detectors
+        wavelengths = nirstar_hdr.wavelengths  # wird im neuen header anders abgespeichert
+        trig_ins = nirstar_hdr.trig_ins
+        trig_outs = nirstar_hdr.trig_outs
+        an_ins = nirstar_hdr.an_ins
+        sampling_rate = nirstar_hdr.sampling_rate
+        # [Paradigm]
+        stimulus_type = nirstar_hdr.stimulus_type
+        # [ExperimentNotes]
+        notes = nirstar_hdr.notes
+        # [GainSettings]
+        gains = nirstar_hdr.gains.copy()  # copies, since the parsed header is cached
+        # [Mask]
+        sd_mask = nirstar_hdr.sd_mask.copy()
+        # [ChannelsDistance], in mm, one value per channel of the S-D-Mask
+        chan_dis = masked_channels(nirstar_hdr.chan_dis[np.newaxis], sd_mask)[0].copy()
+
+        print('HDR read out successful')
+        text.append('HDR read out successful')
+    else:
+        # read out file if not NIRScout version, with hdr_if_other_version
+        pass
+
+    hdr.setdefault('Filename', []).append(file_name)
+    hdr.setdefault('Date', []).append(date)
+    hdr.setdefault('Time', []).append(time)
+    del file_name, date, time
+    hdr.setdefault('NIRStar Version', []).append(nirstar_version)
+    hdr.setdefault('Sources', []).append(sources)
+    hdr.setdefault('Detectors', []).append(detectors)
+    hdr.setdefault('Wavelengths', []).append(wavelengths)
+    hdr.setdefault('Trig Ins', []).append(trig_ins)
+    hdr.setdefault('Trig Outs', []).append(trig_outs)
+    hdr.setdefault('An Ins', []).append(an_ins)
+    hdr.setdefault('Sampling Rate', []).append(sampling_rate)
+    del an_ins, trig_outs, trig_ins, wavelengths
+    hdr.setdefault('Stymulus Type', []).append(stimulus_type)
+    del stimulus_type
+    hdr.setdefault('Notes', []).append(notes)
+    hdr.setdefault('Gains', []).append(gains)
+    hdr.setdefault('SD Mask', []).append(sd_mask)
+    hdr.setdefault('Channel Distances', []).append(chan_dis)
+    del notes, gains, sd_mask, chan_dis, detectors, sources
+    NIRx = data_dict()
+    NIRx.add(hdr=hdr)
+    print('hdr dict got all necessary values')
+    text.append('hdr dict got all necessary values')
+
+    ### load all runs (*.xdf files or NIRx raw files *.wl1, *.wl2, *.evt) and put them together to one session
+    runs, text = load_runs(filename_xdf, nirstar_hdr, data, props, text)
+    run, text = concatenate_runs(runs, filename_xdf, sampling_rate, text)
+    del runs, sampling_rate
+    hdr['Bool'].update(run['Bool'])
+    hdr['runs'] = run['runs']
+
+    if hdr['Bool']['gUSBamp']:
+        gUSBamp_resp = np.asarray(run['gUSBamp']['time_series'][:, 4])
+        gUSBamp_ecg = np.asarray(run['gUSBamp']['time_series'][:, 0])  # 1. Spalte * (-1)
+        gUSBamp_time = np.asarray(run['gUSBamp']['time_stamps'])
+        gUSBamp_time = np.reshape(gUSBamp_time, (gUSBamp_time.shape[0], 1))
+        gUSBamp_fs = round(run['gUSBamp']['sampling_rate'])
+
+    #############################
+    ### sum all up
+    #############################
+    # Read wavelengths into temporary variables
+    wl1_signal = run['NIRS']['wl1']
+    wl2_signal = run['NIRS']['wl2']
+    nirx_time = run['NIRS']['time_stamps']
+    markers_time = run['markers']['time']
+    markers_class = run['markers']['class']
+
+    # Markers
+    hdr['markers'] = dict()
+    hdr['markers'].update(
+        {'time': markers_time})  # sollte eigentlich nicht im main gebraucht werden. (siehe NICA, Matlab)
+    hdr['markers'].update({'class': markers_class})
+    hdr['markers'].update({'frame': 'markers_time'})  # is this one even needed?, would be length(wl760_signla)
+
+    wl760_signal = wl1_signal
+    wl850_signal = wl2_signal
+
+    NIRx_time = nirx_time
 
     # leave it out in the meantime
-    del j, markers_class, markers_time
-    # print(gusbamp['info']['effective_srate'])
+    del markers_class, markers_time
     NIRx.add(nirx_data=dict())
     NIRx.add(time=dict())
 
-    if gUSBamp_time.size:
+    if hdr['Bool']['gUSBamp']:
         NIRx.nirx_data['Respiration'] = gUSBamp_resp
+        hr_cache = None
+        if props['use_cache']:
+            hr_cache = ArrayCache(os.path.join(data.analysis_path_main, 'Cache', 'HR'), props['cache_size'])
         try:
-            NIRx.nirx_data['Heart Rate'] = EHK_calcHRlin(gUSBamp_ecg, round(gusbamp['info']['effective_srate']), props, data, txt=text)
+            NIRx.nirx_data['Heart Rate'], NIRx.hdr['hr_quality'] = EHK_calcHRlin(gUSBamp_ecg, gUSBamp_fs, props, data,
+                                                                                 txt=text, hr_cache=hr_cache)
         except:
             print('Could not calculate Heart-Rate signal')
             text.append('Could not calculate Heart-Rate signal')
         NIRx.nirx_data['ECG'] = gUSBamp_ecg
         NIRx.time['gUSBamp'] = gUSBamp_time
-        NIRx.hdr['gUSBamp_sampling_rate'] = round(gusbamp['info']['effective_srate'])
+        NIRx.hdr['gUSBamp_sampling_rate'] = gUSBamp_fs
 
     NIRx.nirx_data['wl760_signal'] = wl760_signal
     NIRx.nirx_data['wl850_signal'] = wl850_signal
     NIRx.time['NIRS'] = NIRx_time
 
-    return NIRx, text
\ No newline at end of file
+    return NIRx, text
+
+
+def load_runs(filename_xdf, nirstar_hdr, data, props, text):
+    '''
+    loads all selected runs. Cached runs and NIRx raw files are loaded directly, the remaining xdf files are decoded
+    in parallel worker processes, since decoding the sample chunks with pyxdf is mostly pure python
+    @param filename_xdf: list of paths of the selected *.xdf or *.wl1 files
+    @param nirstar_hdr: NirstarHeader object of the session, see model_part.hdr_parser
+    @param data: Singleton object including parameters like analysis_path_main
+    @param props: dict object including all defined settings
+    @param text: list including prints displayed to self.output_gb in build_gui()
+    @return: runs: list of run dicts, see read_xdf_run(), in the order of filename_xdf
+             text: list including prints displayed to self.output_gb in build_gui()
+    '''
+    runs = [None] * len(filename_xdf)
+    nirx_cache = None
+    xdf_cache = None
+    if props['use_cache']:
+        nirx_cache = ArrayCache(os.path.join(data.analysis_path_main, 'Cache', 'NIRx'), props['cache_size'])
+        xdf_cache = ArrayCache(os.path.join(data.analysis_path_main, 'Cache', 'XDF'), props['cache_size'])
+
+    cache_keys = dict()
+    for i, filename in enumerate(filename_xdf):
+        if filename.endswith('.wl1'):
+            runs[i], text = read_nirx_run(filename, nirstar_hdr, text, nirx_cache)
+        elif xdf_cache is not None:
+            cache_keys[i] = xdf_cache.source_key(filename, prefix='xdf_')
+            runs[i] = cached_xdf_run(xdf_cache, cache_keys[i])
+            if runs[i] is not None:
+                print('Loaded cropped streams of %s from cache' % filename)
+                text.append('Loaded cropped streams of %s from cache' % filename)
+
+    # every worker collects its own prints, they are appended to text in the order of the files
+    missing = [i for i in range(len(runs)) if runs[i] is None]
+    workers = min(len(missing), max(int(props['load_workers']), 1))
+    load_start = tm.perf_counter()
+    if workers > 1:
+        print('Decoding %d xdf files in %d processes' % (len(missing), workers))
+        text.append('Decoding %d xdf files in %d processes' % (len(missing), workers))
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            futures = [executor.submit(read_xdf_run, filename_xdf[i], [], props['select_streams'],
+                                       props['stream_xdf']) for i in missing]
+            results = [future.result() for future in futures]
+    else:
+        results = [read_xdf_run(filename_xdf[i], [], props['select_streams'], props['stream_xdf']) for i in missing]
+    if len(missing) > 1:
+        print('Decoded %d xdf files in %.2f s' % (len(missing), tm.perf_counter() - load_start))
+        text.append('Decoded %d xdf files in %.2f s' % (len(missing), tm.perf_counter() - load_start))
+
+    for i, (run, run_text) in zip(missing, results):
+        runs[i] = run
+        text.extend(run_text)
+        if xdf_cache is not None:
+            try:
+                cache_xdf_run(xdf_cache, cache_keys[i], run)
+            except ValueError:
+                print('Could not cache streams of %s' % filename_xdf[i])
+                text.append('Could not cache streams of %s' % filename_xdf[i])
+    return runs, text
+
+
+def concatenate_runs(runs, filename_xdf, sampling_rate, text):
+    '''
+    puts the runs of one session together in temporal order. All streams of one run are on the same LSL clock, so one
+    time offset per run aligns all its streams: every run is shifted to start one NIRS sample after the end of the
+    previous run. Streams missing in one of the runs are dropped.
+    @param runs: list of run dicts, see read_xdf_run()
+    @param filename_xdf: list of paths of the runs
+    @param sampling_rate: NIRS sampling rate of the hdr file
+    @param text: list including prints displayed to self.output_gb in build_gui()
+    @return: session: run dict of the whole session, run boundaries are stored in session['runs'] as lists of
+                      'files', 'time_offset', 'nirs_start', 'nirs_stop' and 'gUSBamp_start', 'gUSBamp_stop'
+                      (sample indices of the concatenated streams, stop excluded)
+             text: list including prints displayed to self.output_gb in build_gui()
+    '''
+    for i, run in enumerate(runs):
+        if not run['Bool']['NIRS']:
+            raise Exception('No NIRS stream found in %s' % os.path.basename(filename_xdf[i]))
+        if run['NIRS']['wl1'].shape[1] != runs[0]['NIRS']['wl1'].shape[1]:
+            raise Exception('Number of channels of %s differs from the other runs' % os.path.basename(filename_xdf[i]))
+
+    session = dict()
+    session['Bool'] = dict()
+    for stream in ['BP', 'NIRS', 'gUSBamp']:
+        session['Bool'][stream] = all(run['Bool'][stream] for run in runs)
+    for stream in ['Marker', 'paradigm']:
+        session['Bool'][stream] = any(run['Bool'][stream] for run in runs)
+    if any(run['Bool']['gUSBamp'] for run in runs) and not session['Bool']['gUSBamp']:
+        print('g.USBamp stream is missing in some runs and will not be used')
+        text.append('g.USBamp stream is missing in some runs and will not be used')
+
+    order = np.argsort([run['NIRS']['time_stamps'][0] for run in runs], kind='stable')
+    runs = [runs[i] for i in order]
+    offsets = []
+    end = None
+    for run in runs:
+        offset = 0.0 if end is None else end + 1 / sampling_rate - run['NIRS']['time_stamps'][0]
+        end = run['NIRS']['time_stamps'][-1] + offset
+        offsets.append(float(offset))
+
+    nirs_length = np.array([run['NIRS']['time_stamps'].shape[0] for run in runs])
+    session['runs'] = {'files': [os.path.basename(filename_xdf[i]) for i in order], 'time_offset': offsets,
+                       'nirs_start': [int(k) for k in np.cumsum(nirs_length) - nirs_length],
+                       'nirs_stop': [int(k) for k in np.cumsum(nirs_length)]}
+
+    if len(runs) == 1:  # nothing to concatenate, memory-mapped arrays of the cache are kept
+        session['NIRS'] = runs[0]['NIRS']
+        session['markers'] = runs[0]['markers']
+    else:
+        session['NIRS'] = {'time_stamps': np.concatenate([run['NIRS']['time_stamps'] + offset
+                                                          for run, offset in zip(runs, offsets)]),
+                           'wl1': np.concatenate([run['NIRS']['wl1'] for run in runs]),
+                           'wl2': np.concatenate([run['NIRS']['wl2'] for run in runs])}
+        session['markers'] = {'time': np.concatenate([run['markers']['time'] + offset
+                                                      for run, offset in zip(runs, offsets)]),
+                              'class': np.concatenate([run['markers']['class'] for run in runs])}
+        txt = 'Concatenated %d runs: %s' % (len(runs), ', '.join(session['runs']['files']))
+        print(txt)
+        text.append(txt)
+
+    if session['Bool']['gUSBamp']:
+        gusbamp_length = np.array([run['gUSBamp']['time_stamps'].shape[0] for run in runs])
+        session['runs']['gUSBamp_start'] = [int(k) for k in np.cumsum(gusbamp_length) - gusbamp_length]
+        session['runs']['gUSBamp_stop'] = [int(k) for k in np.cumsum(gusbamp_length)]
+        if len(runs) == 1:
+            session['gUSBamp'] = runs[0]['gUSBamp']
+        else:
+            # effective sampling rate of the session, weighted by the length of the runs
+            session['gUSBamp'] = {'time_stamps': np.concatenate([run['gUSBamp']['time_stamps'] + offset
+                                                                 for run, offset in zip(runs, offsets)]),
+                                  'time_series': np.concatenate([run['gUSBamp']['time_series'] for run in runs]),
+                                  'sampling_rate': float(np.average([run['gUSBamp']['sampling_rate'] for run in runs],
+                                                                    weights=gusbamp_length))}
+    return session, text
+
+
+def read_xdf_run(filename_xdf, text, select_streams=False, stream=False):
+    '''
+    loads the streams of one xdf file and crops them to the run defined by the paradigm markers
+    @param filename_xdf: path of the xdf file
+    @param text: list including prints displayed to self.output_gb in build_gui()
+    @param select_streams: if True, only the chunks of the pipeline_streams are decoded
+    @param stream: if True, the pipeline_streams are read chunk by chunk and only the samples inside the run are kept,
+                   see model_part.xdf_stream
+    @return: run: dict including the cropped 'NIRS' (split into 'wl1' and 'wl2') and 'gUSBamp' streams, the 'markers'
+                  and the 'Bool' values of the available streams
+             text: list including prints displayed to self.output_gb in build_gui()
+    '''
+    if stream:
+        return stream_xdf_run(filename_xdf, text, [s['name'] for s in pipeline_streams])
+
+    run = dict()
+    run['Bool'] = {'BP': False, 'NIRS': False, 'Marker': False, 'gUSBamp': False, 'paradigm': False}
+
+    stream_ids = None
+    if select_streams:
+        stream_ids, selected_bytes, skipped_bytes, text = select_pipeline_streams(filename_xdf, text)
+
+    print('Loading... %s' % filename_xdf)
+    text.append('Loading... %s' % filename_xdf)
+    load_start = tm.perf_counter()
+    streams, fileheader = pyxdf.load_xdf(filename_xdf, select_streams=stream_ids)
+    load_time = tm.perf_counter() - load_start
+    if stream_ids is not None and skipped_bytes:
+        # decoding time is roughly proportional to the number of sample bytes
+        txt = 'Skipped %.2f MB of unused stream data, estimated %.2f s saved' % (
+            skipped_bytes / 1024 ** 2, load_time * skipped_bytes / max(selected_bytes, 1))
+        print(txt)
+        text.append(txt)
+    print("Found {} streams:".format(len(streams)))
+    text.append("Found {} streams:".format(len(streams)))
+    for ix, stream in enumerate(streams):
+        print("Stream {}: {} - type {} - uid {} - shape {} at {} Hz (effective {} Hz)".format(
+            ix + 1, stream['info']['name'][0],
+            stream['info']['type'][0],
+            stream['info']['uid'][0],
+            (int(stream['info']['channel_count'][0]), len(stream['time_stamps'])),
+            stream['info']['nominal_srate'][0],
+            stream['info']['effective_srate'])
+        )
+        text.append("Stream {}: {} - type {} - uid {} - shape {} at {} Hz (effective {} Hz)".format(
+            ix + 1, stream['info']['name'][0],
+            stream['info']['type'][0],
+            stream['info']['uid'][0],
+            (int(stream['info']['channel_count'][0]), len(stream['time_stamps'])),
+            stream['info']['nominal_srate'][0],
+            stream['info']['effective_srate']))
+        if any(stream['time_stamps']):
+            print("\tDuration: {} s".format(stream['time_stamps'][-1] - stream['time_stamps'][0]))
+            text.append("\tDuration: {} s".format(stream['time_stamps'][-1] - stream['time_stamps'][0]))
+    print("Done.")
+    text.append("Done.")
+    print(streams[0]['info']['name'][0])
+    text.append(streams[0]['info']['name'][0])
+
+    for l in streams:  # the search algorithm is done in this way, because the order of the streams is not clarified and unique
+        if l['info']['name'][0] == 'NIRStar':
+            nirx = l
+            run['Bool']['NIRS'] = True
+
+            # how many channels are used within the mask
+            channels = len(nirx['info']['desc'][0]['channels'][0]['channel']) - 3
+            txt = '%s found in XDF. Channels: %s' % (nirx['info']['source_id'][0], str(channels))
+            print(txt)
+            text.append(txt)
+
+            continue
+
+        elif l['info']['name'][0] == 'CNAP-BP':
+            cnap = l
+            run['Bool']['BP'] = True
+            txt = '%s found in XDF.' % cnap['info']['source_id'][0]
+            print(txt)
+            text.append(txt)
+            continue
+
+        elif l['info']['name'][0] == 'g.USBamp-1':
+            gusbamp = l
+            run['Bool']['gUSBamp'] = True
+            txt = '%s found in XDF.' % gusbamp['info']['source_id'][0]
+            print(txt)
+            text.append(txt)
+            continue
+
+        elif l['info']['name'][0] == 'g.USBamp-2':
+            gusbamp = l
+            run['Bool']['gUSBamp'] = True
+            txt = '%s found in XDF.' % gusbamp['info']['source_id'][0]
+            print(txt)
+            text.append(txt)
+            continue
+
+        elif l['info']['name'][0] == 'paradigm':
+            run['Bool']['paradigm'] = True
+            marker_nirx = l
+            txt = '%s found in XDF.' % marker_nirx['info']['source_id'][0]
+            print(txt)
+            text.append(txt)
+            if run['Bool']['Marker']:
+                txt = 'NIRS-Marker will be overwritten by paradigm-Marker!'
+                print(txt)
+                text.append(txt)
+            run['Bool']['Marker'] = True
+
+            # remove all markers without information / not sure if !=0 or is not None, read docs for that
+            markers_class = np.asarray(marker_nirx['time_series'][marker_nirx['time_series'] != 0])
+            markers_time = np.asarray(marker_nirx['time_stamps'][marker_nirx['time_stamps'] != 0])
+            # Get time series from run when it is active, start/stop
+            # trigger=1
+            run_start_stop = np.array([markers_time[0], markers_time[-1]])
+            continue
+    del l
+
+    run['markers'] = {'time': markers_time, 'class': markers_class}
+
+    if run['Bool']['NIRS']:  # nirx:  # crop NIRS data, values inside run
+        crop = np.array(
+            np.logical_and(run_start_stop[0] <= nirx['time_stamps'], nirx['time_stamps'] <= run_start_stop[1]))
+        nirx_series = nirx['time_series'][crop, :]
+        run['NIRS'] = {'time_stamps': nirx['time_stamps'][crop], 'wl1': nirx_series[:, 0:channels],
+                       'wl2': nirx_series[:, channels:2 * channels]}
+        del nirx_series
+
+    # cnap is not used anymore, but this would be the loading
+    if run['Bool']['BP']:  # cnap:  # crop cnap data, values inside run
+        crop = np.array(
+            np.logical_and(run_start_stop[0] <= cnap['time_stamps'], cnap['time_stamps'] <= run_start_stop[1]))
+        run['BP'] = {'time_stamps': cnap['time_stamps'][crop], 'time_series': cnap['time_series'][crop, :]}
+
+    if run['Bool']['gUSBamp']:  # gusbamp:  # crop gusbamp, values inside run
+        crop = np.array(
+            np.logical_and(run_start_stop[0] <= gusbamp['time_stamps'], gusbamp['time_stamps'] <= run_start_stop[1]))
+        run['gUSBamp'] = {'time_stamps': gusbamp['time_stamps'][crop], 'time_series': gusbamp['time_series'][crop, :],
+                          'sampling_rate': float(gusbamp['info']['effective_srate'])}
+
+    return run, text
+
+
+def cache_xdf_run(xdf_cache, key, run):
+    '''
+    stores the cropped streams of one xdf file in the cache
+    @param xdf_cache: ArrayCache object
+    @param key: key of the xdf file, see ArrayCache.source_key()
+    @param run: dict returned by read_xdf_run()
+    '''
+    arrays = {'nirs_time_stamps': run['NIRS']['time_stamps'], 'nirs_wl1': run['NIRS']['wl1'],
+              'nirs_wl2': run['NIRS']['wl2'], 'markers_time': run['markers']['time'],
+              'markers_class': run['markers']['class']}
+    meta = {'Bool': run['Bool']}
+    if run['Bool']['gUSBamp']:
+        arrays.update({'gusbamp_time_stamps': run['gUSBamp']['time_stamps'],
+                       'gusbamp_time_series': run['gUSBamp']['time_series']})
+        meta['gusbamp_sampling_rate'] = run['gUSBamp']['sampling_rate']
+    xdf_cache.put(key, arrays, meta)
+
+
+def cached_xdf_run(xdf_cache, key):
+    '''
+    loads the cropped streams of one xdf file from the cache, the arrays are memory-mapped
+    @param xdf_cache: ArrayCache object
+    @param key: key of the xdf file, see ArrayCache.source_key()
+    @return: run: dict like returned by read_xdf_run(), None if the xdf file is not cached
+    '''
+    arrays, meta = xdf_cache.get(key)
+    if arrays is None:
+        return None
+    if not all(name in arrays for name in ['nirs_time_stamps', 'nirs_wl1', 'nirs_wl2', 'markers_time']):
+        xdf_cache.remove(key)  # written by an older version
+        return None
+    # np.asarray drops the memmap subclass, the data stays mapped
+    run = dict()
+    run['Bool'] = meta['Bool']
+    run['NIRS'] = {'time_stamps': np.asarray(arrays['nirs_time_stamps']),
+                   'wl1': np.asarray(arrays['nirs_wl1']),
+                   'wl2': np.asarray(arrays['nirs_wl2'])}
+    run['markers'] = {'time': np.asarray(arrays['markers_time']), 'class': np.asarray(arrays['markers_class'])}
+    if run['Bool']['gUSBamp']:
+        run['gUSBamp'] = {'time_stamps': np.asarray(arrays['gusbamp_time_stamps']),
+                          'time_series': np.asarray(arrays['gusbamp_time_series']),
+                          'sampling_rate': meta['gusbamp_sampling_rate']}
+    return run
+
+
+def select_pipeline_streams(filename_xdf, text):
+    '''
+    scans the chunk headers of an xdf file without decoding any samples and selects the streams used by the pipeline
+    @param filename_xdf: path of the xdf file
+    @param text: list including prints displayed to self.output_gb in build_gui()
+    @return: stream_ids: list of the ids of the selected streams, None if none of the pipeline_streams was found
+             selected_bytes: number of bytes of the sample chunks of the selected streams
+             skipped_bytes: number of bytes of the sample chunks of all other streams
+             text: list including prints displayed to self.output_gb in build_gui()
+    '''
+    chunks = parse_xdf(filename_xdf)
+    stream_infos = parse_chunks(chunks)
+    stream_ids = pyxdf.match_streaminfos(stream_infos, pipeline_streams)
+
+    sample_bytes = dict()
+    for chunk in chunks:
+        if chunk['tag'] == 3:  # samples chunk
+            sample_bytes[chunk['stream_id']] = sample_bytes.get(chunk['stream_id'], 0) + chunk['nbytes']
+    del chunks
+
+    selected_bytes = sum(sample_bytes.get(stream_id, 0) for stream_id in stream_ids)
+    skipped_bytes = sum(sample_bytes.values()) - selected_bytes
+    for info in stream_infos:
+        if info['stream_id'] not in stream_ids:
+            txt = 'Skipping stream %s (%.2f MB)' % (info['name'], sample_bytes.get(info['stream_id'], 0) / 1024 ** 2)
+            print(txt)
+            text.append(txt)
+
+    if not stream_ids:
+        stream_ids = None
+    return stream_ids, selected_bytes, skipped_bytes, text
@@ -0,0 +1,99 @@
+import os
+import numpy as np
+
+
+def read_nirx_run(filename_wl1, nirstar_hdr, text, nirx_cache=None):
+    '''
+    loads a NIRScout recording from its ASCII files (*.wl1, *.wl2, *.evt) without pyxdf. The ASCII files are converted
+    only once to *.npy files if a cache is given, afterwards they are memory-mapped.
+    @param filename_wl1: path of the *.wl1 file, the *.wl2 and *.evt files must be in the same folder
+    @param nirstar_hdr: NirstarHeader object of the recording, see model_part.hdr_parser
+    @param text: list including prints displayed to self.output_gb in build_gui()
+    @param nirx_cache: ArrayCache object, None if the files should be parsed every time
+    @return: run: dict with the same structure as returned by load_files.read_xdf_run()
+             text: list including prints displayed to self.output_gb in build_gui()
+    '''
+    base_name = os.path.splitext(filename_wl1)[0]
+    fs = nirstar_hdr.sampling_rate
+
+    print('Loading... %s' % filename_wl1)
+    text.append('Loading... %s' % filename_wl1)
+    wl1 = ascii_table(filename_wl1, nirx_cache)
+    wl2 = ascii_table(base_name + '.wl2', nirx_cache)
+    wl1 = masked_channels(wl1, nirstar_hdr.sd_mask)
+    wl2 = masked_channels(wl2, nirstar_hdr.sd_mask)
+    nirx_time = np.arange(wl1.shape[0]) / fs
+
+    # markers: triggers of the *.evt file, otherwise the Events table of the hdr file
+    markers_time = np.zeros(0)
+    markers_class = np.zeros(0, dtype=int)
+    if os.path.isfile(base_name + '.evt') and os.path.getsize(base_name + '.evt'):
+        evt = ascii_table(base_name + '.evt', nirx_cache).astype(int)
+        # first column is the frame, the others are the trigger inputs with the first input as least significant bit
+        markers_time = evt[:, 0] / fs
+        markers_class = evt[:, 1:].dot(2 ** np.arange(evt.shape[1] - 1))
+    elif nirstar_hdr.events.size:
+        markers_time = nirstar_hdr.events[:, 0]
+        markers_class = nirstar_hdr.events[:, 1].astype(int)
+    keep = markers_class != 0
+    markers_time = markers_time[keep]
+    markers_class = markers_class[keep]
+
+    run = dict()
+    run['Bool'] = {'BP': False, 'NIRS': True, 'Marker': bool(markers_time.size), 'gUSBamp': False,
+                   'paradigm': False}
+    txt = 'NIRx raw files found. Channels: %s, Markers: %s' % (str(wl1.shape[1]), str(markers_time.size))
+    print(txt)
+    text.append(txt)
+
+    # crop to the run, the samples are equidistant, so slicing keeps the memory-mapped arrays without copies
+    if markers_time.size:
+        start = np.searchsorted(nirx_time, markers_time[0], side='left')
+        stop = np.searchsorted(nirx_time, markers_time[-1], side='right')
+    else:
+        start, stop = 0, nirx_time.shape[0]
+    run['NIRS'] = {'time_stamps': nirx_time[start:stop], 'wl1': wl1[start:stop], 'wl2': wl2[start:stop]}
+    run['markers'] = {'time': markers_time, 'class': markers_class}
+    return run, text
+
+
+def ascii_table(filename, nirx_cache=None):
+    '''
+    reads a whitespace separated ASCII table, e.g. *.wl1 or *.evt. If a cache is given, the table is converted once to
+    a *.npy file and memory-mapped afterwards
+    @param filename: path of the ASCII file
+    @param nirx_cache: ArrayCache object or None
+    @return: table: 2-D array, rows are the lines of the file
+    '''
+    if nirx_cache is not None:
+        key = nirx_cache.source_key(filename, prefix='nirx_')
+        arrays, meta = nirx_cache.get(key)
+        if arrays is not None:
+            return np.asarray(arrays['table'])
+
+    with open(filename, 'r', encoding='latin-1') as f:
+        first_line = f.readline()
+        content = first_line + f.read()
+    columns = len(first_line.split())
+    table = np.fromstring(content, dtype=float, sep=' ')
+    table = table.reshape(-1, columns)
+
+    if nirx_cache is not None:
+        nirx_cache.put(key, {'table': table}, {'source': os.path.basename(filename)})
+        arrays, meta = nirx_cache.get(key)
+        table = np.asarray(arrays['table'])
+    return table
+
+
+def masked_channels(table, sd_mask):
+    '''
+    reduces a table including all source-detector combinations to the channels of the S-D-Mask. Tables already
+    including only the masked channels are returned unchanged
+    @param table: samples x columns
+    @param sd_mask: sources x detectors mask of the hdr file
+    @return: table: samples x channels
+    '''
+    if table.shape[1] == sd_mask.size and sd_mask.size != np.count_nonzero(sd_mask):
+        # channels are numbered source by source, as in the S-D-Key
+        return table[:, np.flatnonzero(sd_mask)]
+    return table
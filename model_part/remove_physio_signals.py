@@ -1,10 +1,15 @@
 from model_part.car_nirx import car_NIRx
 from model_part.corr_nirx import corr_NIRx
 
+# short names of the signal analysis methods used in the messages
+method_short_names = {'CAR (Common Average Reference)': 'CAR',
+                      'TF (Transfer Function Models)': 'TF',
+                      'RLS (Adaptive Filter)': 'RLS'}
+
 
 def remove_physio(nirx_physio, props, data):
     '''
-    Applies selected method for physiological artefact removal to oxy and deoxy signals. CAR or TF possible.
+    Applies selected method for physiological artefact removal to oxy and deoxy signals. CAR, TF or RLS possible.
     @param nirx_physio: NIRx object of class data_dict including the loaded hdr and xdf data of the selected
     @param props: dict object including all defined settings
     @param data: Singleton object including parameters like analysis_path, file_name etc.
@@ -17,7 +22,7 @@ def remove_physio(nirx_physio, props, data):
     deoxy_signal = nirx_physio.nirx_data['Concentration']['clean']['deoxy']
     if props['signal_analysis_method'] == 'CAR (Common Average Reference)':
         try:
-            oxy_signal, deoxy_signal = car_NIRx(oxy_signal, deoxy_signal, props)
+            oxy_signal, deoxy_signal = car_NIRx(oxy_signal, deoxy_signal, nirx_physio.channel_mask)
             nirx_physio.nirx_data['Concentration']['clean']['oxy'] = oxy_signal
             nirx_physio.nirx_data['Concentration']['clean']['deoxy'] = deoxy_signal
             print('Physiological Artefacts Removal successful')
@@ -26,7 +31,7 @@ def remove_physio(nirx_physio, props, data):
             print('Could not calculate CAR signals.')
             text.append('Could not calculate CAR signals.')
             raise
-    elif props['signal_analysis_method'] == 'TF (Transfer Function Models)':
+    elif props['signal_analysis_method'] in ['TF (Transfer Function Models)', 'RLS (Adaptive Filter)']:
         try:
             oxy_signal, deoxy_signal, NIRx, text = corr_NIRx(oxy_signal, deoxy_signal, nirx_physio, props=props,
                                                              txt=text, data=data)
@@ -35,8 +40,8 @@ def remove_physio(nirx_physio, props, data):
             print('Physiological Artefacts Removal successful')
             text.append('Physiological Artefacts Removal successful')
         except Exception:
-            print('Could not calculate TF-removed signals.')
-            text.append('Could not calculate TF-removed signals.')
+            print('Could not calculate %s-removed signals.' % method_short_names[props['signal_analysis_method']])
+            text.append('Could not calculate %s-removed signals.' % method_short_names[props['signal_analysis_method']])
             raise
 
     return nirx_physio, text
@@ -0,0 +1,111 @@
+import numpy as np
+
+# the inverse correlation matrix of RLS is made symmetric again every rls_symmetrize_interval samples
+rls_symmetrize_interval = 256
+
+
+class AdaptiveCanceller:
+    '''
+    Adaptive noise canceller removing the parts of many signals which can be predicted from the last samples of one or
+    more noise references (respiration, heart rate). The filter runs sample by sample and keeps its state between
+    calls of process(), so a recording can be corrected chunk by chunk while it grows.
+    All signals share the same regressor (the last order samples of every reference). For RLS the inverse correlation
+    matrix therefore only depends on the references and is updated once per sample for all signals, O(order^2) per
+    sample, only the weights are updated per signal. NLMS needs O(order) per sample.
+
+    --------
+    Methods:
+    --------
+
+    reset(self)
+    process(self, signals, references)
+
+    '''
+    def __init__(self, n_signals, n_references=1, order=16, method='RLS', forgetting=0.999, delta=100.0, step=0.5):
+        '''
+        @param n_signals: number of signals corrected together, e.g. channels of oxy and deoxy
+        @param n_references: number of noise references
+        @param order: number of taps per reference
+        @param method: 'RLS' or 'NLMS'
+        @param forgetting: forgetting factor of RLS, 0 < forgetting <= 1
+        @param delta: initial value of the diagonal of the inverse correlation matrix of RLS
+        @param step: step size of NLMS, 0 < step < 2
+        '''
+        if method not in ['RLS', 'NLMS']:
+            raise Exception('Unknown adaptive filter method %s' % method)
+        self.n_signals = n_signals
+        self.n_references = n_references
+        self.order = order
+        self.method = method
+        self.forgetting = forgetting
+        self.delta = delta
+        self.step = step
+        self.reset()
+
+    def reset(self):
+        '''
+        Sets the filter back to its initial state
+        '''
+        taps = self.order * self.n_references
+        self.weights = np.zeros((taps, self.n_signals))
+        self.P = np.eye(taps) * self.delta
+        # last order samples of every reference, newest first, references one after the other
+        self.regressor = np.zeros(taps)
+        self.samples = 0
+
+    def process(self, signals, references):
+        '''
+        Corrects the next chunk of samples
+        @param signals: samples x n_signals
+        @param references: samples or samples x n_references, noise references of the same samples
+        @return: corr_signals: signals without the parts predicted from the references, samples x n_signals
+        '''
+        signals = np.asarray(signals, dtype=float)
+        references = np.reshape(np.asarray(references, dtype=float), (signals.shape[0], self.n_references))
+        corr_signals = np.zeros(signals.shape)
+        newest = np.arange(self.n_references) * self.order  # position of the newest sample of every reference
+        for i in range(signals.shape[0]):
+            u = self.regressor
+            u[1:] = u[:-1].copy()
+            u[newest] = references[i]
+            # a priori error, i.e. the signal without the predicted noise
+            e = signals[i] - u.dot(self.weights)
+            corr_signals[i] = e
+            if self.method == 'RLS':
+                Pu = self.P.dot(u)
+                k = Pu / (self.forgetting + u.dot(Pu))
+                self.weights += np.outer(k, e)
+                self.P = (self.P - np.outer(k, Pu)) / self.forgetting
+                if (self.samples + i + 1) % rls_symmetrize_interval == 0:
+                    # rounding errors would make P asymmetric and the filter unstable over long recordings
+                    self.P = (self.P + self.P.T) / 2
+            else:
+                self.weights += self.step * np.outer(u, e) / (1e-12 + u.dot(u))
+        self.samples += signals.shape[0]
+        return corr_signals
+
+
+def rls_correction(oxy_signal, deoxy_signal, noise, props, chunk_length=None):
+    '''
+    Applies the adaptive noise canceller to oxy and deoxy signals of all channels
+    @param oxy_signal: samples x channels
+    @param deoxy_signal: samples x channels
+    @param noise: downsampled noise reference, samples or samples x references
+    @param props: dict object including all defined settings
+    @param chunk_length: number of samples passed to the canceller at once, None for all samples
+    @return: oxy_signal: corrected oxy signal, samples x channels
+             deoxy_signal: corrected deoxy signal, samples x channels
+    '''
+    channels = oxy_signal.shape[1]
+    signals = np.concatenate((oxy_signal, deoxy_signal), axis=1)
+    noise = np.reshape(np.asarray(noise, dtype=float), (signals.shape[0], -1))
+    canceller = AdaptiveCanceller(signals.shape[1], noise.shape[1], order=int(props['rls_order']),
+                                  method=props['rls_method'], forgetting=float(props['rls_forgetting']),
+                                  step=float(props['nlms_step']))
+    if chunk_length is None:
+        chunk_length = signals.shape[0]
+    corr_signals = np.zeros(signals.shape)
+    for onset in range(0, signals.shape[0], chunk_length):
+        corr_signals[onset:onset + chunk_length] = canceller.process(signals[onset:onset + chunk_length],
+                                                                     noise[onset:onset + chunk_length])
+    return corr_signals[:, :channels], corr_signals[:, channels:]
@@ -66,12 +66,13 @@ def write_output_file(nirx_output, props, data):
     oxy_Hb = nirx_output.nirx_data['oxy_Hb']
     deoxy_Hb = nirx_output.nirx_data['deoxy_Hb']
     fs = int(nirx_output.properties['fs'])
+    continuous_bin_length = nirx_output.properties['continuous_bin_length']
 
     # save data necessary for grand average analysis to npz file
     np.savez(os.path.join(data.analysis_path, data.file_name + '_for_GA'), head_oxy=head_oxy, head_deoxy=head_deoxy,
              head_oxy_std=head_oxy_std, head_deoxy_std=head_deoxy_std, head_oxy_con=head_oxy_con,
-             head_deoxy_con=head_deoxy_con, oxy_Hb=oxy_Hb, deoxy_Hb=deoxy_Hb, fs=fs
-             )
+             head_deoxy_con=head_deoxy_con, oxy_Hb=oxy_Hb, deoxy_Hb=deoxy_Hb, fs=fs,
+             continuous_bin_length=continuous_bin_length)
 
     fname_props = os.path.join(data.analysis_path, data.file_name + '_Settings.json')
     fname_nirx = os.path.join(data.analysis_path, data.file_name + '_NIRx.pickle')
@@ -0,0 +1,203 @@
+import io
+import struct
+import numpy as np
+from xml.etree.ElementTree import fromstring
+from pyxdf.pyxdf import open_xdf, StreamData, _read_varlen_int, _read_chunk3, _xml2dict, _clock_sync, \
+    _jitter_removal
+
+# clock synchronization and jitter removal settings, the defaults of pyxdf.load_xdf()
+clock_sync_settings = {'handle_clock_resets': True, 'reset_threshold_stds': 5, 'reset_threshold_seconds': 5,
+                       'reset_threshold_offset_stds': 10, 'reset_threshold_offset_seconds': 1,
+                       'winsor_threshold': 0.0001}
+jitter_removal_settings = {'threshold_seconds': 1, 'threshold_samples': 500}
+
+
+def stream_xdf_run(filename_xdf, text, stream_names):
+    '''
+    loads the streams of one xdf file chunk by chunk and keeps only the samples inside the run defined by the paradigm
+    markers. The file is read twice: the first pass decodes only the time stamps, the clock offsets and the markers,
+    the second pass decodes the samples of the chunks overlapping the run and writes them into preallocated arrays.
+    Clock synchronization and jitter removal are done like in pyxdf.load_xdf() with its default settings, so the
+    result is the same as cropping the output of pyxdf.load_xdf(), while the memory needed for the samples is
+    proportional to the run and not to the whole recording (only the time stamps of the whole recording are kept).
+    @param filename_xdf: path of the xdf file
+    @param text: list including prints displayed to self.output_gb in build_gui()
+    @param stream_names: names of the streams which should be loaded, all other streams are skipped
+    @return: run: dict like returned by load_files.read_xdf_run()
+             text: list including prints displayed to self.output_gb in build_gui()
+    '''
+    print('Streaming... %s' % filename_xdf)
+    text.append('Streaming... %s' % filename_xdf)
+    headers, temp, chunks, markers = scan_xdf(filename_xdf, stream_names)
+
+    # same time stamp corrections as pyxdf.load_xdf()
+    temp = _clock_sync(temp, **clock_sync_settings)
+    temp = _jitter_removal(temp, **jitter_removal_settings)
+
+    run = dict()
+    run['Bool'] = {'BP': False, 'NIRS': False, 'Marker': False, 'gUSBamp': False, 'paradigm': False}
+    names = {headers[stream_id]['info']['name'][0]: stream_id for stream_id in headers}
+    for name, stream_id in names.items():
+        txt = 'Stream %s: %s - %s samples at %s Hz (effective %s Hz)' % (
+            stream_id, name, len(temp[stream_id].time_stamps), headers[stream_id]['info']['nominal_srate'][0],
+            temp[stream_id].effective_srate)
+        print(txt)
+        text.append(txt)
+
+    if 'paradigm' not in names:
+        raise Exception('No paradigm stream found in %s' % filename_xdf)
+    run['Bool']['paradigm'] = True
+    run['Bool']['Marker'] = True
+    marker_stamps = temp[names['paradigm']].time_stamps
+    markers_class = markers[markers != 0]
+    markers_time = marker_stamps[marker_stamps != 0]
+    run_start_stop = np.array([markers_time[0], markers_time[-1]])
+    run['markers'] = {'time': markers_time, 'class': markers_class}
+
+    # indices of the samples inside the run, preallocate the arrays of the run
+    keep = dict()
+    values = dict()
+    for name, stream_id in names.items():
+        if name == 'paradigm' or temp[stream_id].fmt == 'string':
+            continue
+        stamps = temp[stream_id].time_stamps
+        keep[stream_id] = np.flatnonzero(np.logical_and(run_start_stop[0] <= stamps, stamps <= run_start_stop[1]))
+        values[stream_id] = np.zeros((keep[stream_id].shape[0], temp[stream_id].nchns), dtype=temp[stream_id].dtype)
+
+    # second pass, chunks without samples inside the run are skipped without reading them
+    with open_xdf(filename_xdf) as f:
+        for stream_id, position, first_sample, nsamples, payload_length in chunks:
+            if stream_id not in keep:
+                continue
+            start, stop = np.searchsorted(keep[stream_id], [first_sample, first_sample + nsamples])
+            if start == stop:
+                continue
+            f.seek(position)
+            payload = f.read(payload_length)
+            chunk_stamps, chunk_values = read_samples(payload, temp[stream_id])
+            values[stream_id][start:stop] = chunk_values[keep[stream_id][start:stop] - first_sample]
+
+    kept_bytes = sum(arr.nbytes for arr in values.values())
+    txt = 'Kept %.2f MB of samples inside the run (%.1f s)' % (kept_bytes / 1024 ** 2,
+                                                               run_start_stop[1] - run_start_stop[0])
+    print(txt)
+    text.append(txt)
+
+    if 'NIRStar' in names:
+        stream_id = names['NIRStar']
+        run['Bool']['NIRS'] = True
+        channels = len(headers[stream_id]['info']['desc'][0]['channels'][0]['channel']) - 3
+        txt = '%s found in XDF. Channels: %s' % (headers[stream_id]['info']['source_id'][0], str(channels))
+        print(txt)
+        text.append(txt)
+        run['NIRS'] = {'time_stamps': temp[stream_id].time_stamps[keep[stream_id]],
+                       'wl1': values[stream_id][:, 0:channels], 'wl2': values[stream_id][:, channels:2 * channels]}
+
+    for name in ['g.USBamp-1', 'g.USBamp-2']:
+        if name in names:
+            stream_id = names[name]
+            run['Bool']['gUSBamp'] = True
+            txt = '%s found in XDF.' % headers[stream_id]['info']['source_id'][0]
+            print(txt)
+            text.append(txt)
+            run['gUSBamp'] = {'time_stamps': temp[stream_id].time_stamps[keep[stream_id]],
+                              'time_series': values[stream_id],
+                              'sampling_rate': float(temp[stream_id].effective_srate)}
+    return run, text
+
+
+def scan_xdf(filename_xdf, stream_names):
+    '''
+    first pass over an xdf file: reads the stream headers and clock offsets, decodes the time stamps of all sample
+    chunks and the values of string and marker streams. The values of numeric streams are not kept.
+    @param filename_xdf: path of the xdf file
+    @param stream_names: names of the streams which should be loaded
+    @return: headers: dict of the stream headers, keys are the stream ids
+             temp: dict of pyxdf StreamData objects including the time stamps and clock offsets
+             chunks: list of (stream_id, file position of the payload, index of the first sample, number of samples,
+                     payload length) of all sample chunks
+             markers: values of the paradigm stream
+    '''
+    headers = dict()
+    temp = dict()
+    chunks = []
+    stamps = dict()
+    sample_count = dict()
+    marker_values = []
+    skipped = set()
+    with open_xdf(filename_xdf) as f:
+        while True:
+            try:
+                chunk_len = _read_varlen_int(f)
+            except EOFError:
+                break
+            tag = struct.unpack('<H', f.read(2))[0]
+            if tag not in [2, 3, 4, 6]:
+                f.seek(chunk_len - 2, 1)
+                continue
+            stream_id = struct.unpack('<I', f.read(4))[0]
+            if stream_id in skipped:
+                f.seek(chunk_len - 6, 1)
+                continue
+
+            if tag == 2:  # stream header
+                header = _xml2dict(fromstring(f.read(chunk_len - 6).decode('utf-8', 'replace')))
+                if header['info']['name'][0] not in stream_names:
+                    skipped.add(stream_id)
+                    continue
+                headers[stream_id] = header
+                temp[stream_id] = StreamData(header)
+                stamps[stream_id] = []
+                sample_count[stream_id] = 0
+            elif tag == 3:  # samples, decode only the time stamps of numeric streams
+                position = f.tell()
+                payload = f.read(chunk_len - 6)
+                stream = temp[stream_id]
+                is_marker = headers[stream_id]['info']['name'][0] == 'paradigm'
+                chunk_stamps, chunk_values = read_samples(payload, stream, keep_values=is_marker)
+                chunks.append((stream_id, position, sample_count[stream_id], len(chunk_stamps), len(payload)))
+                sample_count[stream_id] += len(chunk_stamps)
+                stamps[stream_id].append(chunk_stamps)
+                if is_marker:
+                    marker_values.append(np.asarray(chunk_values))
+            elif tag == 4:  # clock offset
+                clock_time, clock_value = struct.unpack('<dd', f.read(16))
+                temp[stream_id].clock_times.append(clock_time)
+                temp[stream_id].clock_values.append(clock_value)
+            else:  # stream footer
+                f.seek(chunk_len - 6, 1)
+
+    for stream_id in temp:
+        temp[stream_id].time_stamps = np.concatenate(stamps[stream_id]) if stamps[stream_id] else np.zeros((0,))
+    markers = np.concatenate(marker_values) if marker_values else np.zeros((0, 1))
+    return headers, temp, chunks, markers
+
+
+def read_samples(payload, stream, keep_values=True):
+    '''
+    decodes the payload of one samples chunk. If every sample has its own time stamp, which is the case for files
+    written by LabRecorder, the chunk is decoded at once with a structured dtype, otherwise sample by sample by pyxdf
+    @param payload: bytes of the chunk after the stream id
+    @param stream: pyxdf StreamData object of the stream, its last_timestamp is updated
+    @param keep_values: if False, only the time stamps are returned
+    @return: stamps: time stamps of the samples
+             values: samples x channels, None if keep_values is False
+    '''
+    if stream.fmt != 'string':
+        f = io.BytesIO(payload)
+        nsamples = _read_varlen_int(f)
+        offset = f.tell()
+        record = np.dtype([('flag', 'u1'), ('stamp', '<f8'), ('values', stream.dtype, (stream.nchns,))])
+        if len(payload) - offset == nsamples * record.itemsize:
+            samples = np.frombuffer(payload, dtype=record, count=nsamples, offset=offset)
+            if np.all(samples['flag'] != 0):
+                stamps = samples['stamp'].astype(float)
+                if nsamples:
+                    stream.last_timestamp = stamps[-1]
+                if not keep_values:
+                    return stamps, None
+                return stamps, samples['values'].astype(stream.dtype)
+    nsamples, stamps, values = _read_chunk3(io.BytesIO(payload), stream)
+    if not keep_values:
+        return stamps, None
+    return stamps, values
@@ -0,0 +1,97 @@
+import os
+import numpy as np
+import pytest
+from model_part import calcHRlin
+from model_part.array_cache import ArrayCache
+from model_part.calcHRlin import EHK_calcHRlin, ecg_key
+
+fs = 250
+props = {'generate_biosig_figures': False}
+
+
+@pytest.fixture
+def ecg():
+    '''
+    synthetic ECG of 2 minutes with one missed and one additional beat, so the RR correction has work to do
+    '''
+    rng = np.random.default_rng(0)
+    t = np.arange(0, 120, 1 / fs)
+    beats = np.cumsum(rng.uniform(0.8, 1.0, 130))
+    beats = np.delete(beats[beats < 119], 60)
+    beats = np.sort(np.append(beats, beats[30] + 0.25))
+    sig = np.exp(-0.5 * ((t[:, np.newaxis] - beats) / 0.01) ** 2).sum(axis=1)
+    return sig + 0.02 * rng.standard_normal(t.shape)
+
+
+def peaks_file(cache, sig):
+    return os.path.join(cache.cache_path, 'R-Peaks', ecg_key(sig, fs) + '.txt')
+
+
+def test_detected_peaks_are_not_pinned(tmp_path, ecg):
+    cache = ArrayCache(str(tmp_path))
+    HR, quality = EHK_calcHRlin(ecg, fs, props, None, [], hr_cache=cache)
+    entry = cache.index['entries'][ecg_key(ecg, fs)]
+    assert quality['removed_beats'] == 1 and quality['interpolated_beats'] == 1
+    assert not entry['pinned']
+    assert os.path.isfile(peaks_file(cache, ecg))
+
+    txt = []
+    HR2, quality2 = EHK_calcHRlin(ecg, fs, props, None, txt, hr_cache=cache)
+    assert txt[0].startswith('Loaded heart rate signal from cache')
+    assert np.array_equal(HR, HR2) and quality2 == quality
+
+
+def test_evicted_entry_detects_again(tmp_path, ecg):
+    cache = ArrayCache(str(tmp_path))
+    HR, quality = EHK_calcHRlin(ecg, fs, props, None, [], hr_cache=cache)
+    cache.remove(ecg_key(ecg, fs))
+
+    HR2, quality2 = EHK_calcHRlin(ecg, fs, props, None, [], hr_cache=cache)
+    assert quality2 == quality  # corrected again, the written file is not taken as corrected by hand
+    assert np.allclose(HR, HR2)
+    assert not cache.index['entries'][ecg_key(ecg, fs)]['pinned']
+    assert os.path.isfile(peaks_file(cache, ecg) + '.bak')
+
+
+def test_peaks_corrected_by_hand(tmp_path, ecg):
+    cache = ArrayCache(str(tmp_path))
+    EHK_calcHRlin(ecg, fs, props, None, [], hr_cache=cache)
+    filename = peaks_file(cache, ecg)
+    peaks = np.loadtxt(filename, dtype=int)
+    np.savetxt(filename, peaks[1:], fmt='%d')
+
+    HR, quality = EHK_calcHRlin(ecg, fs, props, None, [], hr_cache=cache)
+    entry = cache.index['entries'][ecg_key(ecg, fs)]
+    assert quality == {'r_peaks': peaks.shape[0] - 1, 'removed_beats': 0, 'interpolated_beats': 0}
+    assert entry['pinned']
+
+    # the corrected peaks stay in use after the cache entry is loaded again
+    arrays, meta = cache.get(ecg_key(ecg, fs))
+    assert meta['from_file'] and np.array_equal(arrays['r_peaks'], peaks[1:])
+
+
+def test_version_change_corrects_again(tmp_path, ecg, monkeypatch):
+    cache = ArrayCache(str(tmp_path))
+    HR, quality = EHK_calcHRlin(ecg, fs, props, None, [], hr_cache=cache)
+    monkeypatch.setattr(calcHRlin, 'hr_cache_version', calcHRlin.hr_cache_version + 1)
+
+    txt = []
+    HR2, quality2 = EHK_calcHRlin(ecg, fs, props, None, txt, hr_cache=cache)
+    assert not any(line.startswith(('Loaded heart rate', 'Using R-peaks')) for line in txt)
+    assert quality2 == quality and quality2['interpolated_beats'] == 1
+    assert cache.get(ecg_key(ecg, fs))[1]['version'] == calcHRlin.hr_cache_version
+
+
+def test_entry_of_older_version_with_peaks_file(tmp_path, ecg):
+    # entries of version 2 did not store the hash of the written R-peaks file
+    cache = ArrayCache(str(tmp_path))
+    key = ecg_key(ecg, fs)
+    peaks = np.flatnonzero(ecg > 0.5)[::3]
+    cache.put(key, {'HR': np.zeros(ecg.shape), 'r_peaks': peaks},
+              {'version': 2, 'fs': fs, 'from_file': True, 'quality': {}}, pinned=True)
+    os.makedirs(os.path.dirname(peaks_file(cache, ecg)))
+    np.savetxt(peaks_file(cache, ecg), peaks, fmt='%d')
+
+    HR, quality = EHK_calcHRlin(ecg, fs, props, None, [], hr_cache=cache)
+    assert quality['removed_beats'] == 1 and quality['interpolated_beats'] == 1
+    assert not cache.index['entries'][key]['pinned']
@@ -0,0 +1,115 @@
+import os
+import numpy as np
+import pytest
+from data_sharing_objects.datadict_class import data_dict
+from data_sharing_objects.channel_mask_class import ChannelMask
+from model_part.calculate_concentration_change import ConcentrationEngine, calculate_conc_change, extinction_tables, \
+    extinction_units, age_dpf
+from model_part.hdr_parser import HdrParser
+
+test_file = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'test_data', '2016-04-29_001',
+                         'NIRS-2016-04-29_001')
+
+
+@pytest.fixture(scope='module')
+def raw():
+    '''
+    first 2000 samples of the NIRScout test recording, samples x channels per wavelength
+    '''
+    wl1 = np.loadtxt(test_file + '.wl1', max_rows=2000)
+    wl2 = np.loadtxt(test_file + '.wl2', max_rows=2000)
+    return wl1, wl2
+
+
+def loop_conc_change(raw_signals, ext_coeff, dpf, d=1):
+    '''
+    per channel and per sample solution of the modified Beer-Lambert law, as calculate_conc_change() did before the
+    ConcentrationEngine
+    '''
+    inv_ext_coeff = np.linalg.inv(ext_coeff) if ext_coeff.shape[0] == 2 else np.linalg.pinv(ext_coeff)
+    s_signal1 = np.zeros(raw_signals[0].shape)
+    s_signal2 = np.zeros(raw_signals[0].shape)
+    for i in range(raw_signals[0].shape[1]):
+        data = np.array([signal[:, i] for signal in raw_signals])
+        A = np.zeros([data.shape[0], data.shape[1] - 1])
+        for w in range(data.shape[0]):
+            A[w, :] = (np.log10(data[w, :-1] / data[w, 1:])) / (dpf[w] * d)
+        C = np.zeros((A.shape[1], 2))
+        for g in range(A.shape[1]):
+            C[g, 0] = np.dot(inv_ext_coeff[0, :], A[:, g])
+            C[g, 1] = np.dot(inv_ext_coeff[1, :], A[:, g])
+        concentration = np.cumsum(C, axis=0)
+        s_signal1[:, i] = np.append(concentration[0, 0], concentration[:, 0])
+        s_signal2[:, i] = np.append(concentration[0, 1], concentration[:, 1])
+    return s_signal1, s_signal2
+
+
+def test_two_wavelengths(raw):
+    nirx = data_dict()
+    nirx.add(nirx_data={'wl760_signal': raw[0], 'wl850_signal': raw[1]})
+    deoxy, oxy = calculate_conc_change(nirx)
+    ext_coeff = np.array([extinction_tables['cope'][760], extinction_tables['cope'][850]])
+    ref_deoxy, ref_oxy = loop_conc_change(raw, ext_coeff, [1, 1])
+    assert np.allclose(deoxy, ref_deoxy, rtol=1e-9, atol=1e-12, equal_nan=True)
+    assert np.allclose(oxy, ref_oxy, rtol=1e-9, atol=1e-12, equal_nan=True)
+
+
+def test_n_wavelengths(raw):
+    # a third wavelength between the two measured ones, the system is solved in the least squares sense
+    wavelengths = [760, 800, 850]
+    signals = (raw[0], np.sqrt(raw[0] * raw[1]), raw[1])
+    nirx = data_dict()
+    nirx.add(nirx_data={'wl%d_signal' % wavelength: signal for wavelength, signal in zip(wavelengths, signals)})
+    props = {'wavelengths': wavelengths, 'extinction_table': 'prahl', 'dpf': [], 'dpf_age': 30, 'sd_distances': 3}
+    deoxy, oxy = calculate_conc_change(nirx, props)
+
+    ext_coeff = np.array([extinction_tables['prahl'][wavelength] for wavelength in wavelengths]) / 10
+    ref_deoxy, ref_oxy = loop_conc_change(signals, ext_coeff, age_dpf(wavelengths, 30), d=3)
+    assert np.allclose(deoxy, ref_deoxy, rtol=1e-9, atol=1e-12, equal_nan=True)
+    assert np.allclose(oxy, ref_oxy, rtol=1e-9, atol=1e-12, equal_nan=True)
+
+
+@pytest.fixture
+def nirx(raw):
+    '''
+    NIRx object of the test recording with the source-detector distances of its hdr file, as stored by load_files()
+    '''
+    nirx = data_dict()
+    nirx.add(nirx_data={'wl760_signal': raw[0], 'wl850_signal': raw[1]},
+             hdr={'Channel Distances': [HdrParser().parse(test_file + '.hdr').chan_dis]})
+    return nirx
+
+
+def test_extinction_tables_same_unit(nirx):
+    props = {'wavelengths': [760, 850], 'dpf': [], 'dpf_age': '', 'sd_distances': ''}
+    cope = calculate_conc_change(nirx, dict(props, extinction_table='cope'))
+    prahl = calculate_conc_change(nirx, dict(props, extinction_table='prahl'))
+    for cope_signal, prahl_signal in zip(cope, prahl):
+        ratio = np.nanstd(cope_signal) / np.nanstd(prahl_signal)
+        assert 0.5 < ratio < 2
+    assert sorted(extinction_units) == sorted(extinction_tables)
+
+
+def test_hdr_distances(nirx):
+    props = {'wavelengths': [760, 850], 'extinction_table': 'cope', 'dpf': [], 'dpf_age': ''}
+    assert np.array_equal(nirx.hdr['Channel Distances'][0], np.full(61, 30.0))
+    deoxy, oxy = calculate_conc_change(nirx, dict(props, sd_distances=''))
+    ref_deoxy, ref_oxy = calculate_conc_change(nirx, dict(props, sd_distances=30))
+    assert np.array_equal(deoxy, ref_deoxy, equal_nan=True)
+    assert np.array_equal(oxy, ref_oxy, equal_nan=True)
+
+    # a channel without distance is only allowed if it is left out of the analysis
+    nirx.hdr['Channel Distances'][0] = nirx.hdr['Channel Distances'][0].copy()
+    nirx.hdr['Channel Distances'][0][4] = 0
+    with pytest.raises(Exception):
+        calculate_conc_change(nirx, dict(props, sd_distances=''))
+    nirx.add(channel_mask=ChannelMask(61, {'excluded_channels': [5], 'optode_failure_val': False}))
+    deoxy, oxy = calculate_conc_change(nirx, dict(props, sd_distances=''))
+    assert np.allclose(oxy[:, 4], ref_oxy[:, 4] * 30, equal_nan=True)
+
+
+def test_engine_checks_wavelengths():
+    with pytest.raises(Exception):
+        ConcentrationEngine([760, 905])
+    with pytest.raises(Exception):
+        ConcentrationEngine([760, 850]).solve(np.ones((10, 4, 3)))
@@ -0,0 +1,109 @@
+import numpy as np
+import pytest
+from scipy import linalg, signal
+from model_part.corr_nirx import remove_noise_tf, remove_noise_tf_batch, levinson_orders, lag_cov
+
+fs = 4
+mmax = 15
+mmin = 5
+
+
+def baseline_x_cov(arr_1, arr_2, max_lag_len):
+    result = signal.correlate(arr_1 - arr_1.mean(), arr_2 - arr_2.mean(), mode='full') / arr_1.shape[0]
+    indx = int(result.shape[0] / 2)
+    return result[indx - max_lag_len: indx + max_lag_len + 1]
+
+
+def baseline_part_tf(noise_e, signal_p):
+    '''
+    part_tf() before the order recursion, one dense Toeplitz system per model order. The systems are solved with
+    scipy's LU instead of np.linalg.inv(), whose result depends on the OpenBLAS kernel of numpy
+    '''
+    noise_p = noise_e[mmax:]
+    g_yy = baseline_x_cov(noise_p, noise_p, mmax)
+    g_xy = baseline_x_cov(signal_p, noise_p, mmax)
+    g_xx0 = baseline_x_cov(signal_p, signal_p, 0)
+    lamb = np.zeros(mmax - mmin + 1)
+    gu = []
+    for m in range(mmin, mmax + 1):
+        g_xy_pj = np.reshape(g_xy[mmax:mmax + m + 1], (m + 1, 1))
+        gu.append(linalg.solve(linalg.toeplitz(g_yy[mmax:mmax + m + 1]), g_xy_pj))
+        Snn = g_xx0 - np.dot(gu[m - mmin].T, g_xy_pj)
+        lamb[m - mmin] = noise_p.shape[0] * np.log(Snn) + 2 * (m + 1)
+    b = np.reshape(gu[np.argmin(lamb)], -1)
+    return signal.lfilter(b, 1, noise_e)[mmax:]
+
+
+def baseline_remove_noise_tf(signal_in, noise):
+    '''
+    remove_noise_tf() before the order recursion, windows of 240 s
+    '''
+    seq = fs * 240
+    corr = np.zeros(signal_in.shape[0])
+    for onset in range(0, signal_in.shape[0], seq):
+        ending = min(onset + seq, signal_in.shape[0])
+        if onset == 0:
+            noise_e = np.concatenate((np.ones(mmax) * noise[0], noise[onset:ending]))
+        else:
+            noise_e = noise[onset - mmax: ending]
+        corr[onset:ending] = baseline_part_tf(noise_e, signal_in[onset:ending])
+    return signal_in - corr
+
+
+@pytest.fixture
+def recording():
+    '''
+    10 min at 4 Hz, three windows with a shorter last one, a respiration noise and 3 channels which contain the noise
+    filtered by a short FIR filter of different gains and delays
+    '''
+    rng = np.random.default_rng(3)
+    t = np.arange(600 * fs) / fs
+    noise = np.sin(2 * np.pi * 0.25 * t) + 0.5 * np.sin(2 * np.pi * 0.1 * t) + 0.3 * rng.standard_normal(t.shape[0])
+    signals = np.zeros((t.shape[0], 3))
+    for ch, (gain, delay) in enumerate([(0.8, 2), (-0.4, 5), (0.2, 9)]):
+        signals[:, ch] = gain * np.convolve(noise, [0.5, 1, 0.5])[:t.shape[0]]
+        signals[delay:, ch] = signals[:-delay, ch]
+        signals[:, ch] += 0.5 * np.sin(2 * np.pi * 0.02 * t + ch) + 0.2 * rng.standard_normal(t.shape[0])
+    return signals, noise
+
+
+def test_levinson_orders_equal_per_order_solve(recording):
+    signals, noise = recording
+    r = lag_cov(noise, noise, mmax, 0)
+    y = lag_cov(signals, noise, mmax, 0)
+    solutions = levinson_orders(r, y, mmin)
+
+    assert len(solutions) == mmax - mmin + 1
+    for m, x in enumerate(solutions, mmin):
+        expected = linalg.solve(linalg.toeplitz(r[:m + 1]), y[:m + 1])
+        np.testing.assert_allclose(x, expected, rtol=1e-6, atol=1e-9)
+
+
+def test_remove_noise_tf_equals_baseline(recording):
+    signals, noise = recording
+    expected = baseline_remove_noise_tf(signals[:, 0], noise)
+
+    np.testing.assert_allclose(remove_noise_tf(signals[:, 0], noise, fs), expected, rtol=1e-6, atol=1e-9)
+    np.testing.assert_allclose(remove_noise_tf_batch(signals, noise, fs)[:, 0], expected, rtol=1e-6, atol=1e-9)
+
+
+@pytest.mark.parametrize('method', ['direct', 'fft'])
+@pytest.mark.parametrize('max_lag', [15, 98, 99, 100, 140])
+def test_lag_cov_equals_correlate(method, max_lag):
+    # lags up to and beyond the 100 samples of the signals, which are zero
+    rng = np.random.default_rng(4)
+    arr_1 = rng.standard_normal((100, 3))
+    arr_2 = rng.standard_normal(100)
+    lags = np.arange(-max_lag, max_lag + 1)
+    expected = np.zeros((lags.shape[0], 3))
+    valid = np.abs(lags) < 100
+    for ch in range(3):
+        full = signal.correlate(arr_1[:, ch] - arr_1[:, ch].mean(), arr_2 - arr_2.mean(), mode='full') / 100
+        expected[valid, ch] = full[lags[valid] + 99]
+
+    np.testing.assert_allclose(lag_cov(arr_1, arr_2, max_lag, method=method), expected, rtol=1e-10, atol=1e-14)
+    np.testing.assert_allclose(lag_cov(arr_1[:, 0], arr_2, max_lag, method=method), expected[:, 0], rtol=1e-10,
+                               atol=1e-14)
+    # one reference per signal and a lag range not centered at zero
+    np.testing.assert_allclose(lag_cov(arr_1, arr_1, max_lag, 2, method=method)[:, 1],
+                               lag_cov(arr_1[:, 1], arr_1[:, 1], max_lag, 2, method='direct'), rtol=1e-10, atol=1e-14)
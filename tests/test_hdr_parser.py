@@ -0,0 +1,102 @@
+import os
+import re
+from configparser import RawConfigParser
+import numpy as np
+import pytest
+from model_part.hdr_parser import HdrParser
+
+test_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'test_data')
+test_headers = [os.path.join(test_dir, '2016-04-29_001', 'NIRS-2016-04-29_001.hdr'),
+                os.path.join(test_dir, '2018-07-12_002', 'NIRS-2018-07-12_002.hdr')]
+
+
+def baseline_parse_hdr(filename):
+    '''
+    hdr values as load_files() read them before the HdrParser, the '#'-delimited tables are rewritten to one comma
+    separated line for RawConfigParser
+    '''
+    with open(filename, 'r', encoding='latin-1') as f:
+        hdr_str = f.read()
+    startpoint = [indx for indx, char in enumerate(hdr_str) if char == '#']
+    hdr_list = list(hdr_str)
+    for first, last in [(4, 5), (2, 3), (0, 1)]:
+        hdr_list[startpoint[first] + 1:startpoint[last]] = re.sub(r"\D", ',',
+                                                                  hdr_str[startpoint[first] + 2:startpoint[last]])
+    hdr_rawcnfg = RawConfigParser()
+    hdr_rawcnfg.read_string(''.join(hdr_list).replace('#', ''))
+
+    sources = int(hdr_rawcnfg['ImagingParameters']['Sources'])
+    detectors = int(hdr_rawcnfg['ImagingParameters']['Detectors'])
+    return {'file_name': hdr_rawcnfg['GeneralInfo']['FileName'].strip('"'),
+            'date': hdr_rawcnfg['GeneralInfo']['Date'].strip('"'),
+            'time': hdr_rawcnfg['GeneralInfo']['Time'].strip('"'),
+            'nirstar_version': hdr_rawcnfg['GeneralInfo']['NIRStar'].strip('"'),
+            'sources': sources,
+            'detectors': detectors,
+            'wavelengths': hdr_rawcnfg['ImagingParameters']['Wavelengths'],
+            'trig_ins': int(hdr_rawcnfg['ImagingParameters']['TrigIns']),
+            'trig_outs': int(hdr_rawcnfg['ImagingParameters']['TrigOuts']),
+            'an_ins': int(hdr_rawcnfg['ImagingParameters']['AnIns']),
+            'sampling_rate': float(hdr_rawcnfg['ImagingParameters']['SamplingRate']),
+            'stimulus_type': hdr_rawcnfg['Paradigm']['StimulusType'].strip('"'),
+            'notes': hdr_rawcnfg['ExperimentNotes']['Notes'].strip('"'),
+            'gains': np.fromstring(hdr_rawcnfg['GainSettings']['Gains'].strip('"'), dtype=int,
+                                   sep=',').reshape(sources, detectors),
+            'sd_mask': np.fromstring(hdr_rawcnfg['DataStructure']['S-D-Mask'].strip('"'), dtype=int,
+                                     sep=',').reshape(sources, detectors)}
+
+
+def write_events_hdr(filename, source, events):
+    '''
+    copy of a test header with the rows of events (time, marker, frame) in its Events table
+    '''
+    with open(source, 'r', encoding='latin-1', newline='') as f:
+        hdr_str = f.read()
+    rows = ''.join('%.2f\t%d\t%d\r\n' % tuple(event) for event in events)
+    with open(filename, 'w', encoding='latin-1', newline='') as f:
+        f.write(hdr_str.replace('Events="#\r\n#"', 'Events="#\r\n' + rows + '#"'))
+
+
+def check_header(header, expected):
+    for key, value in expected.items():
+        if isinstance(value, np.ndarray):
+            assert np.array_equal(getattr(header, key), value)
+            assert getattr(header, key).dtype.kind == 'i'
+        else:
+            assert getattr(header, key) == value
+    assert header.gains.shape == header.sd_mask.shape == (header.sources, header.detectors)
+    assert header.chan_dis.dtype == float
+    assert header.chan_dis.shape == (np.count_nonzero(header.sd_mask),)
+    assert header.events.dtype == float
+
+
+@pytest.mark.parametrize('filename', test_headers)
+def test_test_headers_equal_baseline(filename):
+    header = HdrParser().parse(filename)
+    check_header(header, baseline_parse_hdr(filename))
+    assert header.events.shape == (0, 0)
+    assert np.array_equal(header.chan_dis, np.full(61, 30.0))
+
+
+def test_events_table(tmp_path):
+    rng = np.random.default_rng(5)
+    events = np.stack((np.cumsum(rng.uniform(1, 20, 5000)).round(2), rng.integers(1, 8, 5000),
+                       np.arange(5000) * 40 + 7), axis=1)
+    filename = str(tmp_path / 'events.hdr')
+    write_events_hdr(filename, test_headers[0], events)
+
+    header = HdrParser().parse(filename)
+    check_header(header, baseline_parse_hdr(filename))
+    assert header.events.shape == (5000, 3)
+    assert np.allclose(header.events, events)
+
+
+def test_cache(tmp_path):
+    filename = str(tmp_path / 'events.hdr')
+    write_events_hdr(filename, test_headers[0], [[1.5, 1, 12]])
+    header = HdrParser().parse(filename)
+    assert HdrParser().parse(filename) is header
+
+    # a changed file is parsed again
+    write_events_hdr(filename, test_headers[0], [[1.5, 1, 12], [3.25, 2, 26]])
+    assert HdrParser().parse(filename).events.shape == (2, 3)
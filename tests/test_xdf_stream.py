@@ -0,0 +1,122 @@
+import io
+import struct
+import numpy as np
+import pytest
+from pyxdf.pyxdf import StreamData, _read_chunk3, _read_varlen_int
+from model_part.load_files import read_xdf_run, pipeline_streams
+from model_part.xdf_stream import stream_xdf_run, read_samples
+
+nirs_channels = 4
+# sampling rate, channel count and format of the streams of the synthetic recording
+streams = {1: ('NIRStar', 7.8125, 2 * nirs_channels + 3, 'float32'),
+           2: ('g.USBamp-1', 256.0, 3, 'float32'),
+           3: ('paradigm', 0.0, 1, 'int32'),
+           4: ('Unused', 10.0, 2, 'double64')}
+formats = {'float32': '<f4', 'double64': '<f8', 'int32': '<i4'}
+
+
+def varlen(value):
+    if value < 256:
+        return struct.pack('<BB', 1, value)
+    return struct.pack('<BI', 4, value)
+
+
+def chunk(tag, content, stream_id=None):
+    if stream_id is not None:
+        content = struct.pack('<I', stream_id) + content
+    return varlen(len(content) + 2) + struct.pack('<H', tag) + content
+
+
+def header_xml(stream_id):
+    name, srate, nchns, fmt = streams[stream_id]
+    desc = ''
+    if name == 'NIRStar':
+        desc = '<desc><channels>%s</channels></desc>' % ('<channel><label>ch</label></channel>' * nchns)
+    return ('<?xml version="1.0"?><info><name>%s</name><type>test</type><channel_count>%d</channel_count>'
+            '<nominal_srate>%s</nominal_srate><channel_format>%s</channel_format><source_id>%s_source</source_id>'
+            '<uid>%d</uid>%s</info>' % (name, nchns, srate, fmt, name, stream_id, desc)).encode()
+
+
+def samples_chunk(stream_id, stamps, values, omit_stamps=False):
+    content = varlen(len(stamps))
+    for i, (stamp, value) in enumerate(zip(stamps, values)):
+        # without time stamps every second sample, the chunk must be decoded sample by sample
+        if omit_stamps and i % 2:
+            content += struct.pack('<B', 0)
+        else:
+            content += struct.pack('<Bd', 8, stamp)
+        content += np.asarray(value, dtype=formats[streams[stream_id][3]]).tobytes()
+    return chunk(3, content, stream_id)
+
+
+def write_xdf(filename, omit_stamps=False, chunk_length=20):
+    '''
+    writes a recording of 60 s with a NIRS, an ECG, a marker and an unused stream in interleaved chunks
+    '''
+    rng = np.random.default_rng(0)
+    data = {}
+    for stream_id, (name, srate, nchns, fmt) in streams.items():
+        if name == 'paradigm':
+            stamps = np.array([5.0, 12.5, 20.0, 31.0, 44.0])
+            values = np.array([[1], [2], [0], [2], [1]])
+        else:
+            stamps = 1000.0 + np.arange(int(60 * srate)) / srate + rng.normal(0, 1e-4, int(60 * srate))
+            values = rng.standard_normal((stamps.shape[0], nchns))
+        data[stream_id] = (stamps + (1000.0 if name == 'paradigm' else 0), values)
+
+    out = b'XDF:' + chunk(1, b'<?xml version="1.0"?><info><version>1.0</version></info>')
+    out += b''.join(chunk(2, header_xml(stream_id), stream_id) for stream_id in streams)
+    for start in range(0, max(len(stamps) for stamps, values in data.values()), chunk_length):
+        for stream_id, (stamps, values) in data.items():
+            if start < len(stamps):
+                out += samples_chunk(stream_id, stamps[start:start + chunk_length],
+                                     values[start:start + chunk_length], omit_stamps)
+        for stream_id in streams:
+            # clock offsets of 0.5 s with some noise
+            out += chunk(4, struct.pack('<dd', 1000.0 + start / 10, 0.5 + 1e-4 * (start % 3)), stream_id)
+    for stream_id in streams:
+        out += chunk(6, b'<?xml version="1.0"?><info></info>', stream_id)
+    with open(filename, 'wb') as f:
+        f.write(out)
+
+
+@pytest.mark.parametrize('omit_stamps', [False, True])
+def test_stream_equals_load_xdf(tmp_path, omit_stamps):
+    filename = str(tmp_path / 'run.xdf')
+    write_xdf(filename, omit_stamps=omit_stamps)
+    expected, _ = read_xdf_run(filename, [])
+    run, _ = stream_xdf_run(filename, [], [s['name'] for s in pipeline_streams])
+
+    assert run['Bool'] == expected['Bool']
+    for key in ['time', 'class']:
+        assert np.array_equal(run['markers'][key], expected['markers'][key])
+    assert run['NIRS']['time_stamps'].shape[0] > 0
+    for key in ['time_stamps', 'wl1', 'wl2']:
+        assert np.array_equal(run['NIRS'][key], expected['NIRS'][key])
+    for key in ['time_stamps', 'time_series']:
+        assert np.array_equal(run['gUSBamp'][key], expected['gUSBamp'][key])
+    assert run['gUSBamp']['sampling_rate'] == expected['gUSBamp']['sampling_rate']
+
+
+@pytest.mark.parametrize('omit_stamps', [False, True])
+def test_read_samples_equals_read_chunk3(omit_stamps):
+    stamps = 10 + np.arange(20) / 256.0
+    values = np.random.default_rng(1).standard_normal((20, 3))
+    payload = samples_chunk(2, stamps, values, omit_stamps)
+    # the payload starts after the chunk length, the tag and the stream id
+    f = io.BytesIO(payload)
+    _read_varlen_int(f)
+    payload = payload[f.tell() + 6:]
+
+    info = {'info': {'channel_count': ['3'], 'nominal_srate': ['256.0'], 'channel_format': ['float32']}}
+    expected_stream = StreamData(info)
+    expected_stream.last_timestamp = 10 - 1 / 256.0
+    nsamples, expected_stamps, expected_values = _read_chunk3(io.BytesIO(payload), expected_stream)
+    stream = StreamData(info)
+    stream.last_timestamp = 10 - 1 / 256.0
+    chunk_stamps, chunk_values = read_samples(payload, stream)
+
+    assert np.array_equal(chunk_stamps, expected_stamps)
+    assert np.array_equal(chunk_values, expected_values)
+    assert chunk_values.dtype == expected_values.dtype
+    assert stream.last_timestamp == expected_stream.last_timestamp